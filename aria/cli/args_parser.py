@@ -20,6 +20,7 @@ Argument parsing configuration and functions
 import argparse
 from functools import partial
 
+from ..parser.validation import Issue
 from ..utils.argparse import ArgumentParser
 
 NO_VERBOSE = 0
@@ -35,6 +36,16 @@ class SmartFormatter(argparse.HelpFormatter):
         return super(SmartFormatter, self)._split_lines(text, width)
 
 
+def positive_int(value):
+    """
+    Argument type of integers greater than zero
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError('must be at least 1: {0}'.format(value))
+    return number
+
+
 def sub_parser_decorator(func=None, **parser_settings):
     """
     Decorated for sub_parser argument definitions
@@ -111,6 +122,15 @@ def add_parse_parser(parse):
     parse.add_argument(
         '--prefix', nargs='*',
         help='prefixes for imports')
+    parse.add_argument(
+        '--issue-budget',
+        type=positive_int,
+        help='fail fast: stop parsing after this many validation issues have been reported')
+    parse.add_argument(
+        '--issue-budget-level',
+        type=int,
+        default=Issue.ALL,
+        help='maximum validation issue level counted against the issue budget (default is all)')
     parse.add_flag_argument(
         'debug',
         help_true='print debug info',
@@ -120,6 +140,11 @@ def add_parse_parser(parse):
         help_true='enable cached methods',
         help_false='disable cached methods',
         default=True)
+    parse.add_flag_argument(
+        'type-checks',
+        help_true='check the types of the items of modeling collections',
+        help_false='skip the type checks of modeling collections (faster)',
+        default=True)
 
 
 @sub_parser_decorator(
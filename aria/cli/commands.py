@@ -43,11 +43,12 @@ from ..parser.consumption import (
 )
 from ..parser.loading import LiteralLocation, UriLocation
 from ..parser.modeling import initialize_storage
+from ..parser.validation import Issue
 from ..utils.application import StorageManager
 from ..utils.caching import cachedmethod
 from ..utils.console import (puts, Colored, indent)
 from ..utils.imports import (import_fullname, import_modules)
-from ..utils.collections import OrderedDict
+from ..utils.collections import OrderedDict, StrictDict, StrictList
 from ..orchestrator import WORKFLOW_DECORATOR_RESERVED_ARGUMENTS
 from ..orchestrator.runner import Runner
 from ..orchestrator.workflows.builtin import BUILTIN_WORKFLOWS
@@ -145,6 +146,7 @@ class ParseCommand(BaseCommand):
                 extension.parser.uri_loader_prefix().append(prefix)
 
         cachedmethod.ENABLED = args_namespace.cached_methods
+        StrictDict.CHECK_TYPES = StrictList.CHECK_TYPES = args_namespace.type_checks
 
         context = ParseCommand.create_context_from_namespace(args_namespace)
         context.args = unknown_args
@@ -190,6 +192,8 @@ class ParseCommand(BaseCommand):
                        presenter_source,
                        presenter,
                        debug,
+                       issue_budget=None,
+                       issue_budget_level=Issue.ALL,
                        **kwargs):
         context = ConsumptionContext()
         context.loading.loader_source = import_fullname(loader_source)()
@@ -198,6 +202,8 @@ class ParseCommand(BaseCommand):
         context.presentation.presenter_source = import_fullname(presenter_source)()
         context.presentation.presenter_class = import_fullname(presenter)
         context.presentation.print_exceptions = debug
+        context.validation.issue_budget = issue_budget
+        context.validation.issue_budget_level = issue_budget_level
         return context
 
 
@@ -107,6 +107,15 @@ class _ParserExtensionRegistration(_ExtensionRegistration):
         """
         return {}
 
+    @_registrar
+    def id_generator_class(self):
+        """
+        Instance ID generator class registration.
+        Implementing functions should return a dictionary from ID types to
+        :class:`aria.parser.modeling.IdGenerator` subclasses
+        """
+        return {}
+
     @_registrar
     def uri_loader_prefix(self):
         """
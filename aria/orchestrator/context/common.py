@@ -15,13 +15,25 @@
 """
 A common context for both workflow and operation
 """
+import os
+import hashlib
 from uuid import uuid4
 
 import jinja2
+from jinja2.utils import LRUCache
 
 from aria import logger
 from aria.storage import exceptions
 
+# Resources are rendered with a shared environment, in which each template (by the hash of its
+# content) is compiled only once per process, and once per work directory when one is available
+# (see `BaseContext._get_template`)
+_TEMPLATE_ENVIRONMENT = jinja2.Environment()
+_TEMPLATE_CACHE_SIZE = 400
+_TEMPLATES_DIRECTORY_NAME = 'templates'
+_templates = LRUCache(_TEMPLATE_CACHE_SIZE)
+_bytecode_caches = {}
+
 
 class BaseContext(logger.LoggerMixin):
     """
@@ -42,6 +54,7 @@ class BaseContext(logger.LoggerMixin):
         self._model = model_storage
         self._resource = resource_storage
         self._deployment_id = deployment_id
+        self._blueprint_id = None
         self._workdir = workdir
 
     def __repr__(self):
@@ -101,11 +114,11 @@ class BaseContext(logger.LoggerMixin):
         Download a blueprint resource from the resource storage
         """
         try:
-            self.resource.deployment.download(entry_id=str(self.deployment.id),
+            self.resource.deployment.download(entry_id=str(self._deployment_id),
                                               destination=destination,
                                               path=path)
         except exceptions.StorageError:
-            self.resource.blueprint.download(entry_id=str(self.blueprint.id),
+            self.resource.blueprint.download(entry_id=str(self._get_blueprint_id()),
                                              destination=destination,
                                              path=path)
 
@@ -126,9 +139,17 @@ class BaseContext(logger.LoggerMixin):
         Read a deployment resource as string from the resource storage
         """
         try:
-            return self.resource.deployment.read(entry_id=str(self.deployment.id), path=path)
+            return self.resource.deployment.read(entry_id=str(self._deployment_id), path=path)
         except exceptions.StorageError:
-            return self.resource.blueprint.read(entry_id=str(self.blueprint.id), path=path)
+            return self.resource.blueprint.read(entry_id=str(self._get_blueprint_id()),
+                                                path=path)
+
+    def _get_blueprint_id(self):
+        # The resources are looked up for every operation that reads or downloads one, and the
+        # blueprint of a deployment never changes, so there's no need to query for it every time
+        if self._blueprint_id is None:
+            self._blueprint_id = self.blueprint.id
+        return self._blueprint_id
 
     def get_resource_and_render(self, path=None, variables=None):
         """
@@ -143,5 +164,43 @@ class BaseContext(logger.LoggerMixin):
         variables = variables or {}
         if 'ctx' not in variables:
             variables['ctx'] = self
-        resource_template = jinja2.Template(resource_content)
+        resource_template = self._get_template(resource_content)
         return resource_template.render(variables)
+
+    def _get_template(self, resource_content):
+        encoded_content = resource_content.encode('utf-8') \
+            if isinstance(resource_content, unicode) else resource_content
+        name = hashlib.sha1(encoded_content).hexdigest()
+        template = _templates.get(name)
+        if template is None:
+            bytecode_cache = self._get_bytecode_cache()
+            if bytecode_cache is None:
+                code = _TEMPLATE_ENVIRONMENT.compile(resource_content)
+            else:
+                bucket = bytecode_cache.get_bucket(_TEMPLATE_ENVIRONMENT, name, None,
+                                                   resource_content)
+                if bucket.code is None:
+                    bucket.code = _TEMPLATE_ENVIRONMENT.compile(resource_content)
+                    bytecode_cache.set_bucket(bucket)
+                code = bucket.code
+            template = _TEMPLATE_ENVIRONMENT.template_class.from_code(
+                _TEMPLATE_ENVIRONMENT, code, _TEMPLATE_ENVIRONMENT.make_globals(None))
+            _templates[name] = template
+        return template
+
+    def _get_bytecode_cache(self):
+        # Operations may each run in a process of their own, so compiled templates are also kept
+        # in the work directory
+        if not self._workdir:
+            return None
+        directory = os.path.join(self._workdir, _TEMPLATES_DIRECTORY_NAME)
+        if directory not in _bytecode_caches:
+            if not os.path.isdir(directory):
+                try:
+                    os.makedirs(directory)
+                except OSError:
+                    # Another process may have created it
+                    if not os.path.isdir(directory):
+                        raise
+            _bytecode_caches[directory] = jinja2.FileSystemBytecodeCache(directory)
+        return _bytecode_caches[directory]
@@ -21,6 +21,7 @@ import threading
 from contextlib import contextmanager
 from datetime import datetime
 
+from ...storage.api import DEFAULT_BATCH_SIZE
 from .exceptions import ContextException
 from .common import BaseContext
 
@@ -90,7 +91,8 @@ class WorkflowContext(BaseContext):
         return self.model.node.iter(
             filters={
                 key: getattr(self.deployment, self.deployment.name_column_name())
-            }
+            },
+            batch_size=DEFAULT_BATCH_SIZE
         )
 
     @property
@@ -102,7 +104,8 @@ class WorkflowContext(BaseContext):
         return self.model.node_instance.iter(
             filters={
                 key: getattr(self.deployment, self.deployment.name_column_name())
-            }
+            },
+            batch_size=DEFAULT_BATCH_SIZE
         )
 
 
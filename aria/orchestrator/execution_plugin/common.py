@@ -13,43 +13,132 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import errno
+import getpass
+import hashlib
 import json
 import os
+import stat
 import tempfile
+import threading
 
 import requests
+from cachecontrol import CacheControl
+from cachecontrol.caches import FileCache
 
 from . import constants
 from . import exceptions
 
+# Shared by the script downloads (per cache directory), for their connections and cached responses
+# to be reused
+_sessions = {}
+_scripts_cache_directory = None
+# Guards the creation of the sessions and of the cache directory
+_lock = threading.Lock()
+
 
 def is_windows():
     return os.name == 'nt'
 
 
 def download_script(ctx, script_path):
+    """
+    Returns the local path of a script, downloaded from a url or from the resource storage.
+
+    Scripts are kept in a cache directory, shared by all operations (and all the processes of the
+    user), by the hash of their content. Urls are requested with a shared session, whose responses
+    are cached too, so that a script is downloaded again only if it changed. Since a cached script
+    may be used by concurrent operations, it must not be modified.
+    """
     split = script_path.split('://')
     schema = split[0]
-    suffix = script_path.split('/')[-1]
-    file_descriptor, dest_script_path = tempfile.mkstemp(suffix='-{0}'.format(suffix))
+    name = script_path.split('/')[-1]
+    cache_directory = _get_scripts_cache_directory()
+    if schema in ['http', 'https']:
+        return _download_url_script(ctx, script_path, name, cache_directory)
+    file_descriptor, dest_script_path = tempfile.mkstemp(dir=cache_directory)
     os.close(file_descriptor)
     try:
-        if schema in ['http', 'https']:
-            response = requests.get(script_path)
-            if response.status_code == 404:
-                ctx.task.abort('Failed to download script: {0} (status code: {1})'
-                               .format(script_path, response.status_code))
-            content = response.text
-            with open(dest_script_path, 'wb') as f:
-                f.write(content)
-        else:
-            ctx.download_resource(destination=dest_script_path, path=script_path)
-    except:
+        ctx.download_resource(destination=dest_script_path, path=script_path)
+        with open(dest_script_path, 'rb') as f:
+            content = f.read()
+    finally:
         os.remove(dest_script_path)
-        raise
+    return _store_script(cache_directory, name, content)
+
+
+def _download_url_script(ctx, url, name, cache_directory):
+    response = _get_session(cache_directory).get(url)
+    if not 200 <= response.status_code < 300:
+        raise ctx.task.abort('Failed to download script: {0} (status code: {1})'
+                             .format(url, response.status_code))
+    return _store_script(cache_directory, name, response.content)
+
+
+def _get_session(cache_directory):
+    with _lock:
+        session = _sessions.get(cache_directory)
+        if session is None:
+            session = _sessions[cache_directory] = CacheControl(
+                requests.Session(), cache=FileCache(os.path.join(cache_directory, 'http')))
+        return session
+
+
+def _store_script(cache_directory, name, content):
+    dest_script_path = os.path.join(cache_directory, '{0}-{1}'.format(
+        hashlib.sha256(content).hexdigest(), name))
+    if not os.path.isfile(dest_script_path):
+        _write_atomically(cache_directory, dest_script_path, content, mode=0755)
     return dest_script_path
 
 
+def _write_atomically(directory, path, content, mode=None):
+    # Written under a temporary name first, so that concurrent operations never see a partially
+    # written file
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(file_descriptor, 'wb') as f:
+            f.write(content)
+        if mode is not None:
+            os.chmod(temp_path, mode)
+        try:
+            os.rename(temp_path, path)
+        except OSError:
+            # Renaming over an existing file fails on Windows, where the file is then the same
+            # script stored by another operation
+            if not os.path.isfile(path):
+                raise
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _get_scripts_cache_directory():
+    global _scripts_cache_directory  # pylint: disable=global-statement
+    with _lock:
+        if _scripts_cache_directory is None:
+            _scripts_cache_directory = _create_scripts_cache_directory()
+        return _scripts_cache_directory
+
+
+def _create_scripts_cache_directory():
+    directory = os.path.join(tempfile.gettempdir(),
+                             'aria-scripts-{0}'.format(getpass.getuser()))
+    try:
+        os.mkdir(directory, 0700)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    directory_stat = os.lstat(directory)
+    # The directory is in a shared location, so it's only used if no one else could have
+    # placed scripts in it
+    if not is_windows() and (not stat.S_ISDIR(directory_stat.st_mode) or
+                             directory_stat.st_uid != os.getuid() or
+                             directory_stat.st_mode & 0077):
+        directory = tempfile.mkdtemp(prefix='aria-scripts-')
+    return directory
+
+
 def create_process_config(script_path, process, operation_kwargs, quote_json_env_vars=False):
     """
     update a process with it's environment variables, and return it.
@@ -68,11 +157,19 @@ def create_process_config(script_path, process, operation_kwargs, quote_json_env
     :type operation_kwargs: dict
     :return: the process updated with its environment variables.
     :rtype: dict
+
+    When the process has ``inputs_file`` set, the inputs are also JSON-encoded into the
+    ``inputs_json`` of the process, to be written to a file for the script, and only the small
+    scalar ones are passed as environment variables (which are otherwise copied into every process
+    the script spawns, and are limited in size).
     """
     process = process or {}
     env_vars = operation_kwargs.copy()
     if 'ctx' in env_vars:
         del env_vars['ctx']
+    if process.get('inputs_file'):
+        process['inputs_json'] = json.dumps(env_vars, default=str)
+        env_vars = dict((k, v) for k, v in env_vars.items() if _is_small_scalar(v))
     env_vars.update(process.get('env', {}))
     for k, v in env_vars.items():
         if isinstance(v, (dict, list, tuple, bool, int, float)):
@@ -103,6 +200,12 @@ def create_process_config(script_path, process, operation_kwargs, quote_json_env
     return process
 
 
+def _is_small_scalar(value):
+    if isinstance(value, basestring):
+        return len(value) <= constants.INPUTS_FILE_MAX_ENV_VAR_SIZE
+    return value is None or isinstance(value, (bool, int, long, float))
+
+
 def patch_ctx(ctx):
     ctx._error = None
     task = ctx.task
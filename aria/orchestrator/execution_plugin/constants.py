@@ -19,12 +19,31 @@ from . import exceptions
 PYTHON_SCRIPT_FILE_EXTENSION = '.py'
 POWERSHELL_SCRIPT_FILE_EXTENSION = '.ps1'
 DEFAULT_POWERSHELL_EXECUTABLE = 'powershell'
+# Script output is logged as it arrives, up to this many lines a second on average (with bursts of
+# up to OUTPUT_LOG_BURST lines), beyond which lines are only counted
+OUTPUT_LOG_LINES_PER_SECOND = 100
+OUTPUT_LOG_BURST = 1000
+# How much of the end of each of stdout and stderr is kept for the ProcessException of a failure
+OUTPUT_TAIL_SIZE = 64 * 1024
+# Deployment resource directory in which the output of scripts is stored when spool_output is set
+OUTPUT_RESOURCE_PATH = 'logs'
 
 # related to both local and ssh
 ILLEGAL_CTX_OPERATION_MESSAGE = 'ctx may only abort or retry once'
+# When the inputs_file of the process is set, the inputs are written as a JSON object to a file
+# whose path is in this environment variable, and only scalar inputs of up to
+# INPUTS_FILE_MAX_ENV_VAR_SIZE characters are passed as environment variables as well
+INPUTS_FILE_ENV_VAR = 'CTX_INPUTS_FILE'
+INPUTS_FILE_MAX_ENV_VAR_SIZE = 1024
 
 # related to ssh
 DEFAULT_BASE_DIR = '/tmp/aria-ctx'
+# Commands run on this many hosts at a time, unless the pool_size of the fabric env says otherwise
+DEFAULT_HOSTS_POOL_SIZE = 10
+# Runtime property of the node instance in which the results of commands on hosts are stored, and
+# how much of the end of the output of a failed command is kept in it
+HOSTS_RESULTS_PROPERTY = 'hosts_commands_results'
+HOSTS_RESULTS_OUTPUT_SIZE = 1024
 FABRIC_ENV_DEFAULTS = {
     'connection_attempts': 5,
     'timeout': 10,
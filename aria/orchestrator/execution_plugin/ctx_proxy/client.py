@@ -17,6 +17,9 @@
 import argparse
 import json
 import os
+import shlex
+import socket
+import struct
 import sys
 import urllib2
 
@@ -24,6 +27,16 @@ import urllib2
 # Environment variable for the socket url (used by clients to locate the socket)
 CTX_SOCKET_URL = 'CTX_SOCKET_URL'
 
+# Socket urls with this prefix are paths of unix domain sockets, on which messages are framed
+# by `send_message` and `receive_message`. Other socket urls are http urls.
+UNIX_SOCKET_URL_PREFIX = 'unix://'
+
+_MESSAGE_LENGTH_FORMAT = '>I'
+_MESSAGE_LENGTH_SIZE = struct.calcsize(_MESSAGE_LENGTH_FORMAT)
+
+# Open unix domain socket connections by socket path, reused by all the requests of the process
+_connections = {}
+
 
 class _RequestError(RuntimeError):
 
@@ -34,6 +47,65 @@ class _RequestError(RuntimeError):
         self.ex_traceback = ex_traceback
 
 
+def send_message(sock, message):
+    sock.sendall(struct.pack(_MESSAGE_LENGTH_FORMAT, len(message)) + message)
+
+
+def receive_message(sock):
+    """
+    Returns None if the connection was closed before a message was received
+    """
+    header = _receive(sock, _MESSAGE_LENGTH_SIZE)
+    if header is None:
+        return None
+    length, = struct.unpack(_MESSAGE_LENGTH_FORMAT, header)
+    message = _receive(sock, length)
+    if message is None:
+        raise IOError('Connection closed in the middle of a message')
+    return message
+
+
+def _receive(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            if chunks:
+                raise IOError('Connection closed in the middle of a message')
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _unix_socket_request(socket_path, request, timeout):
+    connection = _connections.get(socket_path)
+    if connection is None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        connection.connect(socket_path)
+        _connections[socket_path] = connection
+    try:
+        connection.settimeout(timeout)
+        send_message(connection, json.dumps(request))
+        response = receive_message(connection)
+        if response is None:
+            raise IOError('Connection closed by the ctx proxy')
+    except BaseException:
+        # The connection can't be used for another request, as a response to this one might
+        # still arrive on it
+        del _connections[socket_path]
+        connection.close()
+        raise
+    return json.loads(response)
+
+
+def _request(socket_url, request, timeout):
+    if socket_url.startswith(UNIX_SOCKET_URL_PREFIX):
+        return _unix_socket_request(socket_url[len(UNIX_SOCKET_URL_PREFIX):], request, timeout)
+    return _http_request(socket_url, request, timeout)
+
+
 def _http_request(socket_url, request, timeout):
     response = urllib2.urlopen(
         url=socket_url,
@@ -45,10 +117,20 @@ def _http_request(socket_url, request, timeout):
 
 
 def _client_request(socket_url, args, timeout):
-    response = _http_request(
+    return _process_response(_request(
         socket_url=socket_url,
         request={'args': args},
-        timeout=timeout)
+        timeout=timeout))
+
+
+def _client_batch_request(socket_url, batch, timeout):
+    return _process_response(_request(
+        socket_url=socket_url,
+        request={'batch': batch},
+        timeout=timeout))
+
+
+def _process_response(response):
     payload = response['payload']
     response_type = response.get('type')
     if response_type == 'error':
@@ -62,12 +144,15 @@ def _client_request(socket_url, args, timeout):
         return payload
 
 
-def _parse_args(args):
-    parser = argparse.ArgumentParser()
+def _parse_args(args, parser_class=argparse.ArgumentParser):
+    parser = parser_class()
     parser.add_argument('-t', '--timeout', type=int, default=30)
     parser.add_argument('--socket-url', default=os.environ.get(CTX_SOCKET_URL))
     parser.add_argument('--json-arg-prefix', default='@')
     parser.add_argument('-j', '--json-output', action='store_true')
+    # Read requests from stdin, one per line (with the given args prepended to each), and send
+    # them together, to be processed as one
+    parser.add_argument('-b', '--batch', action='store_true')
     parser.add_argument('args', nargs='*')
     args = parser.parse_args(args=args)
     if not args.socket_url:
@@ -86,19 +171,39 @@ def _process_args(json_prefix, args):
     return processed_args
 
 
+def _read_batch(json_prefix, args, lines):
+    batch = []
+    for line in lines:
+        line_args = shlex.split(line, comments=True)
+        if line_args:
+            batch.append(_process_args(json_prefix, args + line_args))
+    return batch
+
+
+def _format_response(response, json_output):
+    if json_output:
+        return json.dumps(response)
+    if not response:
+        return ''
+    return str(response)
+
+
 def main(args=None):
     args = _parse_args(args)
-    response = _client_request(
-        socket_url=args.socket_url,
-        args=_process_args(args.json_arg_prefix, args.args),
-        timeout=args.timeout)
-    if args.json_output:
-        response = json.dumps(response)
+    if args.batch:
+        responses = _client_batch_request(
+            socket_url=args.socket_url,
+            batch=_read_batch(args.json_arg_prefix, args.args, sys.stdin),
+            timeout=args.timeout)
+        output = '\n'.join(_format_response(response, args.json_output)
+                           for response in responses)
     else:
-        if not response:
-            response = ''
-        response = str(response)
-    sys.stdout.write(response)
+        response = _client_request(
+            socket_url=args.socket_url,
+            args=_process_args(args.json_arg_prefix, args.args),
+            timeout=args.timeout)
+        output = _format_response(response, args.json_output)
+    sys.stdout.write(output)
 
 
 if __name__ == '__main__':
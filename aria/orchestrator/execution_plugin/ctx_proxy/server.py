@@ -13,31 +13,67 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import argparse
 import collections
 import json
+import os
+import pipes
 import re
+import shutil
 import socket
+import sys
+import tempfile
 import threading
 import traceback
 import Queue
+import SocketServer
 import StringIO
 import wsgiref.simple_server
 
 import bottle
 
 from .. import exceptions
+from . import client
 
 
 class CtxProxy(object):
+    """
+    Serves ctx requests of a script.
 
-    def __init__(self, ctx):
+    By default requests are served over http on a local port. With :code:`unix_socket`, they are
+    served on a unix domain socket instead, over persistent connections on which each request
+    and response is a length-prefixed JSON message (see :code:`client.send_message`). This saves
+    most of the overhead of http for scripts that make many ctx calls, while http is still
+    available where unix domain sockets are not (e.g. when scripts run on a remote host).
+
+    Along with the unix domain socket, a :code:`ctx` shell script is created in :code:`bin_path`
+    for scripts to run instead of the python client. It passes requests to the proxy through
+    FIFOs, so the calls don't pay for starting a python interpreter and importing the client.
+    """
+
+    def __init__(self, ctx, unix_socket=False):
         self.ctx = ctx
-        self.port = _get_unused_port()
-        self.socket_url = 'http://localhost:{0}'.format(self.port)
         self.server = None
-        self._started = Queue.Queue(1)
-        self.thread = self._start_server()
-        self._started.get(timeout=5)
+        self._lock = threading.Lock()
+        self._connections = set()
+        if unix_socket:
+            self.port = None
+            self._socket_dir = tempfile.mkdtemp(prefix='ctx-proxy-')
+            self.socket_path = os.path.join(self._socket_dir, 'ctx.socket')
+            self.socket_url = '{0}{1}'.format(client.UNIX_SOCKET_URL_PREFIX, self.socket_path)
+            self.thread = self._start_unix_socket_server()
+            self.bin_path = os.path.join(self._socket_dir, 'bin')
+            self._fifo_thread = self._start_fifo_server()
+        else:
+            self.port = _get_unused_port()
+            self.socket_path = None
+            self._socket_dir = None
+            self.bin_path = None
+            self._fifo_thread = None
+            self.socket_url = 'http://localhost:{0}'.format(self.port)
+            self._started = Queue.Queue(1)
+            self.thread = self._start_server()
+            self._started.get(timeout=5)
 
     def _start_server(self):
         proxy = self
@@ -82,10 +118,154 @@ class CtxProxy(object):
         thread.start()
         return thread
 
+    def _start_unix_socket_server(self):
+        proxy = self
+
+        class Handler(SocketServer.BaseRequestHandler):
+            def handle(self):
+                # Clients keep their connection open for any number of requests
+                proxy._connections.add(self.request)
+                try:
+                    while True:
+                        request = client.receive_message(self.request)
+                        if request is None:
+                            return
+                        client.send_message(self.request, proxy._process(request))
+                finally:
+                    proxy._connections.discard(self.request)
+
+        self.server = _UnixSocketServer(self.socket_path, Handler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _start_fifo_server(self):
+        import fcntl  # not available on windows, where there are no unix domain sockets either
+        fifo_path = os.path.join(self._socket_dir, 'ctx.fifo')
+        os.mkfifo(fifo_path, 0600)
+        os.mkdir(os.path.join(self._socket_dir, 'requests'))
+        self._fifo = os.open(fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+        # Kept open so that reading doesn't end whenever no client has the FIFO open
+        self._fifo_writer = os.open(fifo_path, os.O_WRONLY)
+        fcntl.fcntl(self._fifo, fcntl.F_SETFL,
+                    fcntl.fcntl(self._fifo, fcntl.F_GETFL) & ~os.O_NONBLOCK)
+        os.mkdir(self.bin_path)
+        shim_path = os.path.join(self.bin_path, 'ctx')
+        with open(shim_path, 'w') as f:
+            f.write(_CTX_SHIM.format(socket_dir=pipes.quote(self._socket_dir),
+                                     python=pipes.quote(sys.executable)))
+        os.chmod(shim_path, 0755)
+        thread = threading.Thread(target=self._serve_fifo)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _serve_fifo(self):
+        # Each line written to the FIFO is the name of a request directory, holding the args of
+        # the request and a FIFO for its response (see _CTX_SHIM). An empty line stops serving.
+        pending = ''
+        while True:
+            pending += os.read(self._fifo, 4096)
+            lines = pending.split('\n')
+            pending = lines.pop()
+            for line in lines:
+                if not line:
+                    return
+                if line.isdigit():
+                    thread = threading.Thread(target=self._process_fifo_request, args=(line,))
+                    thread.daemon = True
+                    thread.start()
+
+    def _process_fifo_request(self, name):
+        request_path = os.path.join(self._socket_dir, 'requests', name)
+        response_path = os.path.join(request_path, 'response')
+        try:
+            with open(os.path.join(request_path, 'args'), 'rb') as f:
+                args = f.read().split('\0')
+            response = self._process_command(args[1:int(args[0]) + 1])
+            # Blocks until the client opens the response for reading
+            with open(response_path, 'wb') as f:
+                f.write(response)
+        except (IOError, OSError, ValueError):
+            # The client gave up on the request
+            pass
+        finally:
+            shutil.rmtree(request_path, ignore_errors=True)
+
+    def _process_command(self, args):
+        """
+        Processes the args of a ctx command the way the python client would, returning its exit
+        code and output on the first line and the rest of the response. For anything but a single
+        request (e.g. --batch, --help or invalid args), the response asks the client to fall back
+        to the python client.
+        """
+        try:
+            args = client._parse_args(['--socket-url', self.socket_url] + args,
+                                      parser_class=_FallbackArgumentParser)
+        except _Fallback:
+            return 'fallback\n'
+        if args.batch or args.socket_url != self.socket_url:
+            return 'fallback\n'
+        try:
+            request = json.dumps({'args': client._process_args(args.json_arg_prefix, args.args)})
+            response = client._process_response(json.loads(self._process(request)))
+            return '0\n{0}'.format(client._format_response(response, args.json_output))
+        except SystemExit as e:
+            return '1\n{0}\n'.format(e.code)
+        except Exception:
+            return '1\n{0}'.format(traceback.format_exc())
+
     def close(self):
         if self.server:
-            self.server.shutdown()
+            self._shutdown_server()
             self.server.server_close()
+        for connection in list(self._connections):
+            # Ends the handling of the connection
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        if self._fifo_thread:
+            os.write(self._fifo_writer, '\n')
+            self._fifo_thread.join()
+            os.close(self._fifo)
+            os.close(self._fifo_writer)
+            requests_path = os.path.join(self._socket_dir, 'requests')
+            for name in os.listdir(requests_path):
+                # Ends waits on either end of the responses, for clients that are gone or requests
+                # that weren't read
+                response_path = os.path.join(requests_path, name, 'response')
+                for flags in (os.O_RDONLY, os.O_WRONLY):
+                    try:
+                        os.close(os.open(response_path, flags | os.O_NONBLOCK))
+                    except OSError:
+                        pass
+        if self._socket_dir:
+            shutil.rmtree(self._socket_dir, ignore_errors=True)
+
+    def _shutdown_server(self):
+        # `serve_forever` only checks whether it should stop between requests (or every poll
+        # interval), so it's woken up with empty connections until it does
+        shutdown = threading.Thread(target=self.server.shutdown)
+        shutdown.daemon = True
+        shutdown.start()
+        while shutdown.is_alive():
+            if self.socket_path:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                address = self.socket_path
+            else:
+                sock = socket.socket()
+                address = ('localhost', self.port)
+            # The server may have stopped accepting connections already
+            sock.settimeout(0.01)
+            try:
+                sock.connect(address)
+            except socket.error:
+                pass
+            finally:
+                sock.close()
+            shutdown.join(0.01)
 
     def _request_handler(self):
         request = bottle.request.body.read()  # pylint: disable=no-member
@@ -96,10 +276,16 @@ class CtxProxy(object):
             headers={'content-type': 'application/json'})
 
     def _process(self, request):
+        with self._lock:
+            return self._process_request(request)
+
+    def _process_request(self, request):
         try:
             typed_request = json.loads(request)
-            args = typed_request['args']
-            payload = _process_ctx_request(self.ctx, args)
+            if 'batch' in typed_request:
+                payload = _process_ctx_batch_request(self.ctx, typed_request['batch'])
+            else:
+                payload = _process_ctx_request(self.ctx, typed_request['args'])
             result_type = 'result'
             if isinstance(payload, exceptions.ScriptException):
                 payload = dict(message=str(payload))
@@ -129,7 +315,73 @@ class CtxProxy(object):
         self.close()
 
 
-def _process_ctx_request(ctx, args):
+class _UnixSocketServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+class _Fallback(Exception):
+    pass
+
+
+class _FallbackArgumentParser(argparse.ArgumentParser):
+    """
+    Leaves printing help and errors to the python client
+    """
+
+    def print_help(self, file=None):  # pylint: disable=redefined-builtin
+        raise _Fallback()
+
+    def error(self, message):
+        raise _Fallback()
+
+
+# Run by scripts as `ctx`. The request is made in a directory of its own (named by the pid of the
+# shell, which is unique among running processes), and the name of the directory is written to
+# the proxy's FIFO. Such a short write is atomic, so concurrent clients don't interleave.
+_CTX_SHIM = '''#! /bin/sh
+socket_dir={socket_dir}
+request="$socket_dir/requests/$$"
+if [ -p "$socket_dir/ctx.fifo" ] && mkdir "$request" 2>/dev/null; then
+    if mkfifo "$request/response" && printf '%s\\0' "$#" "$@" > "$request/args"; then
+        echo $$ > "$socket_dir/ctx.fifo"
+        exec 3< "$request/response"
+        read -r status <&3
+        case "$status" in
+            0) exec cat <&3 ;;
+            fallback) exec 3<&- ;;
+            *) cat <&3 >&2; exit 1 ;;
+        esac
+    fi
+fi
+exec {python} -m aria.orchestrator.execution_plugin.ctx_proxy.client "$@"
+'''
+
+
+def _process_ctx_batch_request(ctx, batch):
+    """
+    Process a list of requests (each a list of args) as one. Changes to dict properties made by
+    the requests are undone if any of the requests fails.
+    """
+    undo_log = []
+    results = []
+    try:
+        for args in batch:
+            result = _process_ctx_request(ctx, args, undo_log=undo_log)
+            if isinstance(result, exceptions.ScriptException):
+                # The operation is stopped, so the rest of the requests are irrelevant
+                return result
+            results.append(result)
+    except BaseException:
+        for obj, prop_name, value in reversed(undo_log):
+            if value is _MISSING:
+                del obj[prop_name]
+            else:
+                obj[prop_name] = value
+        raise
+    return results
+
+
+def _process_ctx_request(ctx, args, undo_log=None):
     current = ctx
     num_args = len(args)
     index = 0
@@ -140,7 +392,7 @@ def _process_ctx_request(ctx, args):
             current = getattr(current, attr)
         elif isinstance(current, collections.MutableMapping):
             key = arg
-            path_dict = _PathDictAccess(current)
+            path_dict = _PathDictAccess(current, undo_log=undo_log)
             if index + 1 == num_args:
                 # read dict prop by path
                 value = path_dict.get(key)
@@ -180,14 +432,24 @@ def _desugar_attr(obj, attr):
     return None
 
 
+_MISSING = object()
+
+
 class _PathDictAccess(object):
     pattern = re.compile(r"(.+)\[(\d+)\]")
 
-    def __init__(self, obj):
+    def __init__(self, obj, undo_log=None):
         self.obj = obj
+        # When given, a (dict, key, previous value) entry is appended for each change
+        self._undo_log = undo_log
 
     def set(self, prop_path, value):
         obj, prop_name = self._get_parent_obj_prop_name_by_path(prop_path)
+        self._set(obj, prop_name, value)
+
+    def _set(self, obj, prop_name, value):
+        if self._undo_log is not None:
+            self._undo_log.append((obj, prop_name, obj.get(prop_name, _MISSING)))
         obj[prop_name] = value
 
     def get(self, prop_path):
@@ -213,7 +475,7 @@ class _PathDictAccess(object):
                     if fail_on_missing:
                         self._raise_illegal(prop_path)
                     else:
-                        current[prop_segment] = {}
+                        self._set(current, prop_segment, {})
                 current = current[prop_segment]
         return current
 
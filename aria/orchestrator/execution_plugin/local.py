@@ -13,10 +13,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import contextlib
+import functools
+import gzip
+import io
+import logging
 import os
+import shutil
 import subprocess
+import tempfile
 import threading
-import StringIO
+import time
 
 from . import ctx_proxy
 from . import exceptions
@@ -25,6 +33,14 @@ from . import constants
 from . import environment_globals
 from . import python_script_scope
 
+_SPOOL_BUFFER_SIZE = 1024 * 1024
+
+# Compiled python scripts by path (most recently used last), along with the version of the file
+# they were compiled from
+_COMPILED_SCRIPTS_CACHE_SIZE = 100
+_compiled_scripts = collections.OrderedDict()
+_compiled_scripts_lock = threading.Lock()
+
 
 def run_script(ctx, script_path, process, **kwargs):
     if not script_path:
@@ -61,8 +77,30 @@ def _treat_script_as_powershell_script(script_path):
 
 
 def _eval_script_func(script_path, ctx, operation_kwargs, **_):
+    code = _compile_script(script_path)
+    script_globals = environment_globals.create_initial_globals(script_path)
     with python_script_scope(operation_ctx=ctx, operation_inputs=operation_kwargs):
-        execfile(script_path, environment_globals.create_initial_globals(script_path))
+        exec code in script_globals  # pylint: disable=exec-used
+
+
+def _compile_script(script_path):
+    """
+    Returns the code object of a python script, compiled only once for as long as the file
+    doesn't change
+    """
+    script_stat = os.stat(script_path)
+    version = (script_stat.st_ino, script_stat.st_size, script_stat.st_mtime)
+    with _compiled_scripts_lock:
+        compiled = _compiled_scripts.pop(script_path, None)
+    if compiled is None or compiled[0] != version:
+        with open(script_path, 'rU') as f:
+            # Only the future statements of the script apply, not those in effect in this module
+            compiled = (version, compile(f.read(), script_path, 'exec', dont_inherit=True))
+    with _compiled_scripts_lock:
+        _compiled_scripts[script_path] = compiled
+        while len(_compiled_scripts) > _COMPILED_SCRIPTS_CACHE_SIZE:
+            _compiled_scripts.popitem(last=False)
+    return compiled[1]
 
 
 def _execute_func(script_path, ctx, process, operation_kwargs):
@@ -76,8 +114,13 @@ def _execute_func(script_path, ctx, process, operation_kwargs):
     env.update(process['env'])
     ctx.logger.info('Executing: {0}'.format(command))
     common.patch_ctx(ctx)
-    with ctx_proxy.server.CtxProxy(ctx) as proxy:
+    spool_path = tempfile.mkdtemp(prefix='aria-output-') if process.get('spool_output') else None
+    output_log = _OutputLog(ctx.logger)
+    with _inputs_file(process, env), \
+            ctx_proxy.server.CtxProxy(ctx, unix_socket=not common.is_windows()) as proxy:
         env[ctx_proxy.client.CTX_SOCKET_URL] = proxy.socket_url
+        if proxy.bin_path:
+            env['PATH'] = os.pathsep.join([proxy.bin_path, env.get('PATH', '')])
         running_process = subprocess.Popen(
             command,
             shell=True,
@@ -87,11 +130,16 @@ def _execute_func(script_path, ctx, process, operation_kwargs):
             cwd=process.get('cwd'),
             bufsize=1,
             close_fds=not common.is_windows())
-        stdout_consumer = _OutputConsumer(running_process.stdout)
-        stderr_consumer = _OutputConsumer(running_process.stderr)
+        stdout_consumer = _OutputConsumer(running_process.stdout, output_log, logging.INFO,
+                                          spool_path and os.path.join(spool_path, 'stdout.gz'))
+        stderr_consumer = _OutputConsumer(running_process.stderr, output_log, logging.WARNING,
+                                          spool_path and os.path.join(spool_path, 'stderr.gz'))
         exit_code = running_process.wait()
     stdout_consumer.join()
     stderr_consumer.join()
+    output_log.flush()
+    if spool_path:
+        _store_output(ctx, spool_path)
     ctx.logger.info('Execution done (exit_code={0}): {1}'.format(exit_code, command))
 
     def error_check_func():
@@ -104,22 +152,127 @@ def _execute_func(script_path, ctx, process, operation_kwargs):
     return common.check_error(ctx, error_check_func=error_check_func)
 
 
+@contextlib.contextmanager
+def _inputs_file(process, env):
+    """
+    Writes the inputs to a file for as long as the script runs, when the process has inputs_file
+    set, and points the environment of the script to it
+    """
+    if 'inputs_json' not in process:
+        yield
+        return
+    # Created readable by the user alone, as inputs may hold secrets
+    file_descriptor, inputs_path = tempfile.mkstemp(prefix='aria-inputs-', suffix='.json')
+    try:
+        with os.fdopen(file_descriptor, 'wb') as f:
+            f.write(process['inputs_json'])
+        env[constants.INPUTS_FILE_ENV_VAR] = inputs_path
+        yield
+    finally:
+        os.remove(inputs_path)
+
+
+def _store_output(ctx, spool_path):
+    resource_path = '{0}/{1}'.format(constants.OUTPUT_RESOURCE_PATH, ctx.task.id)
+    try:
+        ctx.resource.deployment.upload(entry_id=str(ctx.deployment.id),
+                                       source=spool_path,
+                                       path=resource_path)
+    finally:
+        shutil.rmtree(spool_path, ignore_errors=True)
+    ctx.logger.info('Output stored in deployment resource {0}'.format(resource_path))
+
+
+class _OutputLog(object):
+    """
+    Logs lines of output as they arrive, at a limited rate. Lines beyond the rate are counted, and
+    the count is logged once lines are logged again.
+    """
+
+    def __init__(self,
+                 logger,
+                 lines_per_second=constants.OUTPUT_LOG_LINES_PER_SECOND,
+                 burst=constants.OUTPUT_LOG_BURST):
+        self._logger = logger
+        self._lines_per_second = lines_per_second
+        self._burst = burst
+        self._allowance = burst
+        self._last_time = time.time()
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def log(self, level, line):
+        with self._lock:
+            now = time.time()
+            elapsed = now - self._last_time
+            self._allowance = min(self._burst,
+                                  self._allowance + elapsed * self._lines_per_second)
+            self._last_time = now
+            if self._allowance < 1:
+                self._dropped += 1
+                return
+            self._allowance -= 1
+            dropped, self._dropped = self._dropped, 0
+        self._log_dropped(dropped)
+        self._logger.log(level, line)
+
+    def flush(self):
+        with self._lock:
+            dropped, self._dropped = self._dropped, 0
+        self._log_dropped(dropped)
+
+    def _log_dropped(self, dropped):
+        if dropped:
+            self._logger.warning('{0} lines of output were not logged'.format(dropped))
+
+
 class _OutputConsumer(object):
+    """
+    Logs the lines of an output stream while keeping only its tail (and, with a spool path, all of
+    it, compressed).
+    """
 
-    def __init__(self, out):
+    def __init__(self, out, output_log, level, spool_path=None):
         self._out = out
-        self._buffer = StringIO.StringIO()
+        self._output_log = output_log
+        self._level = level
+        self._spool_path = spool_path
+        self._tail = []
+        self._tail_size = 0
         self._consumer = threading.Thread(target=self._consume_output)
         self._consumer.daemon = True
         self._consumer.start()
 
     def _consume_output(self):
-        for line in iter(self._out.readline, b''):
-            self._buffer.write(line)
-        self._out.close()
+        # Compressing as fast as possible, and in large chunks rather than line by line, so that
+        # scripts aren't held back by a full pipe
+        spool = io.BufferedWriter(gzip.open(self._spool_path, 'wb', compresslevel=1),
+                                  _SPOOL_BUFFER_SIZE) if self._spool_path else None
+        try:
+            # Lines longer than the tail are read in parts
+            for line in iter(functools.partial(self._out.readline, constants.OUTPUT_TAIL_SIZE),
+                             b''):
+                self._tail.append(line)
+                self._tail_size += len(line)
+                if self._tail_size > 2 * constants.OUTPUT_TAIL_SIZE:
+                    # Trimmed only once in a while, as that is cheaper than doing it per line
+                    self._tail = [self.read_output()]
+                    self._tail_size = len(self._tail[0])
+                self._output_log.log(self._level, line.rstrip('\r\n'))
+                if spool:
+                    spool.write(line)
+        finally:
+            if spool:
+                spool.close()
+            self._out.close()
 
     def read_output(self):
-        return self._buffer.getvalue()
+        output = b''.join(self._tail)
+        if len(output) > constants.OUTPUT_TAIL_SIZE:
+            output = output[-constants.OUTPUT_TAIL_SIZE:]
+            # Starts with a whole line (unless it's all one line)
+            output = output[output.find(b'\n') + 1:]
+        return output
 
     def join(self):
         self._consumer.join()
@@ -61,3 +61,20 @@ def run_commands_with_ssh(ctx,
         fabric_env=fabric_env,
         use_sudo=use_sudo,
         hide_output=hide_output)
+
+
+@operation
+def run_commands_on_hosts_with_ssh(ctx,
+                                   commands,
+                                   hosts,
+                                   fabric_env=None,
+                                   use_sudo=False,
+                                   hide_output=None,
+                                   **_):
+    return ssh_operations.run_commands_on_hosts(
+        ctx=ctx,
+        commands=commands,
+        hosts=hosts,
+        fabric_env=fabric_env,
+        use_sudo=use_sudo,
+        hide_output=hide_output)
@@ -13,27 +13,37 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
 import os
+import pipes
 import random
 import string
+import tarfile
 import tempfile
+import threading
+import time
+import Queue
 import StringIO
 
 import fabric.api
 import fabric.context_managers
-import fabric.contrib.files
+import fabric.state
 
+from ... import events
 from .. import constants
 from .. import exceptions
 from .. import common
 from .. import ctx_proxy
-from . import tunnel
+from . import pool
 
 
 _PROXY_CLIENT_PATH = ctx_proxy.client.__file__
 if _PROXY_CLIENT_PATH.endswith('.pyc'):
     _PROXY_CLIENT_PATH = _PROXY_CLIENT_PATH[:-1]
 
+# Exit code of the upload command when the ctx client is missing on the host
+_MISSING_CTX_EXIT_CODE = 100
+
 
 def run_commands(ctx, commands, fabric_env, use_sudo, hide_output, **_):
     """Runs the provider 'commands' in sequence
@@ -43,16 +53,128 @@ def run_commands(ctx, commands, fabric_env, use_sudo, hide_output, **_):
     """
     with fabric.api.settings(_hide_output(ctx, groups=hide_output),
                              **_fabric_env(ctx, fabric_env, warn_only=True)):
-        for command in commands:
-            ctx.logger.info('Running command: {0}'.format(command))
-            run = fabric.api.sudo if use_sudo else fabric.api.run
-            result = run(command)
-            if result.failed:
-                raise exceptions.ProcessException(
-                    command=result.command,
-                    exit_code=result.return_code,
-                    stdout=result.stdout,
-                    stderr=result.stderr)
+        with _session(ctx):
+            for command in commands:
+                ctx.logger.info('Running command: {0}'.format(command))
+                run = fabric.api.sudo if use_sudo else fabric.api.run
+                result = run(command)
+                if result.failed:
+                    raise exceptions.ProcessException(
+                        command=result.command,
+                        exit_code=result.return_code,
+                        stdout=result.stdout,
+                        stderr=result.stderr)
+
+
+def run_commands_on_hosts(ctx, commands, hosts, fabric_env, use_sudo, hide_output, **_):
+    """Runs the provided 'commands' in sequence on each of 'hosts', on several hosts at a time
+
+    The results are stored per host in a runtime property of the node instance. If the commands
+    fail on some of the hosts the task is retried, running the commands again only on those hosts.
+    Unlike :code:`run_commands`, commands don't run in a pty.
+
+    :param commands: a list of commands to run
+    :param hosts: a list of host strings
+    :param fabric_env: fabric configuration (its pool_size bounds the number of hosts the commands
+                       run on at a time)
+    """
+    with fabric.api.settings(_hide_output(ctx, groups=hide_output),
+                             **_fabric_env(ctx, fabric_env, warn_only=True, hosts=hosts)):
+        stored_results = ctx.node_instance.runtime_properties.get(
+            constants.HOSTS_RESULTS_PROPERTY) or {}
+        results = {}
+        if stored_results.get('task_id') == ctx.task.id:
+            # Hosts on which previous attempts of the task succeeded are skipped
+            results.update(stored_results['hosts'])
+        pending_hosts = [host for host in hosts
+                         if not results.get(host, {}).get('succeeded')]
+        pool_size = fabric.state.env.pool_size or constants.DEFAULT_HOSTS_POOL_SIZE
+        results.update(_run_on_hosts(
+            lambda host: _run_commands_on_host(ctx, host, commands, use_sudo),
+            hosts=pending_hosts,
+            pool_size=pool_size))
+    ctx.node_instance.runtime_properties[constants.HOSTS_RESULTS_PROPERTY] = {
+        'task_id': ctx.task.id,
+        'hosts': results
+    }
+    failed_hosts = [host for host in hosts if not results[host]['succeeded']]
+    ctx.logger.info('Commands succeeded on {0} of {1} hosts'.format(
+        len(hosts) - len(failed_hosts), len(hosts)))
+    if failed_hosts:
+        ctx.task.retry('Commands failed on {0} of {1} hosts: {2}'.format(
+            len(failed_hosts), len(hosts), ', '.join(failed_hosts)))
+
+
+def _run_on_hosts(func, hosts, pool_size):
+    """
+    Calls ``func`` with each of ``hosts``, in up to ``pool_size`` threads
+
+    :return: a dict from each host to what ``func`` returned for it
+    """
+    queue = Queue.Queue()
+    for host in hosts:
+        queue.put(host)
+    results = {}
+
+    def process():
+        while True:
+            try:
+                host = queue.get_nowait()
+            except Queue.Empty:
+                return
+            results[host] = func(host)
+
+    threads = []
+    for _ in range(min(pool_size, len(hosts))):
+        thread = threading.Thread(target=process)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _run_commands_on_host(ctx, host_string, commands, use_sudo):
+    executed = []
+    error = None
+    try:
+        with _session(ctx, host_string) as session:
+            for command in commands:
+                ctx.logger.info('Running command on {0}: {1}'.format(host_string, command))
+                exit_code, stdout, stderr = session.execute(*_wrap_command(command, use_sudo))
+                executed.append({'command': command, 'exit_code': exit_code})
+                if exit_code:
+                    error = (stderr or stdout)[-constants.HOSTS_RESULTS_OUTPUT_SIZE:]
+                    break
+    except Exception as e:  # pylint: disable=broad-except
+        # Connecting failed (fabric aborts with a TaskException), or the connection was lost
+        error = str(e) or repr(e)
+    if error is not None:
+        ctx.logger.error('Commands failed on {0}: {1}'.format(host_string, error))
+    return {
+        'succeeded': error is None,
+        'commands': executed,
+        'error': error
+    }
+
+
+def _wrap_command(command, use_sudo):
+    """
+    Wraps a command the way fabric does, given that there's no pty through which to answer the
+    password prompt of sudo (the password is read from stdin instead, and only to refresh the
+    credentials of sudo, so that it doesn't reach the command)
+
+    :return: the wrapped command and its stdin
+    """
+    env = fabric.state.env
+    command = '{0} {1}'.format(env.shell, pipes.quote(command))
+    if not use_sudo:
+        return command, ''
+    password = env.get('sudo_password') or env.password
+    if not password:
+        return 'sudo -n {0}'.format(command), ''
+    return "sudo -S -p '' -v && sudo -n {0} < /dev/null".format(command), '{0}\n'.format(password)
 
 
 def run_script(ctx, script_path, fabric_env, process, use_sudo, hide_output, **kwargs):
@@ -61,44 +183,95 @@ def run_script(ctx, script_path, fabric_env, process, use_sudo, hide_output, **k
                    local_script_path=common.download_script(ctx, script_path))
     with fabric.api.settings(_hide_output(ctx, groups=hide_output),
                              **_fabric_env(ctx, fabric_env, warn_only=False)):
-        # the remote host must have the ctx before running any fabric scripts
-        if not fabric.contrib.files.exists(paths.remote_ctx_path):
-            # there may be race conditions with other operations that
-            # may be running in parallel, so we pass -p to make sure
-            # we get 0 exit code if the directory already exists
-            fabric.api.run('mkdir -p {0} && mkdir -p {1}'.format(paths.remote_scripts_dir,
-                                                                 paths.remote_work_dir))
-            # this file has to be present before using ctx
-            fabric.api.put(_PROXY_CLIENT_PATH, paths.remote_ctx_path)
-        _patch_ctx(ctx)
-        process = common.create_process_config(
-            script_path=paths.remote_script_path,
-            process=process,
-            operation_kwargs=kwargs,
-            quote_json_env_vars=True)
-        fabric.api.put(paths.local_script_path, paths.remote_script_path)
-        with ctx_proxy.server.CtxProxy(ctx) as proxy:
-            local_port = proxy.port
-            with fabric.context_managers.cd(process.get('cwd', paths.remote_work_dir)):  # pylint: disable=not-context-manager
-                with tunnel.remote(ctx, local_port=local_port) as remote_port:
-                    local_socket_url = proxy.socket_url
-                    remote_socket_url = local_socket_url.replace(str(local_port), str(remote_port))
+        with _session(ctx) as session:
+            _patch_ctx(ctx)
+            process = common.create_process_config(
+                script_path=paths.remote_script_path,
+                process=process,
+                operation_kwargs=kwargs,
+                quote_json_env_vars=True)
+            with ctx_proxy.server.CtxProxy(ctx) as proxy:
+                # The ctx client on the host reaches the proxy through the tunnel of the session
+                with session.tunnel.route(local_port=proxy.port) as route_path:
                     env_script = _write_environment_script_file(
                         process=process,
                         paths=paths,
-                        local_socket_url=local_socket_url,
-                        remote_socket_url=remote_socket_url)
-                    fabric.api.put(env_script, paths.remote_env_script_path)
-                    try:
-                        command = 'source {0} && {1}'.format(paths.remote_env_script_path,
-                                                             process['command'])
-                        run = fabric.api.sudo if use_sudo else fabric.api.run
-                        run(command)
-                    except exceptions.TaskException:
-                        return common.check_error(ctx, reraise=True)
+                        local_socket_url=proxy.socket_url,
+                        remote_socket_url='http://localhost:{0}{1}'.format(
+                            session.tunnel.remote_port, route_path))
+                    _upload(session, paths, env_script, process.get('inputs_json'))
+                    with fabric.context_managers.cd(process.get('cwd', paths.remote_work_dir)):  # pylint: disable=not-context-manager
+                        try:
+                            command = 'source {0} && {1}'.format(paths.remote_env_script_path,
+                                                                 process['command'])
+                            run = fabric.api.sudo if use_sudo else fabric.api.run
+                            run(command)
+                        except exceptions.TaskException:
+                            return common.check_error(ctx, reraise=True)
             return common.check_error(ctx)
 
 
+def _session(ctx, host_string=None):
+    # The operations of a workflow execution share sessions, which are closed once it ends
+    return pool.session(host_string, scope=ctx.task.execution.id)
+
+
+@events.on_success_workflow_signal.connect
+@events.on_failure_workflow_signal.connect
+@events.on_cancelled_workflow_signal.connect
+def _close_sessions(workflow_context, **_):
+    pool.close_sessions(scope=workflow_context.execution.id)
+
+
+def _upload(session, paths, env_script, inputs_json=None):
+    """
+    Uploads the script, its environment script and its inputs file (if any) in one archive,
+    extracted by a single command.
+    The ctx client is included only if it wasn't already uploaded through the session (and if it
+    was since removed from the host, the upload is retried with it).
+    """
+    upload_ctx = paths.remote_ctx_path not in session.ctx_paths
+    archive = StringIO.StringIO()
+    with contextlib.closing(tarfile.open(fileobj=archive, mode='w:gz')) as tar:
+        _add_to_archive(tar, paths, paths.remote_script_path, paths.local_script_path)
+        _add_to_archive(tar, paths, paths.remote_env_script_path, content=env_script.getvalue())
+        if inputs_json is not None:
+            # Readable by the user alone, as inputs may hold secrets
+            _add_to_archive(tar, paths, paths.remote_inputs_path, content=inputs_json, mode=0600)
+        if upload_ctx:
+            _add_to_archive(tar, paths, paths.remote_ctx_path, _PROXY_CLIENT_PATH)
+    # There may be race conditions with other operations that may be running in parallel, so we
+    # pass -p to make sure we get 0 exit code if the directory already exists
+    command = 'mkdir -p {0} {1} && tar -xzf - -C {2}'.format(paths.remote_scripts_dir,
+                                                            paths.remote_work_dir,
+                                                            paths.remote_ctx_dir)
+    if not upload_ctx:
+        command = '{0} && {{ test -f {1} || exit {2}; }}'.format(command, paths.remote_ctx_path,
+                                                               _MISSING_CTX_EXIT_CODE)
+    exit_code, stdout, stderr = session.execute(command, stdin=archive.getvalue())
+    if exit_code == _MISSING_CTX_EXIT_CODE and not upload_ctx:
+        session.ctx_paths.discard(paths.remote_ctx_path)
+        return _upload(session, paths, env_script, inputs_json)
+    if exit_code:
+        raise exceptions.ProcessException(command=command,
+                                          exit_code=exit_code,
+                                          stdout=stdout,
+                                          stderr=stderr)
+    session.ctx_paths.add(paths.remote_ctx_path)
+
+
+def _add_to_archive(tar, paths, remote_path, local_path=None, content=None, mode=0755):
+    if content is None:
+        with open(local_path, 'rb') as f:
+            content = f.read()
+    # Relative to the base dir, where the archive is extracted
+    tar_info = tarfile.TarInfo(remote_path[len(paths.remote_ctx_dir) + 1:])
+    tar_info.size = len(content)
+    tar_info.mode = mode
+    tar_info.mtime = time.time()
+    tar.addfile(tar_info, StringIO.StringIO(content))
+
+
 def _patch_ctx(ctx):
     common.patch_ctx(ctx)
     original_download_resource = ctx.download_resource
@@ -138,16 +311,20 @@ def _hide_output(ctx, groups):
     return fabric.api.hide(*groups)
 
 
-def _fabric_env(ctx, fabric_env, warn_only):
+def _fabric_env(ctx, fabric_env, warn_only, hosts=None):
     """Prepares fabric environment variables configuration"""
     ctx.logger.debug('Preparing fabric environment...')
     env = constants.FABRIC_ENV_DEFAULTS.copy()
     env.update(fabric_env or {})
     env.setdefault('warn_only', warn_only)
-    if 'host_string' not in env:
+    if hosts is not None:
+        # The host string is given per host instead
+        if not hosts:
+            ctx.task.abort('`hosts` not supplied')
+    elif 'host_string' not in env:
         env['host_string'] = ctx.task.runs_on.ip
     # validations
-    if not env.get('host_string'):
+    if hosts is None and not env.get('host_string'):
         ctx.task.abort('`host_string` not supplied and ip cannot be deduced automatically')
     if not (env.get('password') or env.get('key_filename') or env.get('key')):
         ctx.task.abort(
@@ -170,6 +347,10 @@ def _write_environment_script_file(process, paths, local_socket_url, remote_sock
         ctx_proxy.client.CTX_SOCKET_URL: remote_socket_url,
         'LOCAL_{0}'.format(ctx_proxy.client.CTX_SOCKET_URL): local_socket_url
     })
+    if 'inputs_json' in process:
+        # The inputs may hold secrets, so remove them once the command is done, however it ends
+        env_script.write("trap 'rm -f {0}' EXIT\n".format(paths.remote_inputs_path))
+        env[constants.INPUTS_FILE_ENV_VAR] = paths.remote_inputs_path
     for key, value in env.iteritems():
         env_script.write('export {0}={1}\n'.format(key, value))
     return env_script
@@ -189,4 +370,6 @@ class _Paths(object):
         remote_path_suffix = '{0}-{1}'.format(self.base_script_path, random_suffix)
         self.remote_env_script_path = '{0}/env-{1}'.format(self.remote_scripts_dir,
                                                            remote_path_suffix)
+        self.remote_inputs_path = '{0}/inputs-{1}.json'.format(self.remote_scripts_dir,
+                                                              remote_path_suffix)
         self.remote_script_path = '{0}/{1}'.format(self.remote_scripts_dir, remote_path_suffix)
@@ -0,0 +1,204 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A pool of ssh sessions, shared by the operations that run on the same host.
+
+Fabric caches its connections by host string alone, in a global that any fabric call may connect
+through. Operations instead get their connection from the pool (see :code:`session`), which keys
+connections by the credentials they were made with as well, and keeps the state the operations
+share along with them. Sessions are shared within a scope (e.g. a workflow execution) alone, and
+are closed along with it (see :code:`close_sessions`).
+"""
+
+import contextlib
+import socket
+import threading
+
+import fabric.network
+import fabric.state
+
+from . import tunnel
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class Session(object):
+    """
+    A connection to a host, along with a reverse tunnel from the host to the ctx proxies of the
+    operations (see :code:`tunnel.RemoteTunnel`), and the paths to which the ctx client was
+    uploaded.
+    """
+
+    def __init__(self, host_string):
+        self.host_string = host_string
+        self.ctx_paths = set()
+        self._client = None
+        self._tunnel = None
+        self._users = 0
+        self._closing = False
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        The paramiko client of the session, connected with the current fabric env
+        """
+        with self._lock:
+            if self._client is None:
+                # Connects with fabric, the way fabric itself would
+                self._client = fabric.state.connections[self.host_string]
+                _set_nodelay(self._client)
+            return self._client
+
+    @property
+    def tunnel(self):
+        client = self.client
+        with self._lock:
+            if self._tunnel is None:
+                self._tunnel = tunnel.RemoteTunnel(client.get_transport())
+            return self._tunnel
+
+    @property
+    def active(self):
+        if self._tunnel is not None and self._tunnel.closed:
+            return False
+        transport = self._client.get_transport() if self._client else None
+        return self._client is None or (transport is not None and transport.is_active())
+
+    def execute(self, command, stdin=''):
+        """
+        Executes a command (without fabric's wrapping), writing ``stdin`` to it
+
+        :return: the exit code, stdout and stderr of the command
+        """
+        channel = self.client.get_transport().open_session()
+        try:
+            channel.exec_command(command)
+            channel.sendall(stdin)
+            channel.shutdown_write()
+            stdout = channel.makefile('rb').read()
+            stderr = channel.makefile_stderr('rb').read()
+            return channel.recv_exit_status(), stdout, stderr
+        finally:
+            channel.close()
+
+    def _use(self):
+        """
+        Starts using the session right away (so that it isn't closed meanwhile)
+
+        :return: a context manager providing the session, until done using it
+        """
+        # Fabric calls made meanwhile use the connection of the session. If the session didn't
+        # connect yet, a connection made by such calls becomes the session's.
+        connections = fabric.state.connections
+        with self._lock:
+            if self._users == 0:
+                if self._client is not None:
+                    connections[self.host_string] = self._client
+                else:
+                    # Possibly made with other credentials
+                    dict.pop(connections, self.host_string, None)
+            self._users += 1
+        return self._used()
+
+    @contextlib.contextmanager
+    def _used(self):
+        connections = fabric.state.connections
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._users -= 1
+                if self._users:
+                    client = dict.get(connections, self.host_string)
+                else:
+                    client = dict.pop(connections, self.host_string, None)
+                if self._client is None and client is not None:
+                    _set_nodelay(client)
+                    self._client = client
+                close = self._closing and not self._users
+            if close:
+                self._close()
+
+    def close(self):
+        """
+        Closes the session, or once the operations using it are done when it is in use
+        """
+        with self._lock:
+            self._closing = True
+            if self._users:
+                return
+        self._close()
+
+    def _close(self):
+        if self._tunnel is not None:
+            self._tunnel.close()
+        if self._client is not None:
+            self._client.close()
+
+
+def _set_nodelay(client):
+    # The exchanges over the connection are small and interactive (commands, their exit codes,
+    # the requests of the ctx client), and would otherwise be held back by Nagle's algorithm
+    sock = client.get_transport().sock
+    if isinstance(sock, socket.socket):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+def session(host_string=None, scope=None):
+    """
+    Returns a context manager providing the session of a host (by default, the host in the current
+    fabric env) in a scope, connected with the credentials in the current fabric env (or None when
+    there is no host)
+    """
+    env = fabric.state.env
+    host_string = host_string or env.host_string
+    if not host_string:
+        return _no_session()
+    user, host, port = fabric.network.normalize(host_string)
+    key_filename = env.key_filename
+    if isinstance(key_filename, list):
+        key_filename = tuple(key_filename)
+    key = (scope, host, user, port, key_filename, env.get('key'), env.password)
+    replaced_session = None
+    with _sessions_lock:
+        pooled_session = _sessions.get(key)
+        if pooled_session is None or not pooled_session.active:
+            replaced_session = pooled_session
+            pooled_session = _sessions[key] = Session(
+                fabric.network.join_host_strings(user, host, port))
+        session_in_use = pooled_session._use()
+    if replaced_session is not None:
+        # Its connection or its tunnel was lost
+        replaced_session.close()
+    return session_in_use
+
+
+@contextlib.contextmanager
+def _no_session():
+    yield None
+
+
+def close_sessions(scope=None):
+    """
+    Closes the sessions of a scope (by default, of all scopes)
+    """
+    with _sessions_lock:
+        keys = [key for key in _sessions if scope is None or key[0] == scope]
+        sessions = [_sessions.pop(key) for key in keys]
+    for pooled_session in sessions:
+        pooled_session.close()
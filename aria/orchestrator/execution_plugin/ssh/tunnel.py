@@ -1,91 +1,304 @@
-# This implementation was copied from the Fabric project directly:
+# This implementation was originally copied from the Fabric project directly:
 # https://github.com/fabric/fabric/blob/master/fabric/context_managers.py#L486
 # The purpose was to remove the rtunnel creation printouts here:
 # https://github.com/fabric/fabric/blob/master/fabric/context_managers.py#L547
 
 
 import contextlib
+import errno
 import select
 import socket
+import threading
+import uuid
 
-import fabric.api
-import fabric.state
-import fabric.thread_handling
+import paramiko.pipe
 
+from aria import logger
 
-@contextlib.contextmanager
-def remote(ctx, local_port, remote_port=0, local_host='localhost', remote_bind_address='127.0.0.1'):
-    """Create a tunnel forwarding a locally-visible port to the remote target."""
-    sockets = []
-    channels = []
-    thread_handlers = []
+_MAX_REQUEST_LINE_LENGTH = 8192
+# Data is read in chunks of this size, and no more is read from a side while this much is still
+# waiting to be written to the other
+_BUFFER_SIZE = 64 * 1024
+# How often channels that couldn't be written to (as their window is full) are tried again
+_CHANNEL_SEND_INTERVAL = 0.001
 
-    def accept(channel, *args, **kwargs):
+
+class RemoteTunnel(object):
+    """
+    A tunnel from a port on the remote host to local ports, shared by the operations running on
+    the host. Each operation gets a route (see :code:`route`), to which the http requests of its
+    ctx client are forwarded according to their path.
+    """
+
+    def __init__(self, transport, remote_bind_address='127.0.0.1'):
+        self._routes = {}
+        self._transport = transport
+        self._remote_bind_address = remote_bind_address
+        self._forwarder = _Forwarder()
+        self.remote_port = transport.request_port_forward(remote_bind_address, 0,
+                                                          handler=self._accept)
+
+    @contextlib.contextmanager
+    def route(self, local_port, local_host='localhost'):
+        """
+        Routes requests to a local port for as long as the context lasts
+
+        :return: the path of the route (to be requested on the remote port)
+        """
+        token = uuid.uuid4().hex
+        self._routes[token] = (local_host, local_port)
+        try:
+            yield '/{0}'.format(token)
+        finally:
+            del self._routes[token]
+
+    @property
+    def closed(self):
+        """
+        Whether the tunnel stopped forwarding, as it was closed or forwarding failed
+        """
+        return self._forwarder.closed
+
+    def close(self):
+        if self._transport.is_active():
+            self._transport.cancel_port_forward(self._remote_bind_address, self.remote_port)
+        self._forwarder.close()
+
+    def _accept(self, channel, *args, **kwargs):
         # This seemingly innocent statement seems to be doing nothing
         # but the truth is far from it!
         # calling fileno() on a paramiko channel the first time, creates
         # the required plumbing to make the channel valid for select.
-        # While this would generally happen implicitly inside the _forwarder
-        # function when select is called, it may already be too late and may
+        # While this would generally happen implicitly inside the forwarder
+        # when select is called, it may already be too late and may
         # cause the select loop to hang.
         # Specifically, when new data arrives to the channel, a flag is set
         # on an "event" object which is what makes the select call work.
         # problem is this will only happen if the event object is not None
         # and it will be not-None only after channel.fileno() has been called
-        # for the first time. If we wait until _forwarder calls select for the
+        # for the first time. If we wait until the forwarder calls select for the
         # first time it may be after initial data has reached the channel.
         # calling it explicitly here in the paramiko transport main event loop
         # guarantees this will not happen.
         channel.fileno()
+        self._forwarder.add(_Connection(channel, self._connect))
 
-        channels.append(channel)
+    def _connect(self, request_line):
+        """
+        Connects to the route picked by a request line (e.g. "POST /<token> HTTP/1.1")
+
+        :return: the (non-blocking) socket connecting to the route and the request line to pass on
+                 (without the token), or None when there's no such route
+        """
+        parts = request_line.split(' ', 2)
+        address = self._routes.get(parts[1].strip('/')) if len(parts) == 3 else None
+        if address is None:
+            return None
         sock = socket.socket()
-        sockets.append(sock)
+        sock.setblocking(0)
+        # Connected once writable (a failure to connect surfaces when sending)
+        sock.connect_ex(address)
+        return sock, '{0} / {1}'.format(parts[0], parts[2])
+
+
+class _Forwarder(logger.LoggerMixin):
+    """
+    Forwards data between the channels of a tunnel and the sockets they are connected to, all in
+    one thread (rather than a thread per channel)
+    """
+
+    def __init__(self):
+        super(_Forwarder, self).__init__()
+        self._connections = []
+        self._added = []
+        self._closed = False
+        self._lock = threading.Lock()
+        # Wakes the thread up when connections are added or the forwarder is closed
+        self._wakeup = paramiko.pipe.make_pipe()
+        self._thread = threading.Thread(target=self._forward)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def add(self, connection):
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._added.append(connection)
+        if closed:
+            connection.close()
+        else:
+            self._wakeup.set()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        self._wakeup.close()
 
+    def _forward(self):
         try:
-            sock.connect((local_host, local_port))
-        except Exception as e:
+            while not self._closed:
+                try:
+                    self._forward_ready()
+                except Exception:
+                    if not self._connections:
+                        raise
+                    # Possibly caused by any of the connections, which can't be told apart
+                    self.logger.exception('Forwarding failed, closing all tunnel connections')
+                    self._close_connections()
+        except Exception:
+            self.logger.exception('Forwarding failed, closing the tunnel')
+        finally:
+            with self._lock:
+                self._closed = True
+            self._close_connections()
+
+    def _forward_ready(self):
+        """
+        Waits for any of the connections to be ready, and pumps the ready ones
+        """
+        self._wakeup.clear()
+        with self._lock:
+            self._connections.extend(self._added)
+            del self._added[:]
+        if self._closed:
+            return
+        readers = [self._wakeup]
+        writers = []
+        # The connections of the channels and sockets, and the connections that are waiting to
+        # write to their channel (whose readiness select can't tell)
+        connections = {}
+        pending = []
+        for connection in self._connections:
+            for reader in connection.readers():
+                readers.append(reader)
+                connections[reader] = connection
+            for writer in connection.writers():
+                writers.append(writer)
+                connections[writer] = connection
+            if connection.sending_to_channel:
+                pending.append(connection)
+        try:
+            readable, writable = select.select(readers, writers, [],
+                                               _CHANNEL_SEND_INTERVAL if pending else None)[:2]
+        except select.error as e:
+            # Not a socket.error on python 2
+            if e.args[0] == errno.EINTR:
+                return
+            raise
+        readable = set(readable)
+        writable = set(writable)
+        ready = set(pending)
+        ready.update(connections[ready_object] for ready_object in readable | writable
+                     if ready_object is not self._wakeup)
+        for connection in ready:
+            try:
+                connection.pump(readable, writable)
+            except Exception:
+                self.logger.exception('Forwarding failed, closing the tunnel connection')
+                connection.close()
+        if any(connection.closed for connection in ready):
+            self._connections = [connection for connection in self._connections
+                                 if not connection.closed]
+
+    def _close_connections(self):
+        with self._lock:
+            self._connections.extend(self._added)
+            del self._added[:]
+        connections, self._connections = self._connections, []
+        for connection in connections:
             try:
-                channel.close()
-            except Exception as ex2:
-                close_error = ' (While trying to close channel: {0})'.format(ex2)
-            else:
-                close_error = ''
-            ctx.task.abort('[{0}] rtunnel: cannot connect to {1}:{2} ({3}){4}'
-                           .format(fabric.api.env.host_string, local_host, local_port, e,
-                                   close_error))
-
-        thread_handler = fabric.thread_handling.ThreadHandler('fwd', _forwarder, channel, sock)
-        thread_handlers.append(thread_handler)
-
-    transport = fabric.state.connections[fabric.api.env.host_string].get_transport()
-    remote_port = transport.request_port_forward(
-        remote_bind_address, remote_port, handler=accept)
-
-    try:
-        yield remote_port
-    finally:
-        for sock, chan, thread_handler in zip(sockets, channels, thread_handlers):
-            sock.close()
-            chan.close()
-            thread_handler.thread.join()
-            thread_handler.raise_if_needed()
-        transport.cancel_port_forward(remote_bind_address, remote_port)
-
-
-def _forwarder(chan, sock):
-    # Bidirectionally forward data between a socket and a Paramiko channel.
-    while True:
-        read = select.select([sock, chan], [], [])[0]
-        if sock in read:
-            data = sock.recv(1024)
-            if len(data) == 0:
-                break
-            chan.send(data)
-        if chan in read:
-            data = chan.recv(1024)
-            if len(data) == 0:
-                break
-            sock.send(data)
-    chan.close()
-    sock.close()
+                connection.close()
+            except Exception:
+                self.logger.exception('Failed closing a tunnel connection')
+
+
+class _Connection(object):
+    """
+    A channel of a tunnel and the socket it is connected to, once its request line was read and
+    routed
+    """
+
+    def __init__(self, channel, connect):
+        self._channel = channel
+        self._channel.setblocking(0)
+        self._connect = connect
+        self._sock = None
+        self._request_line = ''
+        self._to_sock = ''
+        self._to_channel = ''
+        self._eof = False
+        self.closed = False
+
+    @property
+    def sending_to_channel(self):
+        return bool(self._to_channel)
+
+    def readers(self):
+        readers = []
+        if not self._eof:
+            if len(self._to_sock) < _BUFFER_SIZE:
+                readers.append(self._channel)
+            if self._sock is not None and len(self._to_channel) < _BUFFER_SIZE:
+                readers.append(self._sock)
+        return readers
+
+    def writers(self):
+        return [self._sock] if self._to_sock else []
+
+    def pump(self, readable, writable):
+        try:
+            if self._channel in readable:
+                self._receive_from_channel()
+                if self.closed:
+                    return
+            if self._sock is not None and self._sock in readable:
+                data = self._sock.recv(_BUFFER_SIZE)
+                self._eof = self._eof or not data
+                self._to_channel += data
+            if self._to_sock and self._sock in writable:
+                sent = self._sock.send(self._to_sock)
+                self._to_sock = self._to_sock[sent:]
+            if self._to_channel and self._channel.send_ready():
+                sent = self._channel.send(self._to_channel)
+                self._to_channel = self._to_channel[sent:]
+        except socket.timeout:
+            # The window of the channel is full
+            pass
+        except socket.error as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                self.close()
+                return
+        # Either side ending ends both, once what was read was passed on
+        if self._eof and not self._to_sock and not self._to_channel:
+            self.close()
+
+    def _receive_from_channel(self):
+        data = self._channel.recv(_BUFFER_SIZE)
+        if not data:
+            self._eof = True
+        elif self._sock is not None:
+            self._to_sock += data
+        else:
+            self._request_line += data
+            request_line, newline, rest = self._request_line.partition('\n')
+            if newline:
+                connected = self._connect(request_line)
+                if connected is None:
+                    self.close()
+                    return
+                self._sock, request_line = connected
+                self._to_sock = '{0}\n{1}'.format(request_line, rest)
+            elif len(self._request_line) >= _MAX_REQUEST_LINE_LENGTH:
+                self.close()
+
+    def close(self):
+        self.closed = True
+        self._channel.close()
+        if self._sock is not None:
+            self._sock.close()
@@ -67,7 +67,8 @@ class Runner(object):
         self._engine = Engine(
             executor=ThreadExecutor(),
             workflow_context=workflow_context,
-            tasks_graph=tasks_graph)
+            tasks_graph=tasks_graph,
+            cache_models=True)
 
     def run(self):
         try:
@@ -21,12 +21,14 @@ from .workflows import install_node_instance
 from .utils import create_node_instance_task_dependencies
 from ..api.task import WorkflowTask
 from ... import workflow
+from ....storage.api import DEFAULT_BATCH_SIZE
 
 
 @workflow
 def install(ctx, graph):
     tasks_and_node_instances = []
-    for node_instance in ctx.model.node_instance.iter():
+    for node_instance in ctx.model.node_instance.iter(eager_load='workflow',
+                                                      batch_size=DEFAULT_BATCH_SIZE):
         tasks_and_node_instances.append((
             WorkflowTask(install_node_instance, node_instance=node_instance),
             node_instance))
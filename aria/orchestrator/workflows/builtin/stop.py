@@ -20,9 +20,11 @@ Builtin stop workflow
 from .workflows import stop_node_instance
 from ..api.task import WorkflowTask
 from ... import workflow
+from ....storage.api import DEFAULT_BATCH_SIZE
 
 
 @workflow
 def stop(ctx, graph):
-    for node_instance in ctx.model.node_instance.iter():
+    for node_instance in ctx.model.node_instance.iter(eager_load='workflow',
+                                                      batch_size=DEFAULT_BATCH_SIZE):
         graph.add_tasks(WorkflowTask(stop_node_instance, node_instance=node_instance))
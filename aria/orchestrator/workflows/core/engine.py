@@ -36,11 +36,16 @@ from . import events_handler  # pylint: disable=unused-import
 class Engine(logger.LoggerMixin):
     """
     The workflow engine. Executes workflows
+
+    :param cache_models: whether to enable the model storage read-through cache for the duration
+                         of the execution; only safe if entries aren't deleted by other processes
+                         while the workflow is running
     """
 
-    def __init__(self, executor, workflow_context, tasks_graph, **kwargs):
+    def __init__(self, executor, workflow_context, tasks_graph, cache_models=False, **kwargs):
         super(Engine, self).__init__(**kwargs)
         self._workflow_context = workflow_context
+        self._cache_models = cache_models
         self._execution_graph = networkx.DiGraph()
         self._executor = executor
         translation.build_execution_graph(task_graph=tasks_graph,
@@ -50,6 +55,8 @@ class Engine(logger.LoggerMixin):
         """
         execute the workflow
         """
+        if self._cache_models:
+            self._workflow_context.model.enable_cache()
         try:
             events.start_workflow_signal.send(self._workflow_context)
             while True:
@@ -71,6 +78,9 @@ class Engine(logger.LoggerMixin):
         except BaseException as e:
             events.on_failure_workflow_signal.send(self._workflow_context, exception=e)
             raise
+        finally:
+            if self._cache_models:
+                self._workflow_context.model.disable_cache()
 
     def cancel_execution(self):
         """
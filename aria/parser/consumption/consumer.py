@@ -16,7 +16,7 @@
 
 from ...exceptions import AriaException
 from ...utils.exceptions import print_exception
-from ..validation import Issue
+from ..validation import Issue, IssueBudgetExceededError
 
 
 class Consumer(object):
@@ -36,6 +36,9 @@ class Consumer(object):
         pass
 
     def _handle_exception(self, e):
+        if isinstance(e, IssueBudgetExceededError):
+            # Raised on another thread (e.g. an executor's): cancels this consumer as well
+            raise e
         if hasattr(e, 'issue') and isinstance(e.issue, Issue):
             self.context.validation.report(issue=e.issue)
         else:
@@ -50,6 +53,9 @@ class ConsumerChain(Consumer):
 
     Calls consumers in order, handling exception by calling `_handle_exception` on them,
     and stops the chain if there are any validation issues.
+
+    If the validation context's issue budget is exceeded while a consumer is running, that consumer
+    is cancelled and the chain is stopped immediately.
     """
 
     def __init__(self, context, consumer_classes=None, handle_exceptions=True):
@@ -65,16 +71,19 @@ class ConsumerChain(Consumer):
             self.consumers.append(consumer_class(self.context))
 
     def consume(self):
-        for consumer in self.consumers:
-            try:
-                consumer.consume()
-            except BaseException as e:
-                if self.handle_exceptions:
+        try:
+            for consumer in self.consumers:
+                try:
+                    consumer.consume()
+                except (Exception, IssueBudgetExceededError) as e:
+                    if not self.handle_exceptions or isinstance(e, IssueBudgetExceededError):
+                        raise
                     handle_exception(consumer, e)
-                else:
-                    raise e
-            if self.context.validation.has_issues:
-                break
+                if self.context.validation.has_issues:
+                    break
+        except IssueBudgetExceededError:
+            # Fail fast (might also have been raised while handling an exception)
+            pass
 
 
 def handle_exception(consumer, e):
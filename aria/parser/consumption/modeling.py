@@ -13,7 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from ...utils.formatting import json_dumps, yaml_dumps
+from ...utils.formatting import json_dumps, yaml_dumps, json_dump, yaml_dump
 from .consumer import Consumer, ConsumerChain
 
 
@@ -64,12 +64,12 @@ class Model(ConsumerChain):
     def dump(self):
         if self.context.has_arg_switch('yaml'):
             indent = self.context.get_arg_value_int('indent', 2)
-            raw = self.context.modeling.model_as_raw
-            self.context.write(yaml_dumps(raw, indent=indent))
+            raw = self.context.modeling.model_as_raw_stream
+            yaml_dump(raw, self.context, indent=indent, pruned=True)
         elif self.context.has_arg_switch('json'):
             indent = self.context.get_arg_value_int('indent', 2)
-            raw = self.context.modeling.model_as_raw
-            self.context.write(json_dumps(raw, indent=indent))
+            raw = self.context.modeling.model_as_raw_stream
+            json_dump(raw, self.context, indent=indent, pruned=True)
         else:
             self.context.modeling.model.dump(self.context)
 
@@ -150,11 +150,11 @@ class Instance(ConsumerChain):
             self.context.modeling.instance.dump_graph(self.context)
         elif self.context.has_arg_switch('yaml'):
             indent = self.context.get_arg_value_int('indent', 2)
-            raw = self.context.modeling.instance_as_raw
-            self.context.write(yaml_dumps(raw, indent=indent))
+            raw = self.context.modeling.instance_as_raw_stream
+            yaml_dump(raw, self.context, indent=indent, pruned=True)
         elif self.context.has_arg_switch('json'):
             indent = self.context.get_arg_value_int('indent', 2)
-            raw = self.context.modeling.instance_as_raw
-            self.context.write(json_dumps(raw, indent=indent))
+            raw = self.context.modeling.instance_as_raw_stream
+            json_dump(raw, self.context, indent=indent, pruned=True)
         else:
             self.context.modeling.instance.dump(self.context)
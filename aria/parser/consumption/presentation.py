@@ -19,6 +19,7 @@ from ...utils.formatting import json_dumps, yaml_dumps
 from ..loading import UriLocation
 from ..reading import AlreadyReadException
 from ..presentation import PresenterNotFoundError
+from ..validation import IssueBudgetExceededError
 from .consumer import Consumer
 
 
@@ -32,7 +33,8 @@ class Read(Consumer):
     It supports agnostic raw data composition for presenters that have
     :code:`_get_import_locations` and :code:`_merge_import`.
 
-    To improve performance, loaders are called asynchronously on separate threads.
+    To improve performance, loaders are called asynchronously on separate threads. If the issue
+    budget is exceeded, imports that have not yet been read are cancelled.
 
     Note that parsing may internally trigger more than one loading/reading/presentation
     cycle, for example if the agnostic raw data has dependencies that must also be parsed.
@@ -46,8 +48,11 @@ class Read(Consumer):
         presenter = None
         imported_presentations = None
 
+        # The issue budget is also exceeded on the threads of the executor
         executor = FixedThreadPoolExecutor(size=self.context.presentation.threads,
-                                           timeout=self.context.presentation.timeout)
+                                           timeout=self.context.presentation.timeout,
+                                           gathered_exceptions=(Exception,
+                                                                IssueBudgetExceededError))
         executor.print_exceptions = self.context.presentation.print_exceptions
         try:
             presenter = self._present(self.context.presentation.location, None, None, executor)
@@ -93,6 +98,11 @@ class Read(Consumer):
         # Link the context to this thread
         self.context.set_thread_local()
 
+        # Fail fast: don't bother with pending imports
+        if self.context.validation.budget_exceeded:
+            executor.cancel()
+            self.context.validation.check_budget()
+
         raw = self._read(location, origin_location)
 
         if self.context.presentation.presenter_class is not None:
@@ -14,7 +14,8 @@
 # limitations under the License.
 
 from .exceptions import CannotEvaluateFunctionException
-from .context import IdType, ModelingContext
+from .ids import IdType, IdGenerator
+from .context import ModelingContext
 from .elements import Element, ModelElement, Function, Parameter, Metadata
 from .instance_elements import (ServiceInstance, Node, Capability, Relationship, Artifact, Group,
                                 Policy, GroupPolicy, GroupPolicyTrigger, Mapping, Substitution,
@@ -29,6 +30,7 @@ from .storage import initialize_storage
 __all__ = (
     'CannotEvaluateFunctionException',
     'IdType',
+    'IdGenerator',
     'ModelingContext',
     'Element',
     'ModelElement',
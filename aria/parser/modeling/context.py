@@ -13,30 +13,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import itertools
+from threading import Lock
 
 from ...utils.collections import StrictDict, prune, OrderedDict
 from ...utils.formatting import as_raw
 from ...utils.console import puts
 from .types import TypeHierarchy
-from .utils import generate_id_string
-
-
-class IdType(object):
-    LOCAL_SERIAL = 0
-    """
-    Locally unique serial ID: a running integer.
-    """
-
-    LOCAL_RANDOM = 1
-    """
-    Locally unique ID: 6 random safe characters.
-    """
-
-    UNIVERSAL_RANDOM = 2
-    """
-    Universally unique ID (UUID): 25 random safe characters.
-    """
+from .ids import IdType, create_id_generator
 
 
 class ModelingContext(object):
@@ -45,7 +28,8 @@ class ModelingContext(object):
 
     * :code:`model`: The generated service model
     * :code:`instance`: The generated service instance
-    * :code:`id_type`: Type of IDs to use for instances
+    * :code:`id_type`: Type of IDs to use for instances (see :class:`IdType`; parser extensions
+            can register more ID types)
     * :code:`id_max_length`: Maximum allowed instance ID length
     * :code:`inputs`: Dict of inputs values
     * :code:`node_types`: The generated hierarchy of node types
@@ -63,7 +47,8 @@ class ModelingContext(object):
         self.instance = None
         #self.id_type = IdType.LOCAL_SERIAL
         #self.id_type = IdType.LOCAL_RANDOM
-        self.id_type = IdType.UNIVERSAL_RANDOM
+        #self.id_type = IdType.UNIVERSAL_RANDOM
+        self.id_type = IdType.UNIVERSAL_SERIAL
         self.id_max_length = 63 # See: http://www.faqs.org/rfcs/rfc1035.html
         self.inputs = StrictDict(key_class=basestring)
         self.node_types = TypeHierarchy()
@@ -75,21 +60,32 @@ class ModelingContext(object):
         self.artifact_types = TypeHierarchy()
         self.interface_types = TypeHierarchy()
 
-        self._serial_id_counter = itertools.count(1)
-        self._locally_unique_ids = set()
+        self._id_generator = None
+        self._id_generator_type = None
+        self._id_generator_lock = Lock()
+
+    @property
+    def id_generator(self):
+        """
+        The :class:`IdGenerator` for our current :code:`id_type`.
+        """
+
+        with self._id_generator_lock:
+            if (self._id_generator is None) or (self._id_generator_type != self.id_type):
+                self._id_generator = create_id_generator(self.id_type)
+                self._id_generator_type = self.id_type
+            return self._id_generator
 
     def generate_id(self):
-        if self.id_type == IdType.LOCAL_SERIAL:
-            return self._serial_id_counter.next()
+        return self.id_generator.generate_id()
 
-        elif self.id_type == IdType.LOCAL_RANDOM:
-            the_id = generate_id_string(6)
-            while the_id in self._locally_unique_ids:
-                the_id = generate_id_string(6)
-            self._locally_unique_ids.add(the_id)
-            return the_id
+    def generate_ids(self, count):
+        """
+        Generates several IDs at once, which can be more efficient than calling
+        :code:`generate_id` repeatedly.
+        """
 
-        return generate_id_string()
+        return self.id_generator.generate_ids(count)
 
     def set_input(self, name, value):
         self.inputs[name] = value
@@ -119,6 +115,24 @@ class ModelingContext(object):
         prune(raw)
         return raw
 
+    @property
+    def model_as_raw_stream(self):
+        """
+        Unpruned; meant to be used with :code:`json_dump` or :code:`yaml_dump` with
+        :code:`pruned=True`.
+        """
+
+        return self.model.as_raw_stream
+
+    @property
+    def instance_as_raw_stream(self):
+        """
+        Unpruned; meant to be used with :code:`json_dump` or :code:`yaml_dump` with
+        :code:`pruned=True`.
+        """
+
+        return self.instance.as_raw_stream
+
     def dump_types(self, context):
         if self.node_types.children:
             puts('Node types:')
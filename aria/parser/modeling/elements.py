@@ -46,6 +46,8 @@ class Element(object):
     raw data (which can be translated into JSON or YAML) via :code:`as_raw`.
     """
 
+    __slots__ = ()
+
     @property
     def as_raw(self):
         raise NotImplementedError
@@ -67,6 +69,8 @@ class ModelElement(Element):
     All model elements can be instantiated into :class:`ServiceInstance` elements.
     """
 
+    __slots__ = ()
+
     def instantiate(self, context, container):
         raise NotImplementedError
 
@@ -78,6 +82,8 @@ class Parameter(ModelElement):
     This class is used by both service model and service instance elements.
     """
 
+    __slots__ = ('type_name', 'value', 'description')
+
     def __init__(self, type_name, value, description):
         self.type_name = type_name
         self.value = value
@@ -93,6 +99,9 @@ class Parameter(ModelElement):
     def instantiate(self, context, container):
         return Parameter(self.type_name, self.value, self.description)
 
+    def clone(self):
+        return Parameter(self.type_name, self.value, self.description)
+
     def coerce_values(self, context, container, report_issues):
         if self.value is not None:
             self.value = coerce_value(context, container, self.value, report_issues)
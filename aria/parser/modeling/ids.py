@@ -0,0 +1,132 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+from threading import Lock
+
+from ...extension import parser
+from .utils import generate_id_string
+
+
+class IdType(object):
+    LOCAL_SERIAL = 0
+    """
+    Locally unique serial ID: a running integer.
+    """
+
+    LOCAL_RANDOM = 1
+    """
+    Locally unique ID: 6 random safe characters.
+    """
+
+    UNIVERSAL_RANDOM = 2
+    """
+    Universally unique ID (UUID): 25 random safe characters.
+    """
+
+    UNIVERSAL_SERIAL = 3
+    """
+    Universally unique ID: 16 random safe characters (generated once per modeling context) followed
+    by a running hex serial. Much cheaper to generate than :code:`UNIVERSAL_RANDOM`.
+    """
+
+
+class IdGenerator(object):
+    """
+    Base class for instance ID generators.
+
+    A generator is created per :class:`ModelingContext`, so it may keep state (such as a serial
+    counter). Implementations must be thread-safe.
+    """
+
+    def generate_id(self):
+        raise NotImplementedError
+
+    def generate_ids(self, count):
+        """
+        Generates several IDs at once.
+
+        Subclasses may override this in order to allocate the IDs more efficiently.
+        """
+
+        return [self.generate_id() for _ in xrange(count)]
+
+
+class LocalSerialIdGenerator(IdGenerator):
+    def __init__(self):
+        self._lock = Lock()
+        self._counter = itertools.count(1)
+
+    def generate_id(self):
+        with self._lock:
+            return self._counter.next()
+
+    def generate_ids(self, count):
+        with self._lock:
+            return list(itertools.islice(self._counter, count))
+
+
+class LocalRandomIdGenerator(IdGenerator):
+    def __init__(self):
+        self._lock = Lock()
+        self._ids = set()
+
+    def generate_id(self):
+        with self._lock:
+            the_id = generate_id_string(6)
+            while the_id in self._ids:
+                the_id = generate_id_string(6)
+            self._ids.add(the_id)
+            return the_id
+
+
+class UniversalRandomIdGenerator(IdGenerator):
+    def generate_id(self):
+        return generate_id_string()
+
+
+class UniversalSerialIdGenerator(IdGenerator):
+    def __init__(self):
+        self._prefix = generate_id_string(16)
+        self._serial_id_generator = LocalSerialIdGenerator()
+
+    def generate_id(self):
+        return '%s%x' % (self._prefix, self._serial_id_generator.generate_id())
+
+    def generate_ids(self, count):
+        prefix = self._prefix
+        return ['%s%x' % (prefix, serial)
+                for serial in self._serial_id_generator.generate_ids(count)]
+
+
+ID_GENERATOR_CLASSES = {
+    IdType.LOCAL_SERIAL: LocalSerialIdGenerator,
+    IdType.LOCAL_RANDOM: LocalRandomIdGenerator,
+    IdType.UNIVERSAL_RANDOM: UniversalRandomIdGenerator,
+    IdType.UNIVERSAL_SERIAL: UniversalSerialIdGenerator
+}
+
+
+def create_id_generator(id_type):
+    """
+    Creates an ID generator for the ID type, which can be either one of the built-in
+    :class:`IdType` values or one registered by a parser extension.
+    """
+
+    id_generator_class = parser.id_generator_class().get(id_type) \
+        or ID_GENERATOR_CLASSES.get(id_type)
+    if id_generator_class is None:
+        raise ValueError('unsupported ID type: %s' % id_type)
+    return id_generator_class()
@@ -13,14 +13,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from ...utils.collections import StrictList, StrictDict, FrozenList, OrderedDict
-from ...utils.formatting import as_raw, as_raw_list, as_raw_dict, as_agnostic, safe_repr
+from ...utils.collections import (StrictList, StrictDict, LazyStrictList, LazyStrictDict,
+                                  FrozenList, OrderedDict)
+from ...utils.formatting import (as_raw, as_raw_list, as_raw_iter, as_raw_dict, as_agnostic,
+                                  safe_repr)
 from ...utils.console import puts, indent
 from ..validation import Issue
 from .elements import Element, Parameter
 from .utils import (validate_dict_values, validate_list_values, coerce_dict_values,
-                    coerce_list_values, dump_list_values, dump_dict_values, dump_parameters,
-                    dump_interfaces)
+                    coerce_list_values, clone_dict_values, clone_list_values, dump_list_values,
+                    dump_dict_values, dump_parameters, dump_interfaces)
 
 
 class ServiceInstance(Element):
@@ -119,6 +121,24 @@ class ServiceInstance(Element):
             ('outputs', as_raw_dict(self.outputs)),
             ('operations', as_raw_list(self.operations))))
 
+    @property
+    def as_raw_stream(self):
+        """
+        Like :code:`as_raw`, but the large collections are lazy iterators (see
+        :code:`aria.utils.formatting.json_dump`).
+        """
+
+        return OrderedDict((
+            ('description', self.description),
+            ('metadata', as_raw(self.metadata)),
+            ('nodes', as_raw_iter(self.nodes)),
+            ('groups', as_raw_iter(self.groups)),
+            ('policies', as_raw_iter(self.policies)),
+            ('substitution', as_raw(self.substitution)),
+            ('inputs', as_raw_dict(self.inputs)),
+            ('outputs', as_raw_dict(self.outputs)),
+            ('operations', as_raw_iter(self.operations))))
+
     def validate(self, context):
         if self.metadata is not None:
             self.metadata.validate(context)
@@ -203,20 +223,46 @@ class Node(Element):
     * :code:`relationship`: List of :class:`Relationship`
     """
 
-    def __init__(self, context, type_name, template_name):
+    __slots__ = ('id', 'type_name', 'template_name', '_properties', '_interfaces', '_artifacts',
+                 '_capabilities', '_relationships')
+
+    properties = LazyStrictDict('_properties', key_class=basestring, value_class=Parameter)
+    interfaces = LazyStrictDict('_interfaces', key_class=basestring, value_class='Interface')
+    artifacts = LazyStrictDict('_artifacts', key_class=basestring, value_class='Artifact')
+    capabilities = LazyStrictDict('_capabilities', key_class=basestring, value_class='Capability')
+    relationships = LazyStrictList('_relationships', value_class='Relationship')
+
+    def __init__(self, context, type_name, template_name, generated_id=None):
         if not isinstance(type_name, basestring):
             raise ValueError('must set type_name (string)')
         if not isinstance(template_name, basestring):
             raise ValueError('must set template_name (string)')
 
-        self.id = '%s_%s' % (template_name, context.modeling.generate_id())
+        if generated_id is None:
+            generated_id = context.modeling.generate_id()
+        self.id = '%s_%s' % (template_name, generated_id)
         self.type_name = type_name
         self.template_name = template_name
-        self.properties = StrictDict(key_class=basestring, value_class=Parameter)
-        self.interfaces = StrictDict(key_class=basestring, value_class=Interface)
-        self.artifacts = StrictDict(key_class=basestring, value_class=Artifact)
-        self.capabilities = StrictDict(key_class=basestring, value_class=Capability)
-        self.relationships = StrictList(value_class=Relationship)
+        self._properties = None
+        self._interfaces = None
+        self._artifacts = None
+        self._capabilities = None
+        self._relationships = None
+
+    def clone(self, context, generated_id=None):
+        """
+        Creates a copy of this node with a new ID.
+
+        Contained elements are copied, but their values are shared with this node.
+        """
+
+        node = Node(context, self.type_name, self.template_name, generated_id)
+        node._properties = clone_dict_values(self._properties)
+        node._interfaces = clone_dict_values(self._interfaces)
+        node._artifacts = clone_dict_values(self._artifacts)
+        node._capabilities = clone_dict_values(self._capabilities)
+        node._relationships = clone_list_values(self._relationships)
+        return node
 
     def satisfy_requirements(self, context):
         node_template = context.modeling.model.node_templates.get(self.template_name)
@@ -311,11 +357,11 @@ class Node(Element):
             ('id', self.id),
             ('type_name', self.type_name),
             ('template_name', self.template_name),
-            ('properties', as_raw_dict(self.properties)),
-            ('interfaces', as_raw_list(self.interfaces)),
-            ('artifacts', as_raw_list(self.artifacts)),
-            ('capabilities', as_raw_list(self.capabilities)),
-            ('relationships', as_raw_list(self.relationships))))
+            ('properties', as_raw_dict(self._properties)),
+            ('interfaces', as_raw_list(self._interfaces)),
+            ('artifacts', as_raw_list(self._artifacts)),
+            ('capabilities', as_raw_list(self._capabilities)),
+            ('relationships', as_raw_list(self._relationships))))
 
     def validate(self, context):
         if len(self.id) > context.modeling.id_max_length:
@@ -327,29 +373,29 @@ class Node(Element):
 
         # TODO: validate that node template is of type?
 
-        validate_dict_values(context, self.properties)
-        validate_dict_values(context, self.interfaces)
-        validate_dict_values(context, self.artifacts)
-        validate_dict_values(context, self.capabilities)
-        validate_list_values(context, self.relationships)
+        validate_dict_values(context, self._properties)
+        validate_dict_values(context, self._interfaces)
+        validate_dict_values(context, self._artifacts)
+        validate_dict_values(context, self._capabilities)
+        validate_list_values(context, self._relationships)
 
     def coerce_values(self, context, container, report_issues):
-        coerce_dict_values(context, self, self.properties, report_issues)
-        coerce_dict_values(context, self, self.interfaces, report_issues)
-        coerce_dict_values(context, self, self.artifacts, report_issues)
-        coerce_dict_values(context, self, self.capabilities, report_issues)
-        coerce_list_values(context, self, self.relationships, report_issues)
+        coerce_dict_values(context, self, self._properties, report_issues)
+        coerce_dict_values(context, self, self._interfaces, report_issues)
+        coerce_dict_values(context, self, self._artifacts, report_issues)
+        coerce_dict_values(context, self, self._capabilities, report_issues)
+        coerce_list_values(context, self, self._relationships, report_issues)
 
     def dump(self, context):
         puts('Node: %s' % context.style.node(self.id))
         with context.style.indent:
             puts('Template: %s' % context.style.node(self.template_name))
             puts('Type: %s' % context.style.type(self.type_name))
-            dump_parameters(context, self.properties)
-            dump_interfaces(context, self.interfaces)
-            dump_dict_values(context, self.artifacts, 'Artifacts')
-            dump_dict_values(context, self.capabilities, 'Capabilities')
-            dump_list_values(context, self.relationships, 'Relationships')
+            dump_parameters(context, self._properties)
+            dump_interfaces(context, self._interfaces)
+            dump_dict_values(context, self._artifacts, 'Artifacts')
+            dump_dict_values(context, self._capabilities, 'Capabilities')
+            dump_list_values(context, self._relationships, 'Relationships')
 
 
 class Capability(Element):
@@ -367,6 +413,11 @@ class Capability(Element):
     * :code:`properties`: Dict of :class:`Parameter`
     """
 
+    __slots__ = ('name', 'type_name', '_properties', 'min_occurrences', 'max_occurrences',
+                 'occurrences')
+
+    properties = LazyStrictDict('_properties', key_class=basestring, value_class=Parameter)
+
     def __init__(self, name, type_name):
         if not isinstance(name, basestring):
             raise ValueError('name must be a string or None')
@@ -375,12 +426,20 @@ class Capability(Element):
 
         self.name = name
         self.type_name = type_name
-        self.properties = StrictDict(key_class=basestring, value_class=Parameter)
+        self._properties = None
 
         self.min_occurrences = None # optional
         self.max_occurrences = None # optional
         self.occurrences = 0
 
+    def clone(self):
+        capability = Capability(self.name, self.type_name)
+        capability._properties = clone_dict_values(self._properties)
+        capability.min_occurrences = self.min_occurrences
+        capability.max_occurrences = self.max_occurrences
+        capability.occurrences = self.occurrences
+        return capability
+
     @property
     def has_enough_relationships(self):
         if self.min_occurrences is not None:
@@ -399,7 +458,7 @@ class Capability(Element):
         return OrderedDict((
             ('name', self.name),
             ('type_name', self.type_name),
-            ('properties', as_raw_dict(self.properties))))
+            ('properties', as_raw_dict(self._properties))))
 
     def validate(self, context):
         if context.modeling.capability_types.get_descendant(self.type_name) is None:
@@ -408,10 +467,10 @@ class Capability(Element):
                                          safe_repr(self.type_name)),
                                       level=Issue.BETWEEN_TYPES)
 
-        validate_dict_values(context, self.properties)
+        validate_dict_values(context, self._properties)
 
     def coerce_values(self, context, container, report_issues):
-        coerce_dict_values(context, container, self.properties, report_issues)
+        coerce_dict_values(context, container, self._properties, report_issues)
 
     def dump(self, context):
         puts(context.style.node(self.name))
@@ -423,7 +482,7 @@ class Capability(Element):
                     (' to %d' % self.max_occurrences)
                     if self.max_occurrences is not None
                     else ' or more'))
-            dump_parameters(context, self.properties)
+            dump_parameters(context, self._properties)
 
 
 class Relationship(Element):
@@ -445,6 +504,16 @@ class Relationship(Element):
     * :code:`target_interfaces`: Dict of :class:`Interface`
     """
 
+    __slots__ = ('name', 'source_requirement_index', 'target_node_id', 'target_capability_name',
+                 'type_name', 'template_name', '_properties', '_source_interfaces',
+                 '_target_interfaces')
+
+    properties = LazyStrictDict('_properties', key_class=basestring, value_class=Parameter)
+    source_interfaces = LazyStrictDict('_source_interfaces', key_class=basestring,
+                                       value_class='Interface')
+    target_interfaces = LazyStrictDict('_target_interfaces', key_class=basestring,
+                                       value_class='Interface')
+
     def __init__(self, name=None,
                  source_requirement_index=None,
                  type_name=None,
@@ -465,9 +534,19 @@ class Relationship(Element):
         self.target_capability_name = None
         self.type_name = type_name
         self.template_name = template_name
-        self.properties = StrictDict(key_class=basestring, value_class=Parameter)
-        self.source_interfaces = StrictDict(key_class=basestring, value_class=Interface)
-        self.target_interfaces = StrictDict(key_class=basestring, value_class=Interface)
+        self._properties = None
+        self._source_interfaces = None
+        self._target_interfaces = None
+
+    def clone(self):
+        relationship = Relationship(self.name, self.source_requirement_index, self.type_name,
+                                    self.template_name)
+        relationship.target_node_id = self.target_node_id
+        relationship.target_capability_name = self.target_capability_name
+        relationship._properties = clone_dict_values(self._properties)
+        relationship._source_interfaces = clone_dict_values(self._source_interfaces)
+        relationship._target_interfaces = clone_dict_values(self._target_interfaces)
+        return relationship
 
     @property
     def as_raw(self):
@@ -478,9 +557,9 @@ class Relationship(Element):
             ('target_capability_name', self.target_capability_name),
             ('type_name', self.type_name),
             ('template_name', self.template_name),
-            ('properties', as_raw_dict(self.properties)),
-            ('source_interfaces', as_raw_list(self.source_interfaces)),
-            ('target_interfaces', as_raw_list(self.target_interfaces))))
+            ('properties', as_raw_dict(self._properties)),
+            ('source_interfaces', as_raw_list(self._source_interfaces)),
+            ('target_interfaces', as_raw_list(self._target_interfaces))))
 
     def validate(self, context):
         if self.type_name:
@@ -489,14 +568,14 @@ class Relationship(Element):
                                           % (self.name,
                                              safe_repr(self.type_name)),
                                           level=Issue.BETWEEN_TYPES)
-        validate_dict_values(context, self.properties)
-        validate_dict_values(context, self.source_interfaces)
-        validate_dict_values(context, self.target_interfaces)
+        validate_dict_values(context, self._properties)
+        validate_dict_values(context, self._source_interfaces)
+        validate_dict_values(context, self._target_interfaces)
 
     def coerce_values(self, context, container, report_issues):
-        coerce_dict_values(context, container, self.properties, report_issues)
-        coerce_dict_values(context, container, self.source_interfaces, report_issues)
-        coerce_dict_values(context, container, self.target_interfaces, report_issues)
+        coerce_dict_values(context, container, self._properties, report_issues)
+        coerce_dict_values(context, container, self._source_interfaces, report_issues)
+        coerce_dict_values(context, container, self._target_interfaces, report_issues)
 
     def dump(self, context):
         if self.name:
@@ -514,9 +593,9 @@ class Relationship(Element):
                 puts('Relationship type: %s' % context.style.type(self.type_name))
             if self.template_name is not None:
                 puts('Relationship template: %s' % context.style.node(self.template_name))
-            dump_parameters(context, self.properties)
-            dump_interfaces(context, self.source_interfaces, 'Source interfaces')
-            dump_interfaces(context, self.target_interfaces, 'Target interfaces')
+            dump_parameters(context, self._properties)
+            dump_interfaces(context, self._source_interfaces, 'Source interfaces')
+            dump_interfaces(context, self._target_interfaces, 'Target interfaces')
 
 
 class Artifact(Element):
@@ -552,6 +631,15 @@ class Artifact(Element):
         self.repository_credential = StrictDict(key_class=basestring, value_class=basestring)
         self.properties = StrictDict(key_class=basestring, value_class=Parameter)
 
+    def clone(self):
+        artifact = Artifact(self.name, self.type_name, self.source_path)
+        artifact.description = self.description
+        artifact.target_path = self.target_path
+        artifact.repository_url = self.repository_url
+        artifact.repository_credential.update(self.repository_credential)
+        artifact.properties = clone_dict_values(self.properties)
+        return artifact
+
     @property
     def as_raw(self):
         return OrderedDict((
@@ -931,6 +1019,11 @@ class Interface(Element):
     * :code:`operations`: Dict of :class:`Operation`
     """
 
+    __slots__ = ('name', 'description', 'type_name', '_inputs', '_operations')
+
+    inputs = LazyStrictDict('_inputs', key_class=basestring, value_class=Parameter)
+    operations = LazyStrictDict('_operations', key_class=basestring, value_class='Operation')
+
     def __init__(self, name, type_name):
         if not isinstance(name, basestring):
             raise ValueError('must set name (string)')
@@ -938,8 +1031,15 @@ class Interface(Element):
         self.name = name
         self.description = None
         self.type_name = type_name
-        self.inputs = StrictDict(key_class=basestring, value_class=Parameter)
-        self.operations = StrictDict(key_class=basestring, value_class=Operation)
+        self._inputs = None
+        self._operations = None
+
+    def clone(self):
+        interface = Interface(self.name, self.type_name)
+        interface.description = self.description
+        interface._inputs = clone_dict_values(self._inputs)
+        interface._operations = clone_dict_values(self._operations)
+        return interface
 
     @property
     def as_raw(self):
@@ -947,8 +1047,8 @@ class Interface(Element):
             ('name', self.name),
             ('description', self.description),
             ('type_name', self.type_name),
-            ('inputs', as_raw_dict(self.inputs)),
-            ('operations', as_raw_list(self.operations))))
+            ('inputs', as_raw_dict(self._inputs)),
+            ('operations', as_raw_list(self._operations))))
 
     def validate(self, context):
         if self.type_name:
@@ -958,12 +1058,12 @@ class Interface(Element):
                                              safe_repr(self.type_name)),
                                           level=Issue.BETWEEN_TYPES)
 
-        validate_dict_values(context, self.inputs)
-        validate_dict_values(context, self.operations)
+        validate_dict_values(context, self._inputs)
+        validate_dict_values(context, self._operations)
 
     def coerce_values(self, context, container, report_issues):
-        coerce_dict_values(context, container, self.inputs, report_issues)
-        coerce_dict_values(context, container, self.operations, report_issues)
+        coerce_dict_values(context, container, self._inputs, report_issues)
+        coerce_dict_values(context, container, self._operations, report_issues)
 
     def dump(self, context):
         puts(context.style.node(self.name))
@@ -971,8 +1071,8 @@ class Interface(Element):
             puts(context.style.meta(self.description))
         with context.style.indent:
             puts('Interface type: %s' % context.style.type(self.type_name))
-            dump_parameters(context, self.inputs, 'Inputs')
-            dump_dict_values(context, self.operations, 'Operations')
+            dump_parameters(context, self._inputs, 'Inputs')
+            dump_dict_values(context, self._operations, 'Operations')
 
 
 class Operation(Element):
@@ -991,6 +1091,12 @@ class Operation(Element):
     * :code:`inputs`: Dict of :class:`Parameter`
     """
 
+    __slots__ = ('name', 'description', 'implementation', '_dependencies', 'executor',
+                 'max_retries', 'retry_interval', '_inputs')
+
+    dependencies = LazyStrictList('_dependencies', value_class=basestring)
+    inputs = LazyStrictDict('_inputs', key_class=basestring, value_class=Parameter)
+
     def __init__(self, name):
         if not isinstance(name, basestring):
             raise ValueError('must set name (string)')
@@ -998,11 +1104,22 @@ class Operation(Element):
         self.name = name
         self.description = None
         self.implementation = None
-        self.dependencies = StrictList(value_class=basestring)
+        self._dependencies = None
         self.executor = None
         self.max_retries = None
         self.retry_interval = None
-        self.inputs = StrictDict(key_class=basestring, value_class=Parameter)
+        self._inputs = None
+
+    def clone(self):
+        operation = Operation(self.name)
+        operation.description = self.description
+        operation.implementation = self.implementation
+        operation._dependencies = self._dependencies
+        operation.executor = self.executor
+        operation.max_retries = self.max_retries
+        operation.retry_interval = self.retry_interval
+        operation._inputs = clone_dict_values(self._inputs)
+        return operation
 
     @property
     def as_raw(self):
@@ -1014,13 +1131,13 @@ class Operation(Element):
             ('executor', self.executor),
             ('max_retries', self.max_retries),
             ('retry_interval', self.retry_interval),
-            ('inputs', as_raw_dict(self.inputs))))
+            ('inputs', as_raw_dict(self._inputs))))
 
     def validate(self, context):
-        validate_dict_values(context, self.inputs)
+        validate_dict_values(context, self._inputs)
 
     def coerce_values(self, context, container, report_issues):
-        coerce_dict_values(context, container, self.inputs, report_issues)
+        coerce_dict_values(context, container, self._inputs, report_issues)
 
     def dump(self, context):
         puts(context.style.node(self.name))
@@ -1029,13 +1146,13 @@ class Operation(Element):
         with context.style.indent:
             if self.implementation is not None:
                 puts('Implementation: %s' % context.style.literal(self.implementation))
-            if self.dependencies:
+            if self._dependencies:
                 puts('Dependencies: %s'
-                     % ', '.join((str(context.style.literal(v)) for v in self.dependencies)))
+                     % ', '.join((str(context.style.literal(v)) for v in self._dependencies)))
             if self.executor is not None:
                 puts('Executor: %s' % context.style.literal(self.executor))
             if self.max_retries is not None:
                 puts('Max retries: %s' % context.style.literal(self.max_retries))
             if self.retry_interval is not None:
                 puts('Retry interval: %s' % context.style.literal(self.retry_interval))
-            dump_parameters(context, self.inputs, 'Inputs')
+            dump_parameters(context, self._inputs, 'Inputs')
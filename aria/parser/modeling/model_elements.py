@@ -18,7 +18,8 @@ from __future__ import absolute_import  # so we can import standard 'types'
 from types import FunctionType
 
 from ...utils.collections import StrictList, StrictDict, deepcopy_with_locators, OrderedDict
-from ...utils.formatting import as_raw, as_raw_list, as_raw_dict, as_agnostic, safe_repr
+from ...utils.formatting import (as_raw, as_raw_list, as_raw_iter, as_raw_dict, as_agnostic,
+                                  safe_repr)
 from ...utils.console import puts
 from ..validation import Issue
 from .elements import ModelElement, Parameter
@@ -75,6 +76,24 @@ class ServiceModel(ModelElement):
             ('outputs', as_raw_dict(self.outputs)),
             ('operation_templates', as_raw_list(self.operation_templates))))
 
+    @property
+    def as_raw_stream(self):
+        """
+        Like :code:`as_raw`, but the large collections are lazy iterators (see
+        :code:`aria.utils.formatting.json_dump`).
+        """
+
+        return OrderedDict((
+            ('description', self.description),
+            ('metadata', as_raw(self.metadata)),
+            ('node_templates', as_raw_iter(self.node_templates)),
+            ('group_templates', as_raw_iter(self.group_templates)),
+            ('policy_templates', as_raw_iter(self.policy_templates)),
+            ('substitution_template', as_raw(self.substitution_template)),
+            ('inputs', as_raw_dict(self.inputs)),
+            ('outputs', as_raw_dict(self.outputs)),
+            ('operation_templates', as_raw_iter(self.operation_templates))))
+
     def instantiate(self, context, container):
         service_instance = ServiceInstance()
         context.modeling.instance = service_instance
@@ -85,8 +104,8 @@ class ServiceModel(ModelElement):
             service_instance.metadata = self.metadata.instantiate(context, container)
 
         for node_template in self.node_templates.itervalues():
-            for _ in range(node_template.default_instances):
-                node = node_template.instantiate(context, container)
+            for node in node_template.instantiate_many(context, container,
+                                                       node_template.default_instances):
                 service_instance.nodes[node.id] = node
 
         instantiate_dict(context, self, service_instance.groups, self.group_templates)
@@ -213,12 +232,35 @@ class NodeTemplate(ModelElement):
 
     def instantiate(self, context, container):
         node = Node(context, self.type_name, self.name)
-        instantiate_dict(context, node, node.properties, self.properties)
-        instantiate_dict(context, node, node.interfaces, self.interface_templates)
-        instantiate_dict(context, node, node.artifacts, self.artifact_templates)
-        instantiate_dict(context, node, node.capabilities, self.capability_templates)
+        # Node containers are created lazily, so we avoid touching them if there's nothing to add
+        if self.properties:
+            instantiate_dict(context, node, node.properties, self.properties)
+        if self.interface_templates:
+            instantiate_dict(context, node, node.interfaces, self.interface_templates)
+        if self.artifact_templates:
+            instantiate_dict(context, node, node.artifacts, self.artifact_templates)
+        if self.capability_templates:
+            instantiate_dict(context, node, node.capabilities, self.capability_templates)
         return node
 
+    def instantiate_many(self, context, container, count):
+        """
+        Instantiates several nodes at once.
+
+        Only the first node is actually instantiated: it is used as a prototype for the others,
+        which are cheap clones of it (with IDs allocated in bulk). This is much faster for
+        scaled-out node templates with many default instances.
+        """
+
+        if count < 1:
+            return []
+        prototype = self.instantiate(context, container)
+        nodes = [prototype]
+        if count > 1:
+            for generated_id in context.modeling.generate_ids(count - 1):
+                nodes.append(prototype.clone(context, generated_id))
+        return nodes
+
     def validate(self, context):
         if context.modeling.node_types.get_descendant(self.type_name) is None:
             context.validation.report('node template "%s" has an unknown type: %s'
@@ -499,7 +541,8 @@ class CapabilityTemplate(ModelElement):
         capability = Capability(self.name, self.type_name)
         capability.min_occurrences = self.min_occurrences
         capability.max_occurrences = self.max_occurrences
-        instantiate_dict(context, container, capability.properties, self.properties)
+        if self.properties:
+            instantiate_dict(context, container, capability.properties, self.properties)
         return capability
 
     def validate(self, context):
@@ -577,12 +620,15 @@ class RelationshipTemplate(ModelElement):
 
     def instantiate(self, context, container):
         relationship = Relationship(self.type_name, self.template_name)
-        instantiate_dict(context, container,
-                         relationship.properties, self.properties)
-        instantiate_dict(context, container,
-                         relationship.source_interfaces, self.source_interface_templates)
-        instantiate_dict(context, container,
-                         relationship.target_interfaces, self.target_interface_templates)
+        if self.properties:
+            instantiate_dict(context, container,
+                             relationship.properties, self.properties)
+        if self.source_interface_templates:
+            instantiate_dict(context, container,
+                             relationship.source_interfaces, self.source_interface_templates)
+        if self.target_interface_templates:
+            instantiate_dict(context, container,
+                             relationship.target_interfaces, self.target_interface_templates)
         return relationship
 
     def validate(self, context):
@@ -1118,8 +1164,10 @@ class InterfaceTemplate(ModelElement):
     def instantiate(self, context, container):
         interface = Interface(self.name, self.type_name)
         interface.description = deepcopy_with_locators(self.description)
-        instantiate_dict(context, container, interface.inputs, self.inputs)
-        instantiate_dict(context, container, interface.operations, self.operation_templates)
+        if self.inputs:
+            instantiate_dict(context, container, interface.inputs, self.inputs)
+        if self.operation_templates:
+            instantiate_dict(context, container, interface.operations, self.operation_templates)
         return interface
 
     def validate(self, context):
@@ -1195,7 +1243,8 @@ class OperationTemplate(ModelElement):
         operation.executor = self.executor
         operation.max_retries = self.max_retries
         operation.retry_interval = self.retry_interval
-        instantiate_dict(context, container, operation.inputs, self.inputs)
+        if self.inputs:
+            instantiate_dict(context, container, operation.inputs, self.inputs)
         return operation
 
     def validate(self, context):
@@ -17,7 +17,7 @@ from random import randrange
 
 from shortuuid import ShortUUID
 
-from ...utils.collections import OrderedDict
+from ...utils.collections import StrictList, StrictDict, OrderedDict
 from ...utils.console import puts
 from ..exceptions import InvalidValueError
 from ..presentation import Value
@@ -105,6 +105,33 @@ def instantiate_dict(context, container, the_dict, from_dict):
             the_dict[name] = value
 
 
+def clone_dict_values(the_dict):
+    """
+    Copies a :class:`StrictDict` of elements by calling :code:`clone` on each value.
+
+    Returns None for None, so that lazily created containers stay uncreated.
+    """
+
+    if the_dict is None:
+        return None
+    clone = StrictDict(key_class=the_dict.key_class, value_class=the_dict.value_class)
+    for name, value in the_dict.iteritems():
+        clone[name] = value.clone()
+    return clone
+
+
+def clone_list_values(the_list):
+    """
+    Copies a :class:`StrictList` of elements by calling :code:`clone` on each value.
+
+    Returns None for None, so that lazily created containers stay uncreated.
+    """
+
+    if the_list is None:
+        return None
+    return StrictList((value.clone() for value in the_list), value_class=the_list.value_class)
+
+
 def dump_list_values(context, the_list, name):
     if not the_list:
         return
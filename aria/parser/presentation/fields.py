@@ -24,6 +24,7 @@ from ...utils.console import puts
 from ...utils.formatting import as_raw, safe_repr, full_type_name
 from ...utils.exceptions import print_exception
 from ..exceptions import InvalidValueError
+from ..validation import IssueBudgetExceededError
 
 from .null import NULL
 from .utils import validate_primitive
@@ -506,7 +507,7 @@ class Field(object):
         raw[self.name] = value
         try:
             self.validate(presentation, context)
-        except Exception as e:
+        except (Exception, IssueBudgetExceededError) as e:
             raw[self.name] = old
             raise e
         return old
@@ -15,7 +15,9 @@
 
 from .issue import Issue
 from .context import ValidationContext
+from .exceptions import IssueBudgetExceededError
 
 __all__ = (
     'ValidationContext',
-    'Issue')
+    'Issue',
+    'IssueBudgetExceededError')
@@ -14,6 +14,7 @@
 # limitations under the License.
 
 from .issue import Issue
+from .exceptions import IssueBudgetExceededError
 from ...utils.threading import LockedList
 from ...utils.collections import FrozenList
 from ...utils.exceptions import print_exception
@@ -30,17 +31,43 @@ class ValidationContext(object):
     * :code:`allow_primitive_coersion`: When False (the default) will not attempt to
             coerce primitive field types
     * :code:`max_level`: Maximum validation level to report (default is all)
+    * :code:`issue_budget`: When not None, parsing is cancelled (fail-fast) as soon as this many
+            issues have been reported at or below :code:`issue_budget_level` (default is None).
+            Must be at least 1. The cancellation is reported as an issue as well.
+    * :code:`issue_budget_level`: Maximum validation level counted against the issue budget
+            (default is all)
     """
 
     def __init__(self):
         self.allow_unknown_fields = False
         self.allow_primitive_coersion = False
         self.max_level = Issue.ALL
+        self.issue_budget_level = Issue.ALL
 
+        self._issue_budget = None
         self._issues = LockedList()
+        self._budgeted_issues_count = 0
+        self._budget_exceeded_reported = False
+
+    @property
+    def issue_budget(self):
+        return self._issue_budget
+
+    @issue_budget.setter
+    def issue_budget(self, value):
+        if (value is not None) and (value < 1):
+            raise ValueError('issue budget must be at least 1: %d' % value)
+        self._issue_budget = value
 
     def report(self, message=None, exception=None, location=None, line=None,
                column=None, locator=None, snippet=None, level=Issue.PLATFORM, issue=None):
+        """
+        Reports an issue.
+
+        Will raise :class:`IssueBudgetExceededError` if the issue budget has been exhausted, in
+        order to cancel the running consumer.
+        """
+
         if issue is None:
             issue = Issue(message, exception, location, line, column, locator, snippet, level)
 
@@ -51,11 +78,38 @@ class ValidationContext(object):
                     return
 
             self._issues.append(issue)
+            if issue.level <= self.issue_budget_level:
+                self._budgeted_issues_count += 1
+
+        self.check_budget()
+
+    def check_budget(self):
+        """
+        Raises :class:`IssueBudgetExceededError` if the issue budget has been exhausted, reporting
+        the cancellation as a platform issue (once), so that a cancelled parse never looks clean.
+
+        Long-running consumers can call this in order to cancel early even if they do not report
+        issues themselves.
+        """
+
+        if self.budget_exceeded:
+            message = 'issue budget exceeded: %d' % self.issue_budget
+            with self._issues:
+                if not self._budget_exceeded_reported:
+                    self._budget_exceeded_reported = True
+                    self._issues.append(Issue('parsing cancelled, %s' % message,
+                                              level=Issue.PLATFORM))
+            raise IssueBudgetExceededError(message)
 
     @property
     def has_issues(self):
         return len(self._issues) > 0
 
+    @property
+    def budget_exceeded(self):
+        return (self.issue_budget is not None) \
+            and (self._budgeted_issues_count >= self.issue_budget)
+
     @property
     def issues(self):
         issues = [i for i in self._issues if i.level <= self.max_level]
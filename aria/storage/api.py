@@ -16,6 +16,10 @@
 General storage API
 """
 
+# A reasonable batch size for iterating over entries that may be very numerous (e.g. node instances
+# or tasks)
+DEFAULT_BATCH_SIZE = 1000
+
 
 class StorageAPI(object):
     """
@@ -99,6 +103,10 @@ class ModelAPI(StorageAPI):
         """
         Iter over the entries in storage.
 
+        Implementations should accept a :code:`batch_size` kwarg, in which case entries are
+        fetched from the storage in batches of that size rather than all at once (see
+        :code:`DEFAULT_BATCH_SIZE`).
+
         :param kwargs:
         :return:
         """
@@ -114,6 +122,26 @@ class ModelAPI(StorageAPI):
         """
         raise NotImplementedError('Subclass must implement abstract update method')
 
+    def enable_cache(self):
+        """
+        Start caching entries returned by get. Optional; the default does nothing.
+        """
+        pass
+
+    def disable_cache(self):
+        """
+        Stop caching entries and drop the cache. Optional; the default does nothing.
+        """
+        pass
+
+    def invalidate(self, entry=None):
+        """
+        Evict an entry (or all entries) from the cache. Optional; the default does nothing.
+
+        :param entry: an entry or an entry ID; if None, evicts everything
+        """
+        pass
+
 
 class ResourceAPI(StorageAPI):
     """
@@ -57,7 +57,8 @@ from ..orchestrator.exceptions import TaskAbortException, TaskRetryException
 from .structure import ModelMixin
 from .type import (
     List,
-    Dict
+    Dict,
+    CompressedDict
 )
 
 __all__ = (
@@ -84,9 +85,11 @@ class BlueprintBase(ModelMixin):
     """
     __tablename__ = 'blueprints'
 
+    _deferred_column_groups = {'plan': ('plan',)}
+
     created_at = Column(DateTime, nullable=False, index=True)
     main_file_name = Column(Text, nullable=False)
-    plan = Column(Dict, nullable=False)
+    plan = Column(CompressedDict, nullable=False)
     updated_at = Column(DateTime)
     description = Column(Text)
 
@@ -98,6 +101,10 @@ class DeploymentBase(ModelMixin):
     __tablename__ = 'deployments'
 
     _private_fields = ['blueprint_fk']
+    _deferred_column_groups = {
+        'specification': ('inputs', 'groups', 'policy_triggers', 'policy_types', 'outputs',
+                          'scaling_groups', 'workflows')
+    }
 
     created_at = Column(DateTime, nullable=False, index=True)
     description = Column(Text)
@@ -131,6 +138,7 @@ class ExecutionBase(ModelMixin):
     # Needed only for pylint. the id will be populated by sqlalcehmy and the proper column.
     __tablename__ = 'executions'
     _private_fields = ['deployment_fk']
+    _indexes = (('deployment_fk', 'status'),)
 
     TERMINATED = 'terminated'
     FAILED = 'failed'
@@ -213,9 +221,10 @@ class DeploymentUpdateBase(ModelMixin):
     __tablename__ = 'deployment_updates'
 
     _private_fields = ['execution_fk', 'deployment_fk']
+    _deferred_column_groups = {'plan': ('deployment_plan',)}
 
     created_at = Column(DateTime, nullable=False, index=True)
-    deployment_plan = Column(Dict, nullable=False)
+    deployment_plan = Column(CompressedDict, nullable=False)
     deployment_update_node_instances = Column(Dict)
     deployment_update_deployment = Column(Dict)
     deployment_update_nodes = Column(List)
@@ -369,6 +378,10 @@ class NodeBase(ModelMixin):
     is_id_unique = False
 
     _private_fields = ['blueprint_fk', 'host_fk']
+    _indexes = (('deployment_fk', 'name'), ('host_fk',))
+    _deferred_column_groups = {
+        'specification': ('plugins', 'properties', 'operations', 'type_hierarchy')
+    }
 
     @declared_attr
     def host_fk(cls):
@@ -405,7 +418,7 @@ class NodeBase(ModelMixin):
     planned_number_of_instances = Column(Integer, nullable=False)
     plugins = Column(List)
     properties = Column(Dict)
-    operations = Column(Dict)
+    operations = Column(CompressedDict)
     type = Column(Text, nullable=False, index=True)
     type_hierarchy = Column(List)
 
@@ -417,6 +430,10 @@ class RelationshipBase(ModelMixin):
     __tablename__ = 'relationships'
 
     _private_fields = ['source_node_fk', 'target_node_fk', 'source_position', 'target_position']
+    _deferred_column_groups = {
+        'specification': ('source_interfaces', 'source_operations', 'target_interfaces',
+                          'target_operations', 'type_hierarchy', 'properties')
+    }
 
     source_position = Column(Integer)
     target_position = Column(Integer)
@@ -478,6 +495,17 @@ class NodeInstanceBase(ModelMixin):
     """
     __tablename__ = 'node_instances'
     _private_fields = ['node_fk', 'host_fk']
+    _indexes = (('node_fk',), ('host_fk',))
+    # Relationships and deferred columns (see `SQLAlchemyModelAPI.iter`) that are used by the
+    # builtin workflows when building their task graphs
+    _eager_loading_profiles = {
+        'workflow': ('node.operations',
+                     'outbound_relationship_instances.relationship.source_operations',
+                     'outbound_relationship_instances.relationship.target_operations',
+                     'outbound_relationship_instances.relationship.source_node.plugins',
+                     'outbound_relationship_instances.relationship.target_node.plugins',
+                     'outbound_relationship_instances.target_node_instance')
+    }
 
     runtime_properties = Column(Dict)
     scaling_groups = Column(List)
@@ -539,6 +567,7 @@ class RelationshipInstanceBase(ModelMixin):
                        'target_node_instance_fk',
                        'source_position',
                        'target_position']
+    _indexes = (('source_node_instance_fk',), ('target_node_instance_fk',))
 
     source_position = Column(Integer)
     target_position = Column(Integer)
@@ -609,6 +638,8 @@ class PluginBase(ModelMixin):
     """
     __tablename__ = 'plugins'
 
+    _indexes = (('package_name', 'package_version'),)
+
     archive_name = Column(Text, nullable=False, index=True)
     distribution = Column(Text)
     distribution_release = Column(Text)
@@ -628,6 +659,7 @@ class TaskBase(ModelMixin):
     """
     __tablename__ = 'tasks'
     _private_fields = ['node_instance_fk', 'relationship_instance_fk', 'execution_fk']
+    _indexes = (('execution_fk', 'status'), ('node_instance_fk',), ('relationship_instance_fk',))
 
     @declared_attr
     def node_instance_fk(cls):
@@ -123,3 +123,24 @@ class ModelStorage(Storage):
         """
         for mapi in self.registered.values():
             mapi.drop()
+
+    def enable_cache(self):
+        """
+        Enable the read-through cache of all the registered models.
+        """
+        for mapi in self.registered.values():
+            mapi.enable_cache()
+
+    def disable_cache(self):
+        """
+        Disable (and drop) the read-through cache of all the registered models.
+        """
+        for mapi in self.registered.values():
+            mapi.disable_cache()
+
+    def invalidate_cache(self):
+        """
+        Evict all the entries from the read-through cache of all the registered models.
+        """
+        for mapi in self.registered.values():
+            mapi.invalidate()
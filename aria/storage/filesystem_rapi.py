@@ -16,21 +16,143 @@
 SQLalchemy based RAPI
 """
 import os
+import stat
+import errno
 import shutil
+import hashlib
+import tempfile
+import threading
 from contextlib import contextmanager
 from functools import partial
-from distutils import dir_util                                # https://github.com/PyCQA/pylint/issues/73; pylint: disable=no-name-in-module
 from multiprocessing import RLock
 
+from aria.utils.collections import OrderedDict
 from aria.storage import (
     api,
     exceptions
 )
 
 
+_OBJECTS_DIRECTORY_NAME = '.objects'
+_CHUNK_SIZE = 64 * 1024
+
+
+class _ObjectPaths(object):
+    """
+    A bounded, per-process LRU map of stored objects by their (device, inode), which all the links
+    to an object share, along with their size and modification time when stored.
+
+    This lets uploading a file of another entry skip hashing it, unless its content was since
+    changed in place.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._paths = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._paths.pop(key, None)
+            if value is None:
+                return None, None
+            self._paths[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._paths.pop(key, None)
+            self._paths[key] = value
+            while len(self._paths) > self.max_size:
+                self._paths.popitem(last=False)
+
+
+_object_paths = _ObjectPaths(max_size=10000)
+
+
+class _ReadCache(object):
+    """
+    A bounded, per-process LRU cache of the contents of read resources, and of the resource paths
+    that were found missing.
+
+    Contents are validated against the file's inode, size and modification time, so a file
+    replaced by a later upload is read again. A missing path is validated against the
+    modification time of its nearest existing ancestor directory, which changes when anything
+    is created in it.
+    """
+
+    def __init__(self, max_size, max_content_size, max_missing_paths):
+        self.max_size = max_size
+        self.max_content_size = max_content_size
+        self.max_missing_paths = max_missing_paths
+        self._size = 0
+        self._contents = OrderedDict()
+        self._missing_paths = {}
+        self._lock = threading.Lock()
+
+    def read(self, path, path_stat):
+        signature = (path_stat.st_ino, path_stat.st_size, path_stat.st_mtime)
+        with self._lock:
+            cached = self._contents.pop(path, None)
+            if cached is not None:
+                self._size -= len(cached[1])
+                if cached[0] == signature:
+                    self._contents[path] = cached
+                    self._size += len(cached[1])
+                    return cached[1]
+        with open(path, 'rb') as resource_file:
+            content = resource_file.read(path_stat.st_size)
+        if len(content) <= self.max_content_size:
+            with self._lock:
+                if path not in self._contents:
+                    self._contents[path] = (signature, content)
+                    self._size += len(content)
+                while self._size > self.max_size:
+                    self._size -= len(self._contents.popitem(last=False)[1][1])
+        return content
+
+    def is_missing(self, path):
+        with self._lock:
+            missing = self._missing_paths.get(path)
+        if missing is None:
+            return False
+        ancestor, ancestor_mtime = missing
+        try:
+            return os.stat(ancestor).st_mtime == ancestor_mtime
+        except OSError:
+            return False
+
+    def set_missing(self, path):
+        ancestor = os.path.dirname(path)
+        while True:
+            try:
+                ancestor_mtime = os.stat(ancestor).st_mtime
+                break
+            except OSError:
+                if os.path.dirname(ancestor) == ancestor:
+                    return
+                ancestor = os.path.dirname(ancestor)
+        with self._lock:
+            if len(self._missing_paths) >= self.max_missing_paths:
+                self._missing_paths.clear()
+            self._missing_paths[path] = (ancestor, ancestor_mtime)
+
+
+_read_cache = _ReadCache(max_size=64 * 1024 * 1024,
+                         max_content_size=8 * 1024 * 1024,
+                         max_missing_paths=10000)
+
+
 class FileSystemResourceAPI(api.ResourceAPI):
     """
     File system resource storage.
+
+    The content of every uploaded file is stored once, by its hash, in an objects directory
+    shared by all the resource types of the same root directory. The entries' directory trees
+    hold hard links to these objects, so uploading the same file for many entries (e.g. the
+    resources of a blueprint for each of its deployments) does not take any more disk space.
+    Where hard links are not supported (or the objects are on another file system) files are
+    copied instead. Downloads are always copies, which the caller is free to change.
     """
 
     def __init__(self, directory, **kwargs):
@@ -41,6 +163,7 @@ class FileSystemResourceAPI(api.ResourceAPI):
         super(FileSystemResourceAPI, self).__init__(**kwargs)
         self.directory = directory
         self.base_path = os.path.join(self.directory, self.name)
+        self.objects_path = os.path.join(self.directory, _OBJECTS_DIRECTORY_NAME)
         self._join_path = partial(os.path.join, self.base_path)
         self._lock = RLock()
 
@@ -91,6 +214,10 @@ class FileSystemResourceAPI(api.ResourceAPI):
             os.makedirs(self.base_path)
         except (OSError, IOError):
             pass
+        try:
+            os.makedirs(self.objects_path)
+        except (OSError, IOError):
+            pass
 
     def read(self, entry_id, path=None, **_):
         """
@@ -104,16 +231,21 @@ class FileSystemResourceAPI(api.ResourceAPI):
         """
         resource_relative_path = os.path.join(self.name, entry_id, path or '')
         resource = os.path.join(self.directory, resource_relative_path)
-        if not os.path.exists(resource):
+        try:
+            if _read_cache.is_missing(resource):
+                raise OSError(errno.ENOENT, resource)
+            resource_stat = os.stat(resource)
+        except OSError:
+            _read_cache.set_missing(resource)
             raise exceptions.StorageError("Resource {0} does not exist".
                                           format(resource_relative_path))
-        if not os.path.isfile(resource):
+        if stat.S_ISDIR(resource_stat.st_mode):
             resources = os.listdir(resource)
             if len(resources) != 1:
                 raise exceptions.StorageError('No resource in path: {0}'.format(resource))
             resource = os.path.join(resource, resources[0])
-        with open(resource, 'rb') as resource_file:
-            return resource_file.read()
+            resource_stat = os.stat(resource)
+        return _read_cache.read(resource, resource_stat)
 
     def download(self, entry_id, destination, path=None, **_):
         """
@@ -129,10 +261,15 @@ class FileSystemResourceAPI(api.ResourceAPI):
         if not os.path.exists(resource):
             raise exceptions.StorageError("Resource {0} does not exist".
                                           format(resource_relative_path))
+        # Copied rather than linked, as the caller may change the downloaded files, and an object
+        # is shared by all the entries with the same content
         if os.path.isfile(resource):
-            shutil.copy2(resource, destination)
+            if os.path.isdir(destination):
+                destination = os.path.join(destination, os.path.basename(resource))
+            _copy(resource, destination)
         else:
-            dir_util.copy_tree(resource, destination)  # pylint: disable=no-member
+            for resource_path, destination_path in _walk_tree(resource, destination):
+                _copy(resource_path, destination_path)
 
     def upload(self, entry_id, source, path=None, **_):
         """
@@ -148,6 +285,98 @@ class FileSystemResourceAPI(api.ResourceAPI):
             os.makedirs(resource_directory)
         destination = os.path.join(resource_directory, path or '')
         if os.path.isfile(source):
-            shutil.copy2(source, destination)
+            if os.path.isdir(destination):
+                destination = os.path.join(destination, os.path.basename(source))
+            _link(self._store_object(source), destination)
         else:
-            dir_util.copy_tree(source, destination)                                       # pylint: disable=no-member
+            for source_path, destination_path in _walk_tree(source, destination):
+                _link(self._store_object(source_path), destination_path)
+
+    def _store_object(self, source):
+        """
+        Store the content of a file in the objects directory, unless it is already there.
+
+        :param str source: the path of the file.
+        :return: the path of the stored object.
+        """
+        source_stat = os.stat(source)
+        object_path, object_signature = _object_paths.get((source_stat.st_dev, source_stat.st_ino))
+        if object_path is not None and _is_same_file(source, object_path) and \
+                object_signature == (source_stat.st_size, source_stat.st_mtime):
+            return object_path
+
+        digest = hashlib.sha256()
+        with open(source, 'rb') as source_file:
+            for chunk in iter(partial(source_file.read, _CHUNK_SIZE), b''):
+                digest.update(chunk)
+        object_id = digest.hexdigest()
+        object_path = os.path.join(self.objects_path, object_id[:2], object_id)
+        if not os.path.exists(object_path):
+            if not os.path.isdir(os.path.dirname(object_path)):
+                os.makedirs(os.path.dirname(object_path))
+            # Copied under a temporary name first, so that a partially written object is never
+            # linked to
+            temp_file_descriptor, temp_path = tempfile.mkstemp(dir=self.objects_path)
+            os.close(temp_file_descriptor)
+            try:
+                shutil.copy2(source, temp_path)
+                os.rename(temp_path, object_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        object_stat = os.stat(object_path)
+        _object_paths.set((object_stat.st_dev, object_stat.st_ino),
+                          (object_path, (object_stat.st_size, object_stat.st_mtime)))
+        return object_path
+
+
+def _walk_tree(source, destination):
+    """
+    Yield the (source, destination) path pairs of all the files under a directory, creating the
+    matching directories under the destination.
+    """
+    for directory_path, _, file_names in os.walk(source):
+        destination_directory = os.path.join(destination,
+                                              os.path.relpath(directory_path, source))
+        if not os.path.isdir(destination_directory):
+            os.makedirs(destination_directory)
+        for file_name in file_names:
+            yield (os.path.join(directory_path, file_name),
+                   os.path.join(destination_directory, file_name))
+
+
+def _copy(source, destination):
+    """
+    Copy a file, replacing any existing file rather than writing into it (it may be a link to an
+    object).
+    """
+    if os.path.lexists(destination):
+        os.remove(destination)
+    shutil.copy2(source, destination)
+
+
+def _link(source, destination):
+    """
+    Make the destination path a hard link to the source file, replacing any existing file. Falls
+    back to copying when the source can't be linked to.
+
+    Only entries are linked to objects: files outside of the storage are always copied (see
+    :code:`_copy`).
+    """
+    if os.path.exists(destination):
+        if _is_same_file(source, destination):
+            return
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except (AttributeError, OSError) as e:
+        # `os.link` is missing on Windows, and fails across file systems
+        if isinstance(e, OSError) and e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        shutil.copy2(source, destination)
+
+
+def _is_same_file(path, other_path):
+    # `os.path.samefile` is missing on Windows, where files are copied rather than linked anyway
+    return os.path.exists(other_path) and hasattr(os.path, 'samefile') and \
+        os.path.samefile(path, other_path)
@@ -16,18 +16,38 @@
 SQLAlchemy based MAPI
 """
 
+from sqlalchemy import bindparam, inspect
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext import baked
+from sqlalchemy.orm import (
+    Query,
+    ColumnProperty,
+    joinedload,
+    subqueryload,
+    undefer,
+    scoped_session
+)
 
 from aria.utils.collections import OrderedDict
+from aria.utils.caching import HasCachedMethods, cachedmethod
 from aria.storage import (
     api,
     exceptions
 )
 
+# Caches the compiled form of our queries, keyed on their shape (see
+# `SQLAlchemyModelAPI._get_baked_query`)
+_BAKERY = baked.bakery(size=1000)
+
 
-class SQLAlchemyModelAPI(api.ModelAPI):
+class SQLAlchemyModelAPI(api.ModelAPI, HasCachedMethods):
     """
     SQL based MAPI.
+
+    Queries are prepared once per shape, that is, per combination of included
+    columns, filtered columns (and the kind of filter: a value, a list of
+    values of a certain length or `None`) and sort. The actual filter values
+    are passed as bound parameters.
     """
 
     def __init__(self,
@@ -37,12 +57,22 @@ class SQLAlchemyModelAPI(api.ModelAPI):
         super(SQLAlchemyModelAPI, self).__init__(**kwargs)
         self._engine = engine
         self._session = session
+        self._cache = None
 
     def get(self, entry_id, include=None, **kwargs):
         """Return a single result based on the model class and element ID
         """
-        query = self._get_query(include, {'id': entry_id})
-        result = query.first()
+        if include:
+            baked_query, params = self._get_baked_query(include, {'id': entry_id})
+            result = baked_query(self._get_session()).params(params).first()
+        else:
+            result = self._get_cached(entry_id)
+            if result is None:
+                # Query.get goes through the session's identity map, and only emits SQL if the
+                # entry isn't currently loaded (or was expired by a commit)
+                result = self._session.query(self.model_cls).get(entry_id)
+                if result is not None and self._cache is not None:
+                    self._cache[entry_id] = result
 
         if not result:
             raise exceptions.StorageError(
@@ -72,10 +102,15 @@ class SQLAlchemyModelAPI(api.ModelAPI):
              filters=None,
              pagination=None,
              sort=None,
+             eager_load=None,
              **kwargs):
-        query = self._get_query(include, filters, sort)
-
-        results, total, size, offset = self._paginate(query, pagination)
+        if pagination:
+            query = self._get_query(include, filters, sort, eager_load)
+            results, total, size, offset = self._paginate(query, pagination)
+        else:
+            baked_query, params = self._get_baked_query(include, filters, sort, eager_load)
+            results = baked_query(self._get_session()).params(params).all()
+            total, size, offset = len(results), 0, 0
 
         return ListResult(
             items=results,
@@ -88,10 +123,65 @@ class SQLAlchemyModelAPI(api.ModelAPI):
              include=None,
              filters=None,
              sort=None,
+             eager_load=None,
+             batch_size=None,
              **kwargs):
         """Return a (possibly empty) list of `model_class` results
+
+        :param eager_load: The name of an eager loading profile of the model class (see
+        `_eager_loading_profiles`), or a list of relationship paths (e.g.
+        `node.deployment`) to load along with the results instead of lazily
+        :param batch_size: If set, results are fetched in batches of (at most) this size
+        using keyset pagination on the ID column, so that the full result set
+        is never loaded at once. Results are then ordered by ID; the only
+        sort allowed is by ID
         """
-        return iter(self._get_query(include, filters, sort))
+        if batch_size:
+            return self._iter_batches(include, filters, sort, eager_load, batch_size)
+        baked_query, params = self._get_baked_query(include, filters, sort, eager_load)
+        return iter(baked_query(self._get_session()).params(params))
+
+    def _iter_batches(self, include, filters, sort, eager_load, batch_size):
+        """Yield the results of `iter` batch by batch, where each batch is a
+        separate query starting after the last ID of the previous one (unlike
+        OFFSET, this doesn't get slower as we advance)
+        """
+        id_column_name = self.model_cls.id_column_name()
+        sort = sort or {}
+        if set(sort.keys()) - set([id_column_name]):
+            raise exceptions.StorageError(
+                'Batched iteration over `{0}` can only be sorted by `{1}`'
+                .format(self.model_cls.__name__, id_column_name)
+            )
+        if include and id_column_name not in include:
+            raise exceptions.StorageError(
+                'Batched iteration over `{0}` must include `{1}`'
+                .format(self.model_cls.__name__, id_column_name)
+            )
+        descending = sort.get(id_column_name) == 'desc'
+        sort = OrderedDict(((id_column_name, 'desc' if descending else 'asc'),))
+
+        first_batch_query, params = self._get_baked_query(include, filters, sort, eager_load)
+        id_column = getattr(self.model_cls, id_column_name)
+        last_id = bindparam('last_id', type_=id_column.type)
+        batch_query = first_batch_query.with_criteria(
+            lambda query: query.filter(id_column < last_id if descending
+                                       else id_column > last_id),
+            descending)
+        batch_query.add_criteria(lambda query: query.limit(batch_size), batch_size)
+        first_batch_query.add_criteria(lambda query: query.limit(batch_size), batch_size)
+
+        session = self._get_session()
+        batch = first_batch_query(session).params(params).all()
+        while True:
+            for result in batch:
+                yield result
+            if len(batch) < batch_size:
+                break
+            params['last_id'] = getattr(batch[-1], id_column_name)
+            # Let the previous batch be garbage collected
+            del batch
+            batch = batch_query(session).params(params).all()
 
     def put(self, entry, **kwargs):
         """Create a `model_class` instance from a serializable `model` object
@@ -108,6 +198,7 @@ class SQLAlchemyModelAPI(api.ModelAPI):
     def delete(self, entry, **kwargs):
         """Delete a single result based on the model class and element ID
         """
+        self.invalidate(entry)
         self._load_relationships(entry)
         self._session.delete(entry)
         self._safe_commit()
@@ -130,6 +221,47 @@ class SQLAlchemyModelAPI(api.ModelAPI):
         self._load_relationships(entry)
         return entry
 
+    def enable_cache(self):
+        """Start caching the results of :code:`get` (a read-through cache)
+
+        The session's identity map only holds weak references, so an instance that isn't
+        referenced elsewhere is loaded again by every :code:`get`. The cache holds on to the
+        instances (the same ones the identity map returns, so they are still expired and
+        reloaded on commit as usual). Entries that are deleted through this API are evicted
+        automatically; use :code:`invalidate` for entries deleted elsewhere.
+        """
+        if self._cache is None:
+            self._cache = {}
+
+    def disable_cache(self):
+        """Stop caching and drop all cached entries
+        """
+        self._cache = None
+
+    def invalidate(self, entry=None):
+        """Evict an entry (an instance or an ID) from the cache, or all entries if none given
+        """
+        if self._cache is None:
+            return
+        if entry is None:
+            self._cache.clear()
+        elif isinstance(entry, self.model_cls):
+            for entry_id, cached in self._cache.items():
+                if cached is entry:
+                    del self._cache[entry_id]
+        else:
+            self._cache.pop(entry, None)
+
+    def _get_cached(self, entry_id):
+        if self._cache is None:
+            return None
+        result = self._cache.get(entry_id)
+        if result is not None and result not in self._session:
+            # The session was closed or rolled back, so the instance is no longer usable
+            del self._cache[entry_id]
+            return None
+        return result
+
     def _destroy_connection(self):
         pass
 
@@ -137,7 +269,14 @@ class SQLAlchemyModelAPI(api.ModelAPI):
         pass
 
     def create(self, checkfirst=True, **kwargs):
-        self.model_cls.__table__.create(self._engine, checkfirst=checkfirst)
+        table = self.model_cls.__table__
+        table.create(self._engine, checkfirst=checkfirst)
+        # An existing table may predate some of the model's indexes
+        existing_indexes = set(index['name']
+                               for index in inspect(self._engine).get_indexes(table.name))
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(self._engine)
 
     def drop(self):
         """
@@ -163,14 +302,14 @@ class SQLAlchemyModelAPI(api.ModelAPI):
         the query
         :return: An SQLAlchemy AppenderQuery object
         """
-        # If only some columns are included, query through the session object
+        # If only some columns are included, query them
         if include:
             # Make sure that attributes come before association proxies
             include.sort(key=lambda x: x.is_clause_element)
-            query = self._session.query(*include)
+            query = Query(include)
         else:
             # If all columns should be returned, query directly from the model
-            query = self._session.query(self.model_cls)
+            query = Query(self.model_cls)
 
         if not self._skip_joining(joins, include):
             for join_table in joins:
@@ -238,84 +377,178 @@ class SQLAlchemyModelAPI(api.ModelAPI):
                 query = query.order_by(column)
         return query
 
-    def _filter_query(self, query, filters):
-        """Add filter clauses to the query
+    def _filter_query(self, query, filter_shape):
+        """Add filter clauses to the query, with bound parameters in place of
+        the values (see `_get_filter_params`)
 
         :param query: Base SQL query
-        :param filters: An optional dictionary where keys are column names to
-        filter by, and values are values applicable for those columns (or lists
-        of such values)
+        :param filter_shape: A tuple of (column name, value shape) pairs (see
+        `_get_value_shape`)
         :return: An SQLAlchemy AppenderQuery object
         """
-        return self._add_value_filter(query, filters)
+        for index, (column_name, value_shape) in enumerate(filter_shape):
+            column = self._get_column(column_name)
+            if value_shape is None:
+                query = query.filter(column.is_(None))
+            elif value_shape == '=':
+                query = query.filter(
+                    column == bindparam('filter_{0}'.format(index), type_=column.type))
+            else:
+                query = query.filter(column.in_([
+                    bindparam('filter_{0}_{1}'.format(index, i), type_=column.type)
+                    for i in range(value_shape)]))
+        return query
 
     @staticmethod
-    def _add_value_filter(query, filters):
-        for column, value in filters.items():
-            if isinstance(value, (list, tuple)):
-                query = query.filter(column.in_(value))
-            else:
-                query = query.filter(column == value)
+    def _get_value_shape(value):
+        """The part of a filter value that affects the SQL: `None` (for an
+        `IS NULL` clause), the length of a list or tuple (for an `IN` clause)
+        or `=` for anything else
+        """
+        if value is None:
+            return None
+        elif isinstance(value, (list, tuple)):
+            return len(value)
+        return '='
 
-        return query
+    @staticmethod
+    def _get_filter_params(filter_names, filters):
+        """Return the bound parameter values for the filters (see
+        `_filter_query`)
+        """
+        params = {}
+        for index, column_name in enumerate(filter_names):
+            value = filters[column_name]
+            if isinstance(value, (list, tuple)):
+                for i, v in enumerate(value):
+                    params['filter_{0}_{1}'.format(index, i)] = v
+            elif value is not None:
+                params['filter_{0}'.format(index)] = value
+        return params
 
     def _get_query(self,
                    include=None,
                    filters=None,
-                   sort=None):
+                   sort=None,
+                   eager_load=None):
         """Get an SQL query object based on the params passed
 
-        :param model_class: SQL DB table class
         :param include: An optional list of columns to include in the query
         :param filters: An optional dictionary where keys are column names to
         filter by, and values are values applicable for those columns (or lists
         of such values)
         :param sort: An optional dictionary where keys are column names to
         sort by, and values are the order (asc/desc)
+        :param eager_load: An optional eager loading profile name, or list of
+        relationship paths
         :return: A sorted and filtered query with only the relevant
         columns
         """
-        include, filters, sort, joins = self._get_joins_and_converted_columns(
-            include, filters, sort
-        )
-
-        query = self._get_base_query(include, joins)
-        query = self._filter_query(query, filters)
-        query = self._sort_query(query, sort)
+        query, _, params = self._prepare_query(include, filters, sort)
+        query = query.with_session(self._get_session()).params(params)
+        if eager_load and not include:
+            query = self._eager_load_query(query, eager_load)
         return query
 
-    def _get_joins_and_converted_columns(self,
-                                         include,
-                                         filters,
-                                         sort):
-        """Get a list of tables on which we need to join and the converted
-        `include`, `filters` and `sort` arguments (converted to actual SQLA
-        column/label objects instead of column names)
+    def _get_baked_query(self,
+                         include=None,
+                         filters=None,
+                         sort=None,
+                         eager_load=None):
+        """Like `_get_query`, but returns an SQLAlchemy BakedQuery, which
+        caches the compiled SQL too, and its bound parameters
+
+        :return: A tuple of the BakedQuery and the params to pass to it
         """
-        include = include or []
-        filters = filters or dict()
-        sort = sort or OrderedDict()
+        query, shape, params = self._prepare_query(include, filters, sort)
+        baked_query = _BAKERY(lambda session: query.with_session(session), shape)
+        if eager_load and not include:
+            eager_load_key = eager_load if isinstance(eager_load, basestring) \
+                else tuple(eager_load)
+            baked_query.add_criteria(lambda q: self._eager_load_query(q, eager_load),
+                                     eager_load_key)
+        return baked_query, params
+
+    def _eager_load_query(self, query, eager_load):
+        """Add eager loading options to the query
+
+        Collections are loaded with one extra query per relationship
+        (subquery loading), and scalar references are joined into the
+        query that loads their parent (joined loading). A path may end
+        with a deferred column (see `_deferred_column_groups`), which is
+        then loaded along with the rest of its model (without the rest of
+        its group).
 
-        all_columns = set(include) | set(filters.keys()) | set(sort.keys())
-        joins = self._get_joins(self.model_cls, all_columns)
+        :param query: Base SQL query
+        :param eager_load: A profile name, or a list of dot-separated
+        relationship (and deferred column) paths
+        :return: An SQLAlchemy AppenderQuery object
+        """
+        if isinstance(eager_load, basestring):
+            profiles = getattr(self.model_cls, '_eager_loading_profiles', {})
+            if eager_load not in profiles:
+                raise exceptions.StorageError(
+                    '`{0}` has no eager loading profile `{1}`'
+                    .format(self.model_cls.__name__, eager_load)
+                )
+            eager_load = profiles[eager_load]
+
+        for path in eager_load:
+            model_class = self.model_cls
+            loader = None
+            for attribute_name in path.split('.'):
+                attribute = getattr(model_class, attribute_name)
+                prop = attribute.property
+                if isinstance(prop, ColumnProperty):
+                    strategy = undefer
+                else:
+                    strategy = subqueryload if prop.uselist else joinedload
+                    model_class = prop.mapper.class_
+                if loader is None:
+                    loader = strategy(attribute)
+                else:
+                    loader = getattr(loader, strategy.__name__)(attribute)
+            query = query.options(loader)
+        return query
 
-        include, filters, sort = self._get_columns_from_field_names(
-            include, filters, sort
-        )
-        return include, filters, sort, joins
-
-    def _get_columns_from_field_names(self,
-                                      include,
-                                      filters,
-                                      sort):
-        """Go over the optional parameters (include, filters, sort), and
-        replace column names with actual SQLA column objects
+    def _prepare_query(self, include, filters, sort):
+        """Return a session-less query prepared for the shape of the params,
+        the shape itself and the bound parameters for the filter values
+        """
+        include = tuple(include or ())
+        filters = filters or {}
+        sort = tuple((sort or {}).items())
+        filter_names = sorted(filters.keys())
+        filter_shape = tuple((column_name, self._get_value_shape(filters[column_name]))
+                             for column_name in filter_names)
+
+        query = self._get_prepared_query(include, filter_shape, sort)
+        shape = (self.model_cls, include, filter_shape, sort)
+        return query, shape, self._get_filter_params(filter_names, filters)
+
+    @cachedmethod
+    def _get_prepared_query(self, include, filter_shape, sort):
+        """Build a session-less query for the shape of the params (only
+        once per shape)
         """
+        all_columns = set(include) | set(column_name for column_name, _ in filter_shape) | \
+            set(column_name for column_name, _ in sort)
+        joins = self._get_joins(self.model_cls, all_columns)
         include = [self._get_column(c) for c in include]
-        filters = dict((self._get_column(c), filters[c]) for c in filters)
-        sort = OrderedDict((self._get_column(c), sort[c]) for c in sort)
+        sort = OrderedDict((self._get_column(c), order) for c, order in sort)
+
+        query = self._get_base_query(include, joins)
+        query = self._filter_query(query, filter_shape)
+        query = self._sort_query(query, sort)
+        return query
 
-        return include, filters, sort
+    def _get_session(self):
+        """Return the actual session (a scoped session is a registry of
+        thread-local sessions, and can't be used to execute queries directly)
+        """
+        if isinstance(self._session, scoped_session):
+            return self._session()
+        return self._session
 
     def _get_column(self, column_name):
         """Return the column on which an action (filtering, sorting, etc.)
@@ -27,11 +27,13 @@ classes:
     * Model - abstract model implementation.
 """
 
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy.orm import relationship, backref, deferred
 from sqlalchemy.ext import associationproxy
+from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy import (
     Column,
     ForeignKey,
+    Index,
     Integer,
     Text
 )
@@ -39,6 +41,30 @@ from sqlalchemy import (
 
 class ModelMixin(object):
 
+    # Groups of columns (by group name) that aren't loaded along with the rest of the model, but
+    # only when one of them is first accessed (or when requested using `eager_load`, see
+    # `SQLAlchemyModelAPI.iter`). Meant for large columns that many callers don't need.
+    _deferred_column_groups = {}
+
+    # Indexes, as tuples of column names, that match the filters the orchestrator and the CLI
+    # query the model by. The index names are derived from the column names, so that
+    # `SQLAlchemyModelAPI.create` can add indexes missing from tables created by older versions.
+    _indexes = ()
+
+    @declared_attr
+    def __table_args__(cls):                                                                        # pylint: disable=no-self-argument
+        return tuple(Index('ix_{0}_{1}'.format(cls.__tablename__, '_'.join(column_names)),
+                           *column_names)
+                     for column_names in cls._indexes)
+
+    @classmethod
+    def __declare_first__(cls):
+        # Called by declarative before the mappers are configured
+        for group, column_names in cls._deferred_column_groups.iteritems():
+            for column_name in column_names:
+                cls.__mapper__.add_property(
+                    column_name, deferred(cls.__table__.c[column_name], group=group))
+
     @classmethod
     def id_column_name(cls):
         raise NotImplementedError
@@ -14,13 +14,16 @@
 # limitations under the License.
 
 import json
+import zlib
 from collections import namedtuple
 
 from sqlalchemy import (
     TypeDecorator,
     VARCHAR,
+    LargeBinary,
     event
 )
+from sqlalchemy.types import JSON
 from sqlalchemy.ext import mutable
 
 from . import exceptions
@@ -62,6 +65,88 @@ class List(_MutableType):
         return list
 
 
+class _CompressedMutableTypeMixin(object):
+    """
+    Stores the JSON compressed with zlib in a binary column.
+
+    Worth it for large values that are read far more often than written: there are far fewer
+    bytes to read, and zlib decompression is cheap compared to the JSON decoding we do anyway.
+
+    Values stored uncompressed (by a column that was a plain :class:`Dict` or :class:`List` before)
+    are read as they are, and are compressed when next written. They are told apart by the zlib
+    header, which no JSON text starts with.
+    """
+    impl = LargeBinary
+
+    COMPRESSION_LEVEL = 6
+
+    def process_bind_param(self, value, dialect):
+        if value is not None:
+            value = zlib.compress(json.dumps(value), self.COMPRESSION_LEVEL)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None:
+            try:
+                value = zlib.decompress(value)
+            except zlib.error:
+                # Stored uncompressed
+                pass
+            value = json.loads(value)
+        return value
+
+
+class CompressedDict(_CompressedMutableTypeMixin, Dict):
+    """
+    A :class:`Dict` stored compressed.
+    """
+    pass
+
+
+class CompressedList(_CompressedMutableTypeMixin, List):
+    """
+    A :class:`List` stored compressed.
+    """
+    pass
+
+
+class _NativeMutableTypeMixin(object):
+    """
+    Uses the backend's native JSON type (letting the driver do the encoding and decoding) if
+    there is one, otherwise falls back to JSON in a :code:`VARCHAR`.
+    """
+    NATIVE_JSON_DIALECTS = ('postgresql', 'mysql')
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name in self.NATIVE_JSON_DIALECTS:
+            return dialect.type_descriptor(JSON(none_as_null=True))
+        return super(_NativeMutableTypeMixin, self).load_dialect_impl(dialect)
+
+    def process_bind_param(self, value, dialect):
+        if dialect.name in self.NATIVE_JSON_DIALECTS:
+            return value
+        return super(_NativeMutableTypeMixin, self).process_bind_param(value, dialect)
+
+    def process_result_value(self, value, dialect):
+        if dialect.name in self.NATIVE_JSON_DIALECTS:
+            return value
+        return super(_NativeMutableTypeMixin, self).process_result_value(value, dialect)
+
+
+class NativeDict(_NativeMutableTypeMixin, Dict):
+    """
+    A :class:`Dict` stored in the backend's native JSON type, if it has one.
+    """
+    pass
+
+
+class NativeList(_NativeMutableTypeMixin, List):
+    """
+    A :class:`List` stored in the backend's native JSON type, if it has one.
+    """
+    pass
+
+
 class _StrictDictMixin(object):
 
     @classmethod
@@ -15,6 +15,7 @@
 
 from __future__ import absolute_import  # so we can import standard 'collections'
 
+import sys
 from copy import deepcopy
 try:
     from collections import OrderedDict
@@ -112,8 +113,13 @@ EMPTY_READ_ONLY_DICT = FrozenDict()
 class StrictList(list):
     """
     A list that raises :class:`TypeError` exceptions when objects of the wrong type are inserted.
+
+    Type checking can be globally disabled (e.g. by the --no-type-checks parse flag) by setting
+    :code:`StrictList.CHECK_TYPES` to False.
     """
 
+    CHECK_TYPES = True
+
     def __init__(self,
                  items=None,
                  value_class=None,
@@ -132,7 +138,8 @@ class StrictList(list):
                 self.append(item)
 
     def _wrap(self, value):
-        if (self.value_class is not None) and (not isinstance(value, self.value_class)):
+        if self.CHECK_TYPES and (self.value_class is not None) \
+            and (not isinstance(value, self.value_class)):
             raise TypeError('value must be a "%s": %s' % (cls_name(self.value_class), repr(value)))
         if self.wrapper_function is not None:
             value = self.wrapper_function(value)
@@ -172,8 +179,13 @@ class StrictDict(OrderedDict):
     """
     An ordered dict that raises :class:`TypeError` exceptions
     when keys or values of the wrong type are used.
+
+    Type checking can be globally disabled (e.g. by the --no-type-checks parse flag) by setting
+    :code:`StrictDict.CHECK_TYPES` to False.
     """
 
+    CHECK_TYPES = True
+
     def __init__(self,
                  items=None,
                  key_class=None,
@@ -195,7 +207,8 @@ class StrictDict(OrderedDict):
                 self[k] = v
 
     def __getitem__(self, key):
-        if (self.key_class is not None) and (not isinstance(key, self.key_class)):
+        if self.CHECK_TYPES and (self.key_class is not None) \
+            and (not isinstance(key, self.key_class)):
             raise TypeError('key must be a "%s": %s' % (cls_name(self.key_class), repr(key)))
         value = super(StrictDict, self).__getitem__(key)
         if self.unwrapper_function is not None:
@@ -203,14 +216,78 @@ class StrictDict(OrderedDict):
         return value
 
     def __setitem__(self, key, value, **_):
-        if (self.key_class is not None) and (not isinstance(key, self.key_class)):
-            raise TypeError('key must be a "%s": %s' % (cls_name(self.key_class), repr(key)))
-        if (self.value_class is not None) and (not isinstance(value, self.value_class)):
-            raise TypeError('value must be a "%s": %s' % (cls_name(self.value_class), repr(value)))
+        if self.CHECK_TYPES:
+            if (self.key_class is not None) and (not isinstance(key, self.key_class)):
+                raise TypeError('key must be a "%s": %s' % (cls_name(self.key_class), repr(key)))
+            if (self.value_class is not None) and (not isinstance(value, self.value_class)):
+                raise TypeError('value must be a "%s": %s'
+                                % (cls_name(self.value_class), repr(value)))
         if self.wrapper_function is not None:
             value = self.wrapper_function(value)
         return super(StrictDict, self).__setitem__(key, value)
 
+class LazyStrictDict(object):
+    """
+    Descriptor for a :class:`StrictDict` that is only created when first accessed.
+
+    Useful for classes with :code:`__slots__` that have many containers that are usually empty. The
+    dict is stored in :code:`slot_name`, which must be initialized to None. Internal code that only
+    reads the container can access the slot directly in order to avoid creating it.
+
+    :code:`value_class` may also be the name of a class in the owner's module, to allow for
+    forward references.
+    """
+
+    def __init__(self, slot_name, key_class=None, value_class=None):
+        self.slot_name = slot_name
+        self.key_class = key_class
+        self.value_class = value_class
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = getattr(instance, self.slot_name)
+        if value is None:
+            self.value_class = _resolve_class(self, self.value_class, owner)
+            value = StrictDict(key_class=self.key_class, value_class=self.value_class)
+            setattr(instance, self.slot_name, value)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.slot_name, value)
+
+class LazyStrictList(object):
+    """
+    Descriptor for a :class:`StrictList` that is only created when first accessed.
+
+    See :class:`LazyStrictDict`.
+    """
+
+    def __init__(self, slot_name, value_class=None):
+        self.slot_name = slot_name
+        self.value_class = value_class
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = getattr(instance, self.slot_name)
+        if value is None:
+            self.value_class = _resolve_class(self, self.value_class, owner)
+            value = StrictList(value_class=self.value_class)
+            setattr(instance, self.slot_name, value)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.slot_name, value)
+
+def _resolve_class(descriptor, cls, owner):
+    if isinstance(cls, basestring):
+        # Look for the class in the module of the class that declared the descriptor
+        for declaring_cls in owner.__mro__:
+            if descriptor in vars(declaring_cls).itervalues():
+                return getattr(sys.modules[declaring_cls.__module__], cls)
+    return cls
+
 def merge(dict_a, dict_b, path=None, strict=False):
     """
     Merges dicts, recursively.
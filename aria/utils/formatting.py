@@ -16,10 +16,12 @@
 from __future__ import absolute_import  # so we can import standard 'collections'
 
 import json
+import itertools
 from types import MethodType
 from ruamel import yaml  # @UnresolvedImport
 
-from .collections import FrozenList, FrozenDict, StrictList, StrictDict, OrderedDict
+from .collections import (FrozenList, FrozenDict, StrictList, StrictDict, OrderedDict, prune,
+                          is_removable)
 
 # Add our types to ruamel.yaml (for round trips)
 yaml.representer.RoundTripRepresenter.add_representer(
@@ -141,6 +143,20 @@ def as_raw_list(value):
     return [as_raw(v) for v in value]
 
 
+def as_raw_iter(value):
+    """
+    Like :code:`as_raw_list`, but returns an iterator that converts the values on demand.
+
+    Used for streaming large structures (see :code:`json_dump` and :code:`yaml_dump`).
+    """
+
+    if value is None:
+        return iter(())
+    if isinstance(value, dict):
+        value = value.itervalues()
+    return (as_raw(v) for v in value)
+
+
 def as_raw_dict(value):
     """
     Assuming value is a dict, converts its values using :code:`as_raw`.
@@ -199,5 +215,134 @@ def yaml_dumps(value, indent=2):
     return yaml.dump(value, indent=indent, allow_unicode=True, Dumper=YamlAsRawDumper)
 
 
+def json_dump(value, out, indent=2, pruned=False):
+    """
+    Like :code:`json_dumps`, but writes to :code:`out` (any object with a :code:`write` method)
+    piece by piece.
+
+    If the value is a dict, its iterator values (see :code:`as_raw_iter`) are consumed and written
+    one item at a time, as is the value itself if it is an iterator, so that memory use does not
+    depend on the number of items. If :code:`pruned` is true, :code:`None` and empty lists and dicts
+    are skipped on the fly (see :code:`prune`).
+    """
+
+    if isinstance(value, dict):
+        items = _iter_streamed_items(value, pruned)
+        start, end = '{', '}'
+    elif _is_iterator(value):
+        items = ((None, v) for v in _iter_streamed_values(value, pruned))
+        start, end = '[', ']'
+    else:
+        out.write(json_dumps(_as_raw_chunk(value, pruned), indent=indent))
+        return
+
+    indentation = ' ' * indent
+    first = True
+    for key, item in items:
+        out.write('%s\n%s' % (start if first else ', ', indentation))
+        first = False
+        if key is not None:
+            out.write('%s: ' % json.dumps(key, ensure_ascii=False))
+        if _is_iterator(item):
+            first_value = True
+            for v in item:
+                out.write('%s\n%s%s' % ('[' if first_value else ', ', indentation, indentation))
+                first_value = False
+                out.write(_indent(json_dumps(v, indent=indent), indentation + indentation))
+            out.write(('\n%s]' % indentation) if not first_value else '[]')
+        else:
+            out.write(_indent(json_dumps(item, indent=indent), indentation))
+    out.write(('\n%s' % end) if not first else (start + end))
+
+
+def yaml_dump(value, out, indent=2, pruned=False):
+    """
+    Like :code:`yaml_dumps`, but writes to :code:`out` (any object with a :code:`write` method)
+    piece by piece.
+
+    See :code:`json_dump`.
+    """
+
+    if isinstance(value, dict):
+        written = False
+        for key, item in _iter_streamed_items(value, pruned):
+            written = True
+            if _is_iterator(item):
+                first_value = True
+                for v in item:
+                    if first_value:
+                        out.write(yaml_dumps(OrderedDict(((key, None),)), indent=indent))
+                        first_value = False
+                    out.write(yaml_dumps([v], indent=indent))
+                if first_value:
+                    out.write(yaml_dumps(OrderedDict(((key, []),)), indent=indent))
+            else:
+                out.write(yaml_dumps(OrderedDict(((key, item),)), indent=indent))
+        if not written:
+            out.write(yaml_dumps(OrderedDict(), indent=indent))
+    elif _is_iterator(value):
+        written = False
+        for v in _iter_streamed_values(value, pruned):
+            written = True
+            out.write(yaml_dumps([v], indent=indent))
+        if not written:
+            out.write(yaml_dumps([], indent=indent))
+    else:
+        out.write(yaml_dumps(_as_raw_chunk(value, pruned), indent=indent))
+
+
 def yaml_loads(value):
     return yaml.load(value, Loader=yaml.SafeLoader)
+
+
+def _is_iterator(value):
+    return hasattr(value, 'next') and hasattr(value, '__iter__')
+
+
+def _peek(iterator):
+    """
+    Returns an equivalent iterator, or None if the iterator is empty.
+    """
+
+    try:
+        first_value = iterator.next()
+    except StopIteration:
+        return None
+    return itertools.chain((first_value,), iterator)
+
+
+def _indent(string, indentation):
+    # JSON and YAML block strings are safe to indent line by line
+    return string.replace('\n', '\n' + indentation)
+
+
+def _as_raw_chunk(value, pruned):
+    if hasattr(value, 'as_raw'):
+        value = as_raw(value)
+    if pruned:
+        prune(value)
+    return value
+
+
+def _iter_streamed_values(iterator, pruned):
+    for value in iterator:
+        value = _as_raw_chunk(value, pruned)
+        if pruned and is_removable(None, None, value):
+            continue
+        yield value
+
+
+def _iter_streamed_items(the_dict, pruned):
+    for key, value in the_dict.iteritems():
+        if _is_iterator(value):
+            # We need to peek in order to know if the iterator is empty
+            value = _peek(_iter_streamed_values(value, pruned))
+            if value is None:
+                if pruned:
+                    continue
+                value = iter(())
+        else:
+            value = _as_raw_chunk(value, pruned)
+            if pruned and is_removable(the_dict, key, value):
+                continue
+        yield key, value
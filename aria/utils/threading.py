@@ -92,13 +92,16 @@ class FixedThreadPoolExecutor(object):
     def __init__(self,
                  size=None,
                  timeout=None,
-                 print_exceptions=False):
+                 print_exceptions=False,
+                 gathered_exceptions=(Exception,)):
         """
         :param size: Number of threads in the pool (fixed).
         :param timeout: Timeout in seconds for all
                blocking operations. (Defaults to none, meaning no timeout)
         :param print_exceptions: Set to true in order to
                print exceptions from tasks. (Defaults to false)
+        :param gathered_exceptions: Exception classes thrown by tasks
+               to gather. (Defaults to Exception)
         """
         if not size:
             try:
@@ -109,8 +112,10 @@ class FixedThreadPoolExecutor(object):
         self.size = size
         self.timeout = timeout
         self.print_exceptions = print_exceptions
+        self.gathered_exceptions = gathered_exceptions
 
         self._tasks = Queue()
+        self._cancelled = False
         self._returns = {}
         self._exceptions = {}
         self._id_creator = itertools.count()
@@ -131,8 +136,12 @@ class FixedThreadPoolExecutor(object):
         The task will be called ASAP on the next available worker thread in the pool.
 
         Will raise an :class:`ExecutorException` exception if cannot be submitted.
+
+        Tasks submitted after :code:`cancel` has been called are silently discarded.
         """
 
+        if self._cancelled:
+            return
         try:
             self._tasks.put((self._id_creator.next(), func, args, kwargs), timeout=self.timeout)
         except Full:
@@ -155,6 +164,16 @@ class FixedThreadPoolExecutor(object):
                 raise ExecutorException('cannot close executor: a thread seems to be hanging')
         self._workers = None
 
+    def cancel(self):
+        """
+        Discards all tasks that have not yet started execution. Tasks that are already executing
+        are allowed to finish.
+
+        The worker threads are left alive, so you still need to call "close".
+        """
+
+        self._cancelled = True
+
     def drain(self):
         """
         Blocks until all current tasks finish execution, but leaves the worker threads alive.
@@ -216,6 +235,9 @@ class FixedThreadPoolExecutor(object):
         if task == self._CYANIDE:
             # Time to die :(
             return False
+        if self._cancelled:
+            self._tasks.task_done()
+            return True
         self._execute_task(*task)
         return True
 
@@ -223,7 +245,7 @@ class FixedThreadPoolExecutor(object):
         try:
             result = func(*args, **kwargs)
             self._returns[task_id] = result
-        except Exception as e:
+        except self.gathered_exceptions as e:
             self._exceptions[task_id] = e
             if self.print_exceptions:
                 with self._lock:
@@ -14,7 +14,9 @@
 # limitations under the License.
 
 import pytest
+from jinja2.utils import LRUCache
 
+from aria.orchestrator.context import common
 from tests import mock, storage
 
 _IMPLICIT_CTX_TEMPLATE = '{{ctx.deployment.name}}'
@@ -51,6 +53,35 @@ def test_download_resource_and_render_provided_variables(tmpdir, ctx):
     assert destination.read() == variable
 
 
+def test_render_compiles_template_once(tmpdir, ctx, monkeypatch):
+    compiled = _count_compilations(monkeypatch)
+    content = '{{variable}} {# compiled once #}'
+    for variable in ('first', 'second'):
+        assert ctx._render_resource(content, variables={'variable': variable}) == variable + ' '
+    assert len(compiled) == 1
+
+    # A new process, with an empty in-memory cache, loads the compiled template from the work
+    # directory
+    ctx = mock.context.simple(storage.get_sqlite_api_kwargs(), workdir=str(tmpdir))
+    for variable in ('third', 'fourth'):
+        monkeypatch.setattr(common, '_templates', LRUCache(1))
+        assert ctx._render_resource(content, variables={'variable': variable}) == variable + ' '
+    assert len(compiled) == 2
+    assert tmpdir.join('templates').listdir()
+    storage.release_sqlite_storage(ctx.model)
+
+
+def _count_compilations(monkeypatch):
+    compiled = []
+    compile_template = common._TEMPLATE_ENVIRONMENT.compile
+
+    def _compile(source, *args, **kwargs):
+        compiled.append(source)
+        return compile_template(source, *args, **kwargs)
+    monkeypatch.setattr(common._TEMPLATE_ENVIRONMENT, 'compile', _compile)
+    return compiled
+
+
 @pytest.fixture
 def ctx(tmpdir):
     context = mock.context.simple(storage.get_sqlite_api_kwargs(),
@@ -0,0 +1,195 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A stand-in for an ssh server, running the commands it is sent as the local user, for testing the
+ssh operations without an actual ssh server.
+"""
+
+import os
+import select
+import socket
+import subprocess
+import sys
+import threading
+
+import paramiko
+
+USER = 'aria'
+PASSWORD = 'aria'
+
+_host_key = paramiko.RSAKey.generate(1024)
+
+
+class SSHServer(object):
+
+    def __init__(self, env=None):
+        """
+        :param env: environment variables of the commands
+        """
+        self.env = env or {}
+        self.connections = 0
+        self.commands = []
+        self.port_forwards = 0
+        self._listener = socket.socket()
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(('localhost', 0))
+        self._listener.listen(socket.SOMAXCONN)
+        self.port = self._listener.getsockname()[1]
+        self._transports = []
+        self._closed = False
+        _start_thread(self._serve)
+
+    def _serve(self):
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except socket.error:
+                return
+            if self._closed:
+                sock.close()
+                return
+            self.connections += 1
+            # As sshd does for sessions
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            transport = paramiko.Transport(sock)
+            transport.add_server_key(_host_key)
+            transport.start_server(server=_ServerInterface(self, transport))
+            self._transports.append(transport)
+            _start_thread(self._accept_channels, transport)
+
+    @staticmethod
+    def _accept_channels(transport):
+        # Channels are closed once no longer referenced
+        channels = []
+        while transport.is_active():
+            channel = transport.accept(1)
+            if channel is not None:
+                channels.append(channel)
+
+    def close(self):
+        self._closed = True
+        self._listener.close()
+        # Unblocks the accept call
+        try:
+            socket.create_connection(('localhost', self.port)).close()
+        except socket.error:
+            pass
+        for transport in self._transports:
+            transport.close()
+
+
+class _ServerInterface(paramiko.ServerInterface):
+
+    def __init__(self, server, transport):
+        self._server = server
+        self._transport = transport
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (USER, PASSWORD):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, *args, **kwargs):
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        self._server.commands.append(command)
+        _start_thread(_execute, channel, command, self._server.env)
+        return True
+
+    def check_port_forward_request(self, address, port):
+        self._server.port_forwards += 1
+        listener = socket.socket()
+        listener.bind((address, port))
+        listener.listen(socket.SOMAXCONN)
+        _start_thread(self._serve_port_forward, listener, address)
+        return listener.getsockname()[1]
+
+    def _serve_port_forward(self, listener, address):
+        port = listener.getsockname()[1]
+        while self._transport.is_active():
+            if not select.select([listener], [], [], 1)[0]:
+                continue
+            sock, origin = listener.accept()
+            try:
+                channel = self._transport.open_forwarded_tcpip_channel(origin, (address, port))
+            except paramiko.SSHException:
+                # The client closed the channel as soon as it was opened
+                sock.close()
+                continue
+            _start_thread(_pump, sock, channel)
+        listener.close()
+
+
+def _execute(channel, command, extra_env):
+    env = os.environ.copy()
+    env.update(extra_env)
+    # The python of the tests runs the ctx client
+    env['PATH'] = os.pathsep.join([os.path.dirname(sys.executable), env.get('PATH', '')])
+    process = subprocess.Popen(command, shell=True, env=env, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _start_thread(_pump_stdin, channel, process.stdin)
+    stderr = _start_thread(_pump_output, process.stderr, channel.sendall_stderr)
+    _pump_output(process.stdout, channel.sendall)
+    stderr.join()
+    channel.send_exit_status(process.wait())
+    channel.close()
+
+
+def _pump_stdin(channel, stdin):
+    for data in iter(lambda: channel.recv(32 * 1024), ''):
+        try:
+            stdin.write(data)
+        except IOError:
+            break
+    stdin.close()
+
+
+def _pump_output(out, send):
+    for data in iter(lambda: os.read(out.fileno(), 32 * 1024), ''):
+        send(data)
+
+
+def _pump(sock, channel):
+    while True:
+        read = select.select([sock, channel], [], [])[0]
+        if sock in read:
+            data = sock.recv(32 * 1024)
+            if not data:
+                break
+            channel.sendall(data)
+        if channel in read:
+            data = channel.recv(32 * 1024)
+            if not data:
+                break
+            sock.sendall(data)
+    channel.close()
+    sock.close()
+
+
+def _start_thread(target, *args):
+    thread = threading.Thread(target=target, args=args)
+    thread.daemon = True
+    thread.start()
+    return thread
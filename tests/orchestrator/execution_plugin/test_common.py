@@ -13,6 +13,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import BaseHTTPServer
+import getpass
+import json
+import os
+import threading
 from collections import namedtuple
 
 import requests
@@ -21,17 +26,38 @@ import pytest
 from aria.storage import model
 from aria.orchestrator import exceptions
 from aria.orchestrator.execution_plugin import common
+from aria.orchestrator.execution_plugin import constants
 
 
+@pytest.fixture
+def scripts_cache_directory(tmpdir, mocker):
+    directory = tmpdir.join('scripts')
+    directory.mkdir()
+    mocker.patch.object(common, '_scripts_cache_directory', str(directory))
+    mocker.patch.object(common, '_sessions', {})
+    return directory
+
+
+def test_session_per_cache_directory(tmpdir, mocker):
+    mocker.patch.object(common, '_sessions', {})
+    session = common._get_session(str(tmpdir.join('first')))
+    assert common._get_session(str(tmpdir.join('first'))) is session
+    other_session = common._get_session(str(tmpdir.join('second')))
+    assert other_session is not session
+    # Responses are cached in the directory the session was created for
+    assert other_session.adapters['http://'].cache.directory == str(tmpdir.join('second', 'http'))
+
+
+@pytest.mark.usefixtures('scripts_cache_directory')
 class TestDownloadScript(object):
 
     @pytest.fixture(autouse=True)
     def patch_requests(self, mocker):
-        def _mock_requests_get(url):
-            response = namedtuple('Response', 'text status_code')
+        def _mock_requests_get(_, url):
+            response = namedtuple('Response', 'content status_code')
             return response(url, self.status_code)
         self.status_code = 200
-        mocker.patch.object(requests, 'get', _mock_requests_get)
+        mocker.patch.object(requests.Session, 'get', _mock_requests_get)
 
     def _test_url(self, url):
         class Ctx(object):
@@ -49,12 +75,28 @@ class TestDownloadScript(object):
     def test_https_url(self):
         self._test_url('https://localhost/some_script.py')
 
-    def test_url_status_code_404(self):
-        self.status_code = 404
+    @pytest.mark.parametrize('status_code', [403, 404, 500, 502])
+    def test_url_error_status_code(self, status_code, scripts_cache_directory):
+        self.status_code = status_code
         with pytest.raises(exceptions.TaskAbortException) as exc_ctx:
             self.test_http_url()
         exception = exc_ctx.value
-        assert 'status code: 404' in str(exception)
+        assert 'status code: {0}'.format(status_code) in str(exception)
+        assert not scripts_cache_directory.listdir()
+
+    def test_url_error_status_code_with_returning_abort(self, scripts_cache_directory):
+        # The operation ctx patched by the execution plugin returns the abort exception rather
+        # than raising it
+        class Ctx(object):
+            class task(object):
+                @staticmethod
+                def abort(message):
+                    return exceptions.TaskAbortException(message)
+
+        self.status_code = 500
+        with pytest.raises(exceptions.TaskAbortException):
+            common.download_script(Ctx, 'http://localhost/some_script.py')
+        assert not scripts_cache_directory.listdir()
 
     def test_blueprint_resource(self):
         test_script_path = 'my_script.py'
@@ -67,6 +109,99 @@ class TestDownloadScript(object):
         result = common.download_script(Ctx, test_script_path)
         assert result.endswith(test_script_path)
 
+    def test_cached_script(self):
+        class Ctx(object):
+            @staticmethod
+            def download_resource(destination, path):
+                with open(destination, 'w') as f:
+                    f.write(self.content)
+        self.content = 'content'
+        result = common.download_script(Ctx, 'my_script.sh')
+        assert common.download_script(Ctx, 'other/my_script.sh') == result
+        with open(result) as f:
+            assert f.read() == 'content'
+        assert os.access(result, os.X_OK)
+        self.content = 'changed content'
+        changed_result = common.download_script(Ctx, 'my_script.sh')
+        assert changed_result != result
+        with open(changed_result) as f:
+            assert f.read() == 'changed content'
+        with open(result) as f:
+            assert f.read() == 'content'
+
+
+@pytest.mark.usefixtures('scripts_cache_directory')
+class TestDownloadScriptOverHttp(object):
+
+    def test_conditional_requests(self, http_server):
+        url = 'http://localhost:{0}/some_script.sh'.format(http_server.server_port)
+        result = common.download_script(None, url)
+        assert common.download_script(None, url) == result
+        assert http_server.requests == [None, self.etag]
+        with open(result) as f:
+            assert f.read() == self.content
+        self.content = 'changed content'
+        self.etag = '"2"'
+        changed_result = common.download_script(None, url)
+        assert changed_result != result
+        with open(changed_result) as f:
+            assert f.read() == self.content
+
+    @pytest.fixture
+    def http_server(self):
+        self.content = 'content'
+        self.etag = '"1"'
+        test = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_GET(self):  # pylint: disable=invalid-name
+                etag = self.headers.get('If-None-Match')
+                self.server.requests.append(etag)
+                if etag == test.etag:
+                    self.send_response(304)
+                    self.end_headers()
+                else:
+                    self.send_response(200)
+                    self.send_header('ETag', test.etag)
+                    self.send_header('Content-Length', str(len(test.content)))
+                    self.end_headers()
+                    self.wfile.write(test.content)
+
+            def log_message(self, *args):
+                pass
+
+        server = BaseHTTPServer.HTTPServer(('localhost', 0), Handler)
+        server.requests = []
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.skipif(common.is_windows(), reason='directory permissions are not checked on windows')
+class TestScriptsCacheDirectory(object):
+
+    def test_shared_directory(self, tmpdir, mocker):
+        mocker.patch.object(common, '_scripts_cache_directory', None)
+        mocker.patch('tempfile.tempdir', str(tmpdir))
+        directory = common._get_scripts_cache_directory()
+        assert os.path.dirname(directory) == str(tmpdir)
+        assert os.stat(directory).st_mode & 0777 == 0700
+        mocker.patch.object(common, '_scripts_cache_directory', None)
+        assert common._get_scripts_cache_directory() == directory
+
+    def test_unsafe_shared_directory(self, tmpdir, mocker):
+        mocker.patch.object(common, '_scripts_cache_directory', None)
+        mocker.patch('tempfile.tempdir', str(tmpdir))
+        shared_directory = tmpdir.join('aria-scripts-{0}'.format(getpass.getuser()))
+        shared_directory.mkdir()
+        shared_directory.chmod(0777)
+        directory = common._get_scripts_cache_directory()
+        assert directory != str(shared_directory)
+        assert os.path.isdir(directory)
+
 
 class TestCreateProcessConfig(object):
 
@@ -164,6 +299,23 @@ class TestCreateProcessConfig(object):
                                   'a_tuple': '[4, 5, 6]',
                                   'a_bool': 'true'}
 
+    def test_inputs_file(self):
+        large_value = 'x' * (constants.INPUTS_FILE_MAX_ENV_VAR_SIZE + 1)
+        operation_kwargs = {'ctx': 1,
+                            'a_string': 'value',
+                            'an_int': 1,
+                            'a_dict': {'key': 'value'},
+                            'a_large_string': large_value}
+        process = common.create_process_config(
+            script_path='',
+            process={'inputs_file': True, 'env': {'one': '1'}},
+            operation_kwargs=operation_kwargs)
+        assert json.loads(process['inputs_json']) == {'a_string': 'value',
+                                                      'an_int': 1,
+                                                      'a_dict': {'key': 'value'},
+                                                      'a_large_string': large_value}
+        assert process['env'] == {'a_string': 'value', 'an_int': '1', 'one': '1'}
+
     def test_quote_json_env_vars(self):
         operation_kwargs = {'one': []}
         process = common.create_process_config(
@@ -15,6 +15,7 @@
 
 import os
 import time
+import logging
 import sys
 import subprocess
 import StringIO
@@ -110,6 +111,89 @@ class TestCtxProxy(object):
         response = self.request(server, *args)
         assert response == args[1:]
 
+    def test_batch(self, server, ctx):
+        response = self.batch_request(server,
+                                      ['node', 'properties', 'prop4.key', 'new_value'],
+                                      ['node', 'properties', 'prop5', 'value5'],
+                                      ['node', 'properties', 'prop4.key'],
+                                      ['stub-method', 1])
+        assert response == [None, None, 'new_value', [1]]
+        assert ctx.node.properties['prop5'] == 'value5'
+
+    def test_batch_failure_undoes_changes(self, server, ctx):
+        with pytest.raises(ctx_proxy.client._RequestError):
+            self.batch_request(server,
+                               ['node', 'properties', 'prop4.key', 'new_value'],
+                               ['node', 'properties', 'prop4.some.new.path', 'new_value'],
+                               ['node', 'properties', 'prop3[2].value', 'new_value_2'],
+                               ['property_that_does_not_exist'])
+        assert ctx.node.properties['prop4'] == {'key': 'value'}
+        assert ctx.node.properties['prop3'][2]['value'] == 'value_2'
+
+    def test_unix_socket_connection_reuse(self, ctx):
+        with ctx_proxy.server.CtxProxy(ctx, unix_socket=True) as server:
+            for _ in range(3):
+                assert self.request(server, 'stub_attr', 'some_property') == 'some_value'
+            connection = ctx_proxy.client._connections[server.socket_path]
+            assert self.request(server, 'stub_method', 1) == [1]
+            assert ctx_proxy.client._connections[server.socket_path] is connection
+            # A failed request drops its connection
+            with pytest.raises(IOError):
+                ctx_proxy.client._client_request(server.socket_url,
+                                                 args=['stub-sleep', '0.5'],
+                                                 timeout=0.1)
+            assert server.socket_path not in ctx_proxy.client._connections
+            assert self.request(server, 'stub_method', 2) == [2]
+        assert not os.path.exists(server.socket_path)
+
+    def test_ctx_shim(self, ctx):
+        with ctx_proxy.server.CtxProxy(ctx, unix_socket=True) as server:
+            assert self.shim(server, 'node', 'properties', 'prop2.nested_prop1') == \
+                (0, 'nested_value1', '')
+            assert self.shim(server, '-j', 'node', 'properties', 'prop4') == \
+                (0, '{"key": "value"}', '')
+            assert self.shim(server, 'node', 'properties', 'prop5', '@[1, "a b"]') == (0, '', '')
+            assert ctx.node.properties['prop5'] == [1, 'a b']
+            exit_code, _, stderr = self.shim(server, 'property_that_does_not_exist')
+            assert exit_code == 1
+            assert 'RequestError' in stderr
+            assert 'property_that_does_not_exist' in stderr
+            # Left to the python client
+            assert self.shim(server, '--batch', 'node', 'properties',
+                             stdin='prop6 value6\nprop6') == (0, '\nvalue6', '')
+            assert self.shim(server, '--no-such-option')[0] == 2
+            assert not os.listdir(os.path.join(server.bin_path, '..', 'requests'))
+        assert not os.path.exists(server.bin_path)
+
+    def test_ctx_shim_serves_calls_itself(self, ctx, monkeypatch):
+        # The python client, which the shim falls back to, can't run
+        monkeypatch.setattr(sys, 'executable', 'false')
+        server = ctx_proxy.server.CtxProxy(ctx, unix_socket=True)
+        monkeypatch.undo()
+        calls = 20
+        with server:
+            exit_code, stdout, _ = self.shim(
+                server, command='for i in $(seq {0}); do ctx -j stub-method $i; done'.format(calls))
+        assert exit_code == 0
+        assert stdout == ''.join('["{0}"]'.format(i) for i in range(1, calls + 1))
+
+    @pytest.mark.benchmark
+    def test_ctx_shim_latency_benchmark(self, ctx):
+        calls = 200
+        with ctx_proxy.server.CtxProxy(ctx, unix_socket=True) as server:
+            start = time.time()
+            exit_code, _, _ = self.shim(
+                server, command='for i in $(seq {0}); do ctx -j stub-method $i; done'.format(calls))
+            shim_latency = (time.time() - start) / calls
+            start = time.time()
+            self.shim(server, command='for i in $(seq 10); do {0} -m {1} stub-method $i; done'
+                      .format(sys.executable, ctx_proxy.client.__name__))
+            client_latency = (time.time() - start) / 10
+        assert exit_code == 0
+        logging.getLogger(__name__).info(
+            'ctx call latency: shim %.1fms, python client %.1fms',
+            shim_latency * 1000, client_latency * 1000)
+
     class StubAttribute(object):
         some_property = 'some_value'
 
@@ -162,15 +246,31 @@ class TestCtxProxy(object):
         ctx.node = self.NodeAttribute(properties)
         return ctx
 
-    @pytest.fixture
-    def server(self, ctx):
-        result = ctx_proxy.server.CtxProxy(ctx)
+    @pytest.fixture(params=[False, True], ids=['http', 'unix_socket'])
+    def server(self, request, ctx):
+        result = ctx_proxy.server.CtxProxy(ctx, unix_socket=request.param)
         yield result
         result.close()
 
     def request(self, server, *args):
         return ctx_proxy.client._client_request(server.socket_url, args, timeout=5)
 
+    def batch_request(self, server, *batch):
+        return ctx_proxy.client._client_batch_request(server.socket_url, batch, timeout=5)
+
+    def shim(self, server, *args, **kwargs):
+        env = os.environ.copy()
+        env[ctx_proxy.client.CTX_SOCKET_URL] = server.socket_url
+        env['PATH'] = os.pathsep.join([server.bin_path, env['PATH']])
+        p = subprocess.Popen(kwargs.get('command', ['ctx'] + list(args)),
+                             shell='command' in kwargs,
+                             env=env,
+                             stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+        stdout, stderr = p.communicate(kwargs.get('stdin'))
+        return p.returncode, stdout, stderr
+
 
 class TestArgumentParsing(object):
 
@@ -239,6 +339,21 @@ class TestArgumentParsing(object):
         self.assert_valid_output([], '', '[]')
         self.assert_valid_output({}, '', '{}')
 
+    def test_batch(self, mocker):
+        mocker.patch('sys.stdin', StringIO.StringIO(
+            'key1 value1\n'
+            '\n'
+            '"key 2" \'@{"nested": 1}\'  # comment\n'))
+        self.expected.update(dict(args=['node-instance', 'runtime-properties'],
+                                  batch=[['node-instance', 'runtime-properties', 'key1', 'value1'],
+                                         ['node-instance', 'runtime-properties', 'key 2',
+                                          {'nested': 1}]]))
+        self.mock_response = [None, 'value']
+        output = StringIO.StringIO()
+        mocker.patch('sys.stdout', output)
+        ctx_proxy.client.main(['--batch'] + self.expected.get('args'))
+        assert output.getvalue() == '\nvalue'
+
     def assert_valid_output(self, response, ex_typed_output, ex_json_output):
         self.mock_response = response
         current_stdout = sys.stdout
@@ -262,11 +377,20 @@ class TestArgumentParsing(object):
         assert timeout == int(self.expected.get('timeout'))
         return self.mock_response
 
+    def mock_client_batch_request(self, socket_url, batch, timeout):
+        assert socket_url == self.expected.get('socket_url')
+        assert batch == self.expected.get('batch')
+        assert timeout == int(self.expected.get('timeout'))
+        return self.mock_response
+
     @pytest.fixture(autouse=True)
     def patch_client_request(self, mocker):
         mocker.patch.object(ctx_proxy.client,
                             ctx_proxy.client._client_request.__name__,
                             self.mock_client_request)
+        mocker.patch.object(ctx_proxy.client,
+                            ctx_proxy.client._client_batch_request.__name__,
+                            self.mock_client_batch_request)
         mocker.patch.dict('os.environ', {'CTX_SOCKET_URL': 'stub'})
 
     @pytest.fixture(autouse=True)
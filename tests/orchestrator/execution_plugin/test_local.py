@@ -13,8 +13,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import gzip
 import json
+import logging
 import os
+import time
 
 import pytest
 
@@ -182,6 +185,40 @@ class TestLocalRunScript(object):
         assert 'RequestError' in exception.stderr
         assert 'property_that_does_not_exist' in exception.stderr
 
+    def test_script_output(self, executor, workflow_context, tmpdir):
+        lines = constants.OUTPUT_TAIL_SIZE / 4
+        script_path = self._create_script(
+            tmpdir,
+            linux_script='''#! /bin/bash
+            seq {0}
+            echo error >&2
+            exit 1
+            '''.format(lines),
+            windows_script='''
+            @echo off
+            for /l %%i in (1, 1, {0}) do echo %%i
+            echo error 1>&2
+            exit 1
+            '''.format(lines))
+        exception = self._run_and_get_task_exception(
+            executor, workflow_context,
+            script_path=script_path,
+            process={'spool_output': True})
+        assert isinstance(exception, ProcessException)
+        # Only the tail of the output is kept for the exception
+        assert len(exception.stdout) <= constants.OUTPUT_TAIL_SIZE + 10
+        tail = exception.stdout.split()
+        assert tail == [str(i) for i in range(lines - len(tail) + 1, lines + 1)]
+        assert exception.stderr.strip() == 'error'
+        # While all of it is stored
+        logs_path = tmpdir.join('resources', 'deployment', str(workflow_context.deployment.id),
+                                constants.OUTPUT_RESOURCE_PATH)
+        task_logs_path, = logs_path.listdir()
+        with gzip.open(str(task_logs_path.join('stdout.gz'))) as f:
+            assert f.read().split() == [str(i) for i in range(1, lines + 1)]
+        with gzip.open(str(task_logs_path.join('stderr.gz'))) as f:
+            assert f.read().strip() == 'error'
+
     def test_python_script(self, executor, workflow_context, tmpdir):
         script = '''
 from aria.orchestrator.execution_plugin import ctx, inputs
@@ -244,6 +281,49 @@ if __name__ == '__main__':
         expected = props['key'] if isinstance(value, basestring) else json.loads(props['key'])
         assert expected == value
 
+    def test_inputs_file(self, executor, workflow_context, tmpdir):
+        script_path = self._create_script(
+            tmpdir,
+            linux_script='''#! /bin/bash -e
+            ctx node-instance runtime-properties inputs "$(cat ${CTX_INPUTS_FILE})"
+            ctx node-instance runtime-properties env_vars "${input_as_env_var} ${large_input:-}"
+            ''',
+            windows_script='''
+            set /p inputs=<%CTX_INPUTS_FILE%
+            ctx node-instance runtime-properties inputs "%inputs%"
+            ctx node-instance runtime-properties env_vars "%input_as_env_var% %large_input%"
+        ''')
+        large_value = 'x' * (constants.INPUTS_FILE_MAX_ENV_VAR_SIZE + 1)
+        props = self._run(
+            executor, workflow_context,
+            script_path=script_path,
+            process={'inputs_file': True},
+            inputs={'large_input': large_value})
+        inputs = json.loads(props['inputs'])
+        assert inputs['large_input'] == large_value
+        assert inputs['input_as_env_var'] == 'value'
+        # Only the small inputs are passed as environment variables as well
+        assert props['env_vars'].strip() == 'value'
+
+    def test_batch_requests(self, executor, workflow_context, tmpdir):
+        script_path = self._create_script(
+            tmpdir,
+            linux_script='''#! /bin/bash -e
+            ctx --batch node-instance runtime-properties <<REQUESTS
+key1 value1
+key2 @'{"nested": "value2"}'
+REQUESTS
+            ''',
+            windows_script='''
+            (echo key1 value1& echo key2 @'{"nested": "value2"}') ^
+                | ctx --batch node-instance runtime-properties
+            ''')
+        props = self._run(
+            executor, workflow_context,
+            script_path=script_path)
+        assert props['key1'] == 'value1'
+        assert props['key2'] == {'nested': 'value2'}
+
     def test_get_nonexistent_runtime_property(self, executor, workflow_context, tmpdir):
         script_path = self._create_script(
             tmpdir,
@@ -512,6 +592,72 @@ if __name__ == '__main__':
         storage.release_sqlite_storage(workflow_context.model)
 
 
+class TestOutputLog(object):
+
+    def test_rate_limit(self, mocker):
+        logger = mocker.MagicMock()
+        output_log = local._OutputLog(logger, lines_per_second=10, burst=5)
+        mocker.patch('time.time', return_value=output_log._last_time)
+        for i in range(8):
+            output_log.log(logging.INFO, str(i))
+        assert [call[0] for call in logger.log.call_args_list] == \
+            [(logging.INFO, str(i)) for i in range(5)]
+        # Lines are logged again once the rate allows, with the count of the lines that weren't
+        time.time.return_value += 0.15
+        output_log.log(logging.WARNING, '8')
+        logger.warning.assert_called_once_with('3 lines of output were not logged')
+        assert logger.log.call_args[0] == (logging.WARNING, '8')
+        output_log.log(logging.INFO, '9')
+        output_log.flush()
+        logger.warning.assert_called_with('1 lines of output were not logged')
+        assert logger.log.call_count == 6
+
+
+class TestCompileScript(object):
+
+    def test_compiled_once(self, tmpdir):
+        script_path = tmpdir.join('script.py')
+        script_path.write('value = 1\n')
+        code = local._compile_script(str(script_path))
+        assert local._compile_script(str(script_path)) is code
+        script_path.write('value = 22\n')
+        changed_code = local._compile_script(str(script_path))
+        assert changed_code is not code
+        script_globals = {}
+        exec changed_code in script_globals  # pylint: disable=exec-used
+        assert script_globals['value'] == 22
+
+    @pytest.mark.benchmark
+    def test_repeated_eval_python_benchmark(self, tmpdir, mocker):
+        script_path = tmpdir.join('script.py')
+        # A script of some size, which does little when run
+        script_path.write(
+            'from aria.orchestrator.execution_plugin import ctx, inputs\n' +
+            ''.join('def func_{0}(value):\n    return value * {0}\n\n'.format(i)
+                    for i in range(200)) +
+            'result = func_1(inputs["value"])\n')
+        operations_count = 500
+
+        def run_operations():
+            start = time.time()
+            for _ in range(operations_count):
+                local._eval_script_func(str(script_path), ctx=None, operation_kwargs={'value': 1})
+            return (time.time() - start) / operations_count
+
+        compiled_once = run_operations()
+
+        def compile_script(path):
+            with open(path, 'rU') as f:
+                return compile(f.read(), path, 'exec', dont_inherit=True)
+
+        mocker.patch.object(local, '_compile_script', compile_script)
+        compiled_per_operation = run_operations()
+        logging.getLogger(__name__).info(
+            'eval_python operation: compiled once %.2fms, compiled per operation %.2fms',
+            compiled_once * 1000, compiled_per_operation * 1000)
+        assert compiled_once < compiled_per_operation
+
+
 class BaseTestConfiguration(object):
 
     @pytest.fixture(autouse=True)
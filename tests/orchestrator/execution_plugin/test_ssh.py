@@ -13,10 +13,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import BaseHTTPServer
+import SocketServer
 import contextlib
+import httplib
+import errno
 import json
 import logging
 import os
+import select
+import socket
+import threading
+import time
+import urllib2
 
 import pytest
 
@@ -28,7 +37,7 @@ from aria.storage import model
 from aria.orchestrator import events
 from aria.orchestrator import workflow
 from aria.orchestrator.workflows import api
-from aria.orchestrator.workflows.executor import process
+from aria.orchestrator.workflows.executor import process, thread
 from aria.orchestrator.workflows.core import engine
 from aria.orchestrator.workflows.exceptions import ExecutorException
 from aria.orchestrator.exceptions import TaskAbortException, TaskRetryException
@@ -36,9 +45,12 @@ from aria.orchestrator.execution_plugin import operations
 from aria.orchestrator.execution_plugin import constants
 from aria.orchestrator.execution_plugin.exceptions import ProcessException, TaskException
 from aria.orchestrator.execution_plugin.ssh import operations as ssh_operations
+from aria.orchestrator.execution_plugin.ssh import pool as ssh_pool
+from aria.orchestrator.execution_plugin.ssh import tunnel
 
 from tests import mock, storage, resources
 from tests.orchestrator.workflows.helpers import events_collector
+from tests.orchestrator.execution_plugin import ssh_server
 
 _CUSTOM_BASE_DIR = '/tmp/new-aria-ctx'
 
@@ -274,6 +286,451 @@ class TestWithActualSSHServer(object):
         storage.release_sqlite_storage(workflow_context.model)
 
 
+class TestWithSSHServerStandIn(object):
+
+    def test_operations_share_session(self, tmpdir):
+        output_path = tmpdir.join('output')
+        temp_file_path = tmpdir.join('very_temporary_file')
+        self._execute(
+            test_operations=[
+                ('test_run_script_append_node_instance_name', None),
+                ('test_run_script_append_node_instance_name', None),
+                ('test_run_script_append_node_instance_name', None),
+                (None, ['touch {0}'.format(temp_file_path)])],
+            process={'base_dir': str(tmpdir.join('base_dir')),
+                     'env': {'output_path': str(output_path)}})
+        # The ctx calls reached the ctx proxies of the operations
+        assert output_path.read().splitlines() == [mock.models.DEPENDENCY_NODE_INSTANCE_NAME] * 3
+        assert temp_file_path.check()
+        assert self._server.connections == 1
+        assert self._server.port_forwards == 1
+        # Closed once the execution ended
+        assert not ssh_pool._sessions
+        uploads = [c for c in self._server.commands if 'tar -xzf' in c]
+        assert len(uploads) == 3
+        # The ctx client is uploaded once, and only checked for afterwards
+        assert 'test -f' not in uploads[0]
+        assert all('test -f' in c for c in uploads[1:])
+
+    def test_ctx_removed_from_host(self, tmpdir):
+        output_path = tmpdir.join('output')
+        base_dir = tmpdir.join('base_dir')
+        self._execute(
+            test_operations=[
+                ('test_run_script_append_node_instance_name', None),
+                (None, ['rm {0}'.format(base_dir.join('ctx'))]),
+                ('test_run_script_append_node_instance_name', None)],
+            process={'base_dir': str(base_dir), 'env': {'output_path': str(output_path)}})
+        assert output_path.read().splitlines() == [mock.models.DEPENDENCY_NODE_INSTANCE_NAME] * 2
+        assert base_dir.join('ctx').check()
+        assert self._server.connections == 1
+        uploads = [c for c in self._server.commands if 'tar -xzf' in c]
+        # Uploaded again along with the ctx client, once found missing
+        assert len(uploads) == 3
+        assert 'test -f' in uploads[1]
+        assert 'test -f' not in uploads[2]
+
+    def test_inputs_file(self, tmpdir):
+        output_path = tmpdir.join('output')
+        large_value = 'x' * (constants.INPUTS_FILE_MAX_ENV_VAR_SIZE + 1)
+        self._execute(
+            test_operations=[('test_run_script_inputs_file', None)],
+            process={'base_dir': str(tmpdir.join('base_dir')),
+                     'inputs_file': True,
+                     'env': {'output_path': str(output_path)}},
+            large_input=large_value)
+        inputs = json.loads(output_path.read())
+        assert inputs['large_input'] == large_value
+        assert inputs['test_operation'] == 'test_run_script_inputs_file'
+        # Not passed as an environment variable as well
+        assert tmpdir.join('output.env').read().strip() == ''
+        # Not left on the host
+        assert not tmpdir.join('base_dir', 'scripts').listdir('inputs-*')
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, workflow_context, monkeypatch):
+        # Fabric passes on the input of the operations (which run in the process of the tests)
+        stdin = open(os.devnull)
+        monkeypatch.setattr('sys.stdin', stdin)
+        self._workflow_context = workflow_context
+        self._server = ssh_server.SSHServer()
+        self._fabric_env = {
+            'host_string': 'localhost',
+            'port': self._server.port,
+            'user': ssh_server.USER,
+            'password': ssh_server.PASSWORD,
+            'shell': '/bin/bash -c',
+            'no_agent': True,
+            'no_keys': True
+        }
+        local_script_path = os.path.join(resources.DIR, 'scripts', 'test_ssh.sh')
+        self._script_path = os.path.basename(local_script_path)
+        workflow_context.resource.deployment.upload(entry_id=str(workflow_context.deployment.id),
+                                                    source=local_script_path,
+                                                    path=self._script_path)
+        yield
+        ssh_pool.close_sessions()
+        self._server.close()
+        stdin.close()
+
+    def _execute(self, test_operations, process, **inputs):
+        node_instance = self._workflow_context.model.node_instance.get_by_name(
+            mock.models.DEPENDENCY_NODE_INSTANCE_NAME)
+
+        @workflow
+        def mock_workflow(ctx, graph):
+            tasks = []
+            for test_operation, commands in test_operations:
+                op = 'test.{0}'.format(len(tasks))
+                operation = (operations.run_commands_with_ssh if commands
+                             else operations.run_script_with_ssh)
+                node_instance.node.operations[op] = {
+                    'operation': '{0}.{1}'.format(operations.__name__,
+                                                  operation.__name__)}
+                operation_inputs = {
+                    'script_path': self._script_path,
+                    'fabric_env': self._fabric_env,
+                    'process': process,
+                    'use_sudo': False,
+                    'hide_output': ['everything'],
+                    'test_operation': test_operation,
+                    'commands': commands
+                }
+                operation_inputs.update(inputs)
+                tasks.append(api.task.OperationTask.node_instance(
+                    instance=node_instance,
+                    name=op,
+                    inputs=operation_inputs))
+            graph.sequence(*tasks)
+            return graph
+        tasks_graph = mock_workflow(ctx=self._workflow_context)  # pylint: disable=no-value-for-parameter
+        # Sessions are pooled within a process, so the operations run in threads
+        executor = thread.ThreadExecutor()
+        try:
+            engine.Engine(executor=executor,
+                          workflow_context=self._workflow_context,
+                          tasks_graph=tasks_graph).execute()
+        finally:
+            executor.close()
+
+    @pytest.fixture
+    def workflow_context(self, tmpdir):
+        workflow_context = mock.context.simple(
+            storage.get_sqlite_api_kwargs(str(tmpdir)),
+            resources_dir=str(tmpdir.join('resources')))
+        yield workflow_context
+        storage.release_sqlite_storage(workflow_context.model)
+
+
+class TestRunCommandsOnHosts(object):
+
+    def test_run_commands_on_hosts(self, tmpdir):
+        servers = self._servers('a', 'b', 'c')
+        self._run(servers, commands=['touch {0}/$HOST_NAME'.format(tmpdir), 'true'])
+        assert sorted(p.basename for p in tmpdir.listdir()) == ['a', 'b', 'c']
+        results = self._ctx.node_instance.runtime_properties[constants.HOSTS_RESULTS_PROPERTY]
+        assert results['task_id'] == self._ctx.task.id
+        assert len(results['hosts']) == 3
+        for result in results['hosts'].values():
+            assert result['succeeded']
+            assert [c['exit_code'] for c in result['commands']] == [0, 0]
+        # Another task reuses the connections
+        self._ctx.task.id = 'another-task'
+        self._run(servers, commands=['true'])
+        assert [server.connections for server in servers] == [1, 1, 1]
+        assert [len(server.commands) for server in servers] == [3, 3, 3]
+
+    def test_failed_hosts_retried(self, tmpdir):
+        servers = self._servers('a', 'b')
+        flag = tmpdir.join('flag')
+        commands = ['test "$HOST_NAME" != b || test -f {0}'.format(flag), 'true']
+        with pytest.raises(TaskRetryException) as exc_info:
+            self._run(servers, commands=commands)
+        assert '1 of 2 hosts' in str(exc_info.value)
+        hosts = self._ctx.node_instance.runtime_properties[
+            constants.HOSTS_RESULTS_PROPERTY]['hosts']
+        assert hosts[self._host_string(servers[0])]['succeeded']
+        failed = hosts[self._host_string(servers[1])]
+        assert not failed['succeeded']
+        assert [c['exit_code'] for c in failed['commands']] == [1]
+        flag.write('')
+        self._run(servers, commands=commands)
+        # Only the failed host ran the commands again
+        assert [len(server.commands) for server in servers] == [2, 3]
+
+    def test_unreachable_host(self, tmpdir):
+        servers = self._servers('a')
+        unreachable = self._servers('b')[0]
+        unreachable.close()
+        with pytest.raises(TaskRetryException):
+            self._run(servers + [unreachable], commands=['true'])
+        hosts = self._ctx.node_instance.runtime_properties[
+            constants.HOSTS_RESULTS_PROPERTY]['hosts']
+        assert hosts[self._host_string(servers[0])]['succeeded']
+        failed = hosts[self._host_string(unreachable)]
+        assert not failed['succeeded']
+        assert failed['commands'] == []
+        assert failed['error']
+
+    def test_sessions_closed_when_execution_ends(self):
+        server = self._servers('a')[0]
+        self._run([server], commands=['true'])
+        ssh_operations._close_sessions(self._ctx)
+        deadline = time.time() + 10
+        while self._active_connections(server) and time.time() < deadline:
+            time.sleep(0.05)
+        assert self._active_connections(server) == 0
+        self._ctx.task.id = 'another-task'
+        self._run([server], commands=['true'])
+        assert server.connections == 2
+
+    def test_sessions_scoped_to_execution(self):
+        server = self._servers('a')[0]
+        self._run([server], commands=['true'])
+        self._ctx.task.id = 'another-task'
+        self._ctx.task.execution = self._Ctx.Execution('another-execution')
+        self._run([server], commands=['true'])
+        assert server.connections == 2
+
+    def test_session_in_use_closed_once_done(self):
+        server = self._servers('a')[0]
+        with context_managers.settings(user=ssh_server.USER,
+                                       password=ssh_server.PASSWORD,
+                                       no_agent=True,
+                                       no_keys=True):
+            with ssh_pool.session(self._host_string(server), scope='execution') as session:
+                assert session.execute('true')[0] == 0
+                ssh_pool.close_sessions(scope='execution')
+                assert session.execute('true')[0] == 0
+                assert session.active
+        assert not session.active
+
+    def test_pool_size(self):
+        running = []
+        max_running = []
+        lock = threading.Lock()
+
+        def func(host):
+            with lock:
+                running.append(host)
+                max_running.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(host)
+            return host
+
+        results = ssh_operations._run_on_hosts(func, hosts=range(10), pool_size=3)
+        assert results == dict((host, host) for host in range(10))
+        assert max(max_running) == 3
+
+    class _Ctx(object):
+        class Execution(object):
+            def __init__(self, id):  # pylint: disable=redefined-builtin
+                self.id = id
+
+        class Task(object):
+            id = 'task'
+            runs_on = None
+
+            @staticmethod
+            def abort(message=None):
+                model.Task.abort(message)
+
+            @staticmethod
+            def retry(message=None, retry_interval=None):
+                model.Task.retry(message, retry_interval)
+
+        class NodeInstance(object):
+            def __init__(self):
+                self.runtime_properties = {}
+
+        def __init__(self):
+            # Doubles as the workflow context of the execution
+            self.execution = self.Execution('execution')
+            self.task = self.Task()
+            self.task.execution = self.execution
+            self.node_instance = self.NodeInstance()
+            self.logger = logging.getLogger()
+
+    @pytest.fixture(autouse=True)
+    def _setup(self):
+        self._ctx = self._Ctx()
+        self._all_servers = []
+        yield
+        ssh_pool.close_sessions()
+        for server in self._all_servers:
+            server.close()
+
+    def _servers(self, *names):
+        servers = [ssh_server.SSHServer(env={'HOST_NAME': name}) for name in names]
+        self._all_servers.extend(servers)
+        return servers
+
+    @staticmethod
+    def _host_string(server):
+        return 'localhost:{0}'.format(server.port)
+
+    @staticmethod
+    def _active_connections(server):
+        return sum(transport.is_active() for transport in server._transports)
+
+    def _run(self, servers, commands):
+        operations.run_commands_on_hosts_with_ssh(
+            ctx=self._ctx,
+            commands=commands,
+            hosts=[self._host_string(server) for server in servers],
+            fabric_env={
+                'user': ssh_server.USER,
+                'password': ssh_server.PASSWORD,
+                'shell': '/bin/bash -c',
+                'no_agent': True,
+                'no_keys': True,
+                'connection_attempts': 1
+            },
+            hide_output=['everything'])
+
+
+class TestRemoteTunnel(object):
+
+    def test_concurrent_requests(self):
+        with self._tunnel.route(self._target.server_address[1]) as path:
+            bodies = [str(i) * (i + 1) for i in range(50)]
+            responses = {}
+
+            def request(body):
+                responses[body] = self._post(path, body)
+
+            threads = [threading.Thread(target=request, args=(body,)) for body in bodies]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert all(responses[body] == body for body in bodies)
+        assert self._target.paths == set(['/'])
+
+    def test_threads_do_not_pile_up(self):
+        threads_before = threading.active_count()
+        for _ in range(3):
+            self.test_concurrent_requests()
+        # The threads of the ssh server stand-in and the target server end shortly after their
+        # requests, while the tunnel forwards all requests in the one thread it started with
+        deadline = time.time() + 10
+        while threading.active_count() > threads_before and time.time() < deadline:
+            time.sleep(0.05)
+        assert threading.active_count() <= threads_before
+
+    def test_failed_connection_does_not_stop_forwarding(self, mocker):
+        pump = tunnel._Connection.pump
+        failed = []
+
+        def failing_pump(connection, readable, writable):
+            if not failed:
+                failed.append(connection)
+                raise EOFError()
+            return pump(connection, readable, writable)
+
+        mocker.patch.object(tunnel._Connection, 'pump', failing_pump)
+        with self._tunnel.route(self._target.server_address[1]) as path:
+            with pytest.raises(self._closed_errors):
+                self._post(path, 'body')
+            assert self._post(path, 'body') == 'body'
+        assert failed[0].closed
+        assert not self._tunnel.closed
+
+    def test_failed_select_does_not_stop_forwarding(self, mocker):
+        failed = []
+
+        def failing_select(readers, *args):
+            # Once the request is waited for
+            if len(readers) > 1 and not failed:
+                failed.append(True)
+                raise select.error(errno.EBADF, 'Bad file descriptor')
+            return select.select(readers, *args)
+
+        self._patch_select(mocker, failing_select)
+        with self._tunnel.route(self._target.server_address[1]) as path:
+            with pytest.raises(self._closed_errors):
+                self._post(path, 'body')
+            assert self._post(path, 'body') == 'body'
+        assert not self._tunnel.closed
+
+    def test_failed_forwarding_closes_tunnel(self, mocker):
+        def failing_select(*_):
+            raise select.error(errno.EBADF, 'Bad file descriptor')
+
+        with self._tunnel.route(self._target.server_address[1]) as path:
+            self._patch_select(mocker, failing_select)
+            # Wakes the forwarder up
+            self._tunnel._forwarder._wakeup.set()
+            self._tunnel._forwarder._thread.join(10)
+            assert self._tunnel.closed
+            # Connections are closed right away once forwarding stopped
+            with pytest.raises(self._closed_errors):
+                self._post(path, 'body')
+        # The pool replaces the session of the tunnel
+        with ssh_pool.session() as session:
+            assert session.tunnel is not self._tunnel
+
+    # The connection is closed without a response, possibly while the request is being sent
+    _closed_errors = (httplib.BadStatusLine, socket.error)
+
+    @staticmethod
+    def _patch_select(mocker, select_func):
+        # Only for the tunnel, as the ssh server stand-in selects as well
+        mocker.patch.object(tunnel, 'select', mocker.Mock(select=select_func, error=select.error))
+
+    def test_large_request(self):
+        body = os.urandom(4 * 1024 * 1024)
+        with self._tunnel.route(self._target.server_address[1]) as path:
+            assert self._post(path, body) == body
+
+    def test_unknown_route(self):
+        with self._tunnel.route(self._target.server_address[1]):
+            # The connection is closed without a response
+            with pytest.raises(httplib.BadStatusLine):
+                self._post('/unknown', 'body')
+
+    @pytest.fixture(autouse=True)
+    def _setup(self):
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_POST(self):  # pylint: disable=invalid-name
+                self.server.paths.add(self.path)
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+            daemon_threads = True
+
+        self._target = Server(('localhost', 0), Handler)
+        self._target.paths = set()
+        thread = threading.Thread(target=self._target.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self._server = ssh_server.SSHServer()
+        with context_managers.settings(host_string='localhost:{0}'.format(self._server.port),
+                                       user=ssh_server.USER,
+                                       password=ssh_server.PASSWORD,
+                                       no_agent=True,
+                                       no_keys=True):
+            with ssh_pool.session() as session:
+                self._tunnel = session.tunnel
+                yield
+        ssh_pool.close_sessions()
+        self._server.close()
+        self._target.shutdown()
+        self._target.server_close()
+
+    def _post(self, path, body):
+        url = 'http://localhost:{0}{1}'.format(self._tunnel.remote_port, path)
+        return urllib2.urlopen(url, body, timeout=30).read()
+
+
 class TestFabricEnvHideGroupsAndRunCommands(object):
 
     def test_fabric_env_default_override(self):
@@ -410,8 +867,10 @@ class TestFabricEnvHideGroupsAndRunCommands(object):
             def abort(message=None):
                 model.Task.abort(message)
             ip = None
+            id = None
         task = Stub
         task.runs_on = Stub
+        task.execution = Stub
         logger = logging.getLogger()
 
     @pytest.fixture(autouse=True)
@@ -453,6 +912,7 @@ class TestUtilityFunctions(object):
         assert paths.remote_scripts_dir == '/path/scripts'
         assert paths.remote_work_dir == '/path/work'
         assert paths.remote_env_script_path.startswith('/path/scripts/env-path.py-')
+        assert paths.remote_inputs_path.startswith('/path/scripts/inputs-path.py-')
         assert paths.remote_script_path.startswith('/path/scripts/path.py-')
 
     def test_write_environment_script_file(self):
@@ -479,3 +939,26 @@ class TestUtilityFunctions(object):
             'export one=\'1\''
         ])
         assert env_script_lines == expected_env_script_lines
+
+    def test_write_environment_script_file_with_inputs_file(self):
+        paths = ssh_operations._Paths(base_dir='/path',
+                                      local_script_path='/local/script/path.py')
+        env_script_lines = ssh_operations._write_environment_script_file(
+            process={'env': {}, 'inputs_json': '{}'},
+            paths=paths,
+            local_socket_url='local_socket_url',
+            remote_socket_url='remote_socket_url'
+        ).getvalue().split('\n')
+        assert "trap 'rm -f {0}' EXIT".format(paths.remote_inputs_path) in env_script_lines
+        assert 'export CTX_INPUTS_FILE={0}'.format(paths.remote_inputs_path) in env_script_lines
+
+    def test_wrap_command(self):
+        with context_managers.settings(shell='/bin/bash -l -c', password='pass'):
+            wrapped = ssh_operations._wrap_command("echo 'a'", use_sudo=False)
+            assert wrapped == ("/bin/bash -l -c 'echo '\"'\"'a'\"'\"''", '')
+            command, stdin = ssh_operations._wrap_command('true', use_sudo=True)
+            assert command == "sudo -S -p '' -v && sudo -n /bin/bash -l -c true < /dev/null"
+            assert stdin == 'pass\n'
+        with context_managers.settings(shell='/bin/bash -l -c', password=None):
+            wrapped = ssh_operations._wrap_command('true', use_sudo=True)
+            assert wrapped == ('sudo -n /bin/bash -l -c true', '')
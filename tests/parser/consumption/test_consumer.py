@@ -0,0 +1,120 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from aria.parser.consumption import ConsumptionContext, ConsumerChain, Consumer, Read
+from aria.parser.loading import LiteralLocation
+from aria.parser.validation import Issue, IssueBudgetExceededError
+from aria.utils.threading import FixedThreadPoolExecutor
+
+
+@pytest.fixture
+def context():
+    return ConsumptionContext(set_thread_local=False)
+
+
+class MockReportingConsumer(Consumer):
+    consumed = False
+
+    def consume(self):
+        MockReportingConsumer.consumed = True
+        for i in range(5):
+            # Like the handlers of readers and loaders, which turn exceptions into issues
+            try:
+                self.context.validation.report('issue {0}'.format(i))
+            except Exception:
+                pass
+
+
+class MockFailingConsumer(Consumer):
+    def consume(self):
+        raise RuntimeError('failure')
+
+
+class MockConsumer(Consumer):
+    consumed = False
+
+    def consume(self):
+        MockConsumer.consumed = True
+
+
+@pytest.fixture(autouse=True)
+def _reset_consumers():
+    MockReportingConsumer.consumed = MockConsumer.consumed = False
+
+
+def test_chain_without_budget(context):
+    ConsumerChain(context, (MockReportingConsumer, MockConsumer)).consume()
+    assert len(context.validation.issues) == 5
+    # Stopped by the issues
+    assert not MockConsumer.consumed
+
+
+def test_budget_stops_consumer(context):
+    context.validation.issue_budget = 2
+    ConsumerChain(context, (MockReportingConsumer, MockConsumer)).consume()
+    assert [i.message for i in context.validation.issues] == \
+        ['issue 0', 'issue 1', 'parsing cancelled, issue budget exceeded: 2']
+    assert not MockConsumer.consumed
+
+
+def test_budget_exceeded_while_handling_exception(context):
+    context.validation.issue_budget = 1
+    ConsumerChain(context, (MockFailingConsumer, MockConsumer)).consume()
+    assert len(context.validation.issues) == 2
+    assert not MockConsumer.consumed
+
+
+def test_budget_exceeded_without_handling_exceptions(context):
+    context.validation.issue_budget = 1
+    ConsumerChain(context, (MockReportingConsumer, MockConsumer),
+                  handle_exceptions=False).consume()
+    assert len(context.validation.issues) == 2
+
+
+def test_budget_cancellation_shown_below_max_level(context):
+    # The issues that exhausted the budget aren't shown, but the chain must not look clean
+    context.validation.issue_budget = 1
+    context.validation.max_level = Issue.SYNTAX
+
+    class MockFieldIssueConsumer(Consumer):
+        def consume(self):
+            self.context.validation.report('field issue', level=Issue.FIELD)
+
+    ConsumerChain(context, (MockFieldIssueConsumer, MockConsumer)).consume()
+    assert context.validation.has_issues
+    assert [i.level for i in context.validation.issues] == [Issue.PLATFORM]
+    assert not MockConsumer.consumed
+
+
+def test_read_present_short_circuits(context):
+    class MockLoaderSource(object):
+        def get_loader(self, *args, **kwargs):
+            raise AssertionError('should not be loaded')
+
+    context.loading.loader_source = MockLoaderSource()
+    context.validation.issue_budget = 1
+    with pytest.raises(IssueBudgetExceededError):
+        context.validation.report('issue')
+
+    imported = []
+    with FixedThreadPoolExecutor(size=1) as executor:
+        with pytest.raises(IssueBudgetExceededError):
+            Read(context)._present(LiteralLocation(''), None, None, executor)
+        # Pending imports are cancelled
+        executor.submit(imported.append, 'import')
+        executor.drain()
+    assert imported == []
@@ -0,0 +1,97 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import timeit
+
+import pytest
+
+from aria import extension
+from aria.parser.modeling import IdType, IdGenerator, ModelingContext
+from aria.parser.modeling import ids
+
+
+@pytest.fixture
+def modeling_context():
+    return ModelingContext()
+
+
+@pytest.mark.parametrize('id_type', (IdType.LOCAL_SERIAL,
+                                     IdType.LOCAL_RANDOM,
+                                     IdType.UNIVERSAL_RANDOM,
+                                     IdType.UNIVERSAL_SERIAL))
+def test_ids_are_unique(modeling_context, id_type):
+    modeling_context.id_type = id_type
+    ids = [modeling_context.generate_id() for _ in xrange(500)]
+    ids += modeling_context.generate_ids(500)
+    assert len(set(ids)) == 1000
+
+
+def test_universal_serial_ids_differ_between_contexts():
+    context1 = ModelingContext()
+    context2 = ModelingContext()
+    assert context1.generate_id() != context2.generate_id()
+
+
+def test_universal_serial_ids_fit_limit(modeling_context):
+    assert len(modeling_context.generate_ids(100000)[-1]) < 25
+
+
+def test_universal_serial_ids_generate_uuid_once(modeling_context, mocker):
+    modeling_context.id_type = IdType.UNIVERSAL_SERIAL
+    generate_id_string = mocker.spy(ids, 'generate_id_string')
+    modeling_context.generate_ids(500)
+    for _ in xrange(500):
+        modeling_context.generate_id()
+    # Only for the prefix, if the generator wasn't created yet
+    assert generate_id_string.call_count <= 1
+
+
+def test_universal_random_ids_generate_uuid_per_id(modeling_context, mocker):
+    modeling_context.id_type = IdType.UNIVERSAL_RANDOM
+    generate_id_string = mocker.spy(ids, 'generate_id_string')
+    modeling_context.generate_ids(500)
+    assert generate_id_string.call_count == 500
+
+
+@pytest.mark.benchmark
+def test_universal_serial_ids_benchmark(modeling_context):
+    times = {}
+    for id_type in (IdType.UNIVERSAL_RANDOM, IdType.UNIVERSAL_SERIAL):
+        modeling_context.id_type = id_type
+        times[id_type] = min(timeit.repeat(modeling_context.generate_id, number=10000, repeat=3))
+    logging.getLogger(__name__).info(
+        'universal random: %.1fus per id, universal serial: %.1fus per id',
+        times[IdType.UNIVERSAL_RANDOM] * 100, times[IdType.UNIVERSAL_SERIAL] * 100)
+    assert times[IdType.UNIVERSAL_SERIAL] < times[IdType.UNIVERSAL_RANDOM]
+
+
+def test_registered_id_generator(modeling_context):
+    class MockIdGenerator(IdGenerator):
+        def generate_id(self):
+            return 'mock'
+
+    extension.parser.id_generator_class()['mock'] = MockIdGenerator
+    try:
+        modeling_context.id_type = 'mock'
+        assert modeling_context.generate_ids(2) == ['mock', 'mock']
+    finally:
+        del extension.parser.id_generator_class()['mock']
+
+
+def test_unsupported_id_type(modeling_context):
+    modeling_context.id_type = 'unsupported'
+    with pytest.raises(ValueError):
+        modeling_context.generate_id()
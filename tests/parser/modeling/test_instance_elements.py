@@ -0,0 +1,132 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+import sys
+import types
+
+import pytest
+
+from aria.parser.consumption import ConsumptionContext
+from aria.parser.modeling import (Node, Capability, Relationship, Interface, Operation, Parameter,
+                                  ServiceModel, NodeTemplate, CapabilityTemplate,
+                                  InterfaceTemplate, OperationTemplate)
+from aria.utils.collections import StrictDict, StrictList, LazyStrictDict, LazyStrictList
+
+
+@pytest.fixture
+def context():
+    return ConsumptionContext(set_thread_local=False)
+
+
+@pytest.fixture
+def no_type_checks():
+    StrictDict.CHECK_TYPES = StrictList.CHECK_TYPES = False
+    yield
+    StrictDict.CHECK_TYPES = StrictList.CHECK_TYPES = True
+
+
+def _elements(context):
+    return (Node(context, 'type', 'template'),
+            Capability('capability', 'type'),
+            Relationship('relationship'),
+            Interface('interface', 'type'),
+            Operation('operation'),
+            Parameter('type', 'value', None))
+
+
+def test_elements_have_no_dict(context):
+    for element in _elements(context):
+        assert not hasattr(element, '__dict__')
+        with pytest.raises(AttributeError):
+            element.no_such_attribute = None
+
+
+def test_containers_are_lazy(context):
+    node = Node(context, 'type', 'template')
+    node.as_raw  # pylint: disable=pointless-statement
+    assert node._properties is None
+    assert node._relationships is None
+
+    node.properties['prop'] = Parameter('type', 'value', None)
+    assert isinstance(node._properties, StrictDict)
+    assert node.as_raw['properties']['prop']['value'] == 'value'
+
+
+def test_lazy_containers_forward_references(context):
+    node = Node(context, 'type', 'template')
+    node.interfaces['interface'] = Interface('interface', 'type')
+    with pytest.raises(TypeError):
+        node.interfaces['bad'] = Operation('operation')
+    node.relationships.append(Relationship('relationship'))
+    with pytest.raises(TypeError):
+        node.relationships.append('bad')
+
+
+def test_type_checks_disabled(context, no_type_checks):
+    node = Node(context, 'type', 'template')
+    node.properties['prop'] = 'not a parameter'
+    node.relationships.append('not a relationship')
+    assert node.properties['prop'] == 'not a parameter'
+
+
+def test_large_instance_memory(context):
+    # Measures an instantiated service instance, then again once all of its containers exist (as
+    # they did when they were created eagerly)
+    count = 2000
+    service_instance = _service_model(count).instantiate(context, None)
+    assert len(service_instance.nodes) == count
+    lazy_size = _deep_size(service_instance)
+    for obj in _reachable(service_instance):
+        for cls in type(obj).__mro__:
+            for name, attr in vars(cls).iteritems():
+                if isinstance(attr, (LazyStrictDict, LazyStrictList)):
+                    getattr(obj, name)
+    eager_size = _deep_size(service_instance)
+    assert lazy_size * 1.3 < eager_size
+
+
+def _service_model(default_instances):
+    node_template = NodeTemplate('template', 'type')
+    node_template.default_instances = default_instances
+    node_template.properties['prop'] = Parameter('string', 'value', None)
+    capability_template = CapabilityTemplate('capability', 'type')
+    capability_template.max_occurrences = 1
+    node_template.capability_templates['capability'] = capability_template
+    interface_template = InterfaceTemplate('interface', 'type')
+    operation_template = OperationTemplate('operation')
+    operation_template.implementation = 'script.sh'
+    operation_template.inputs['input'] = Parameter('string', 'value', None)
+    interface_template.operation_templates['operation'] = operation_template
+    node_template.interface_templates['interface'] = interface_template
+    service_model = ServiceModel()
+    service_model.node_templates['template'] = node_template
+    return service_model
+
+
+def _reachable(root):
+    objects = {}
+    pending = [root]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in objects or isinstance(obj, (type, types.ModuleType, types.FunctionType)):
+            continue
+        objects[id(obj)] = obj
+        pending.extend(gc.get_referents(obj))
+    return objects.values()
+
+
+def _deep_size(root):
+    return sum(sys.getsizeof(obj) for obj in _reachable(root))
@@ -0,0 +1,80 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from aria.parser.validation import ValidationContext, Issue, IssueBudgetExceededError
+
+
+@pytest.fixture
+def context():
+    return ValidationContext()
+
+
+def test_no_budget(context):
+    for i in range(10):
+        context.report('issue {0}'.format(i))
+    assert len(context.issues) == 10
+    assert not context.budget_exceeded
+
+
+def test_budget_exceeded(context):
+    context.issue_budget = 2
+    context.report('issue 1')
+    assert not context.budget_exceeded
+    with pytest.raises(IssueBudgetExceededError):
+        context.report('issue 2')
+    assert context.budget_exceeded
+    with pytest.raises(IssueBudgetExceededError):
+        context.check_budget()
+    # The cancellation is an issue as well, reported once
+    assert [i.message for i in context.issues] == \
+        ['issue 1', 'issue 2', 'parsing cancelled, issue budget exceeded: 2']
+    assert context.issues[-1].level == Issue.PLATFORM
+
+
+@pytest.mark.parametrize('budget', [0, -1])
+def test_budget_at_least_one(context, budget):
+    with pytest.raises(ValueError):
+        context.issue_budget = budget
+    assert context.issue_budget is None
+
+
+def test_budget_level(context):
+    context.issue_budget = 1
+    context.issue_budget_level = Issue.FIELD
+    context.report('between types', level=Issue.BETWEEN_TYPES)
+    context.report('between instances', level=Issue.BETWEEN_INSTANCES)
+    assert not context.budget_exceeded
+    with pytest.raises(IssueBudgetExceededError):
+        context.report('syntax', level=Issue.SYNTAX)
+    assert len(context.issues) == 4
+
+
+def test_duplicate_issues_not_counted(context):
+    context.issue_budget = 2
+    context.report('issue')
+    context.report('issue')
+    assert not context.budget_exceeded
+
+
+def test_budget_not_caught_as_exception(context):
+    # Handlers that turn exceptions into issues must not swallow it
+    context.issue_budget = 1
+    with pytest.raises(IssueBudgetExceededError):
+        try:
+            context.report('issue')
+        except Exception:
+            pass
@@ -40,6 +40,15 @@ test_run_script_reuse_existing_ctx_2() {
     ctx node-instance runtime-properties test_value2 $test_value2
 }
 
+test_run_script_append_node_instance_name() {
+    echo "$(ctx node-instance name)" >> ${output_path}
+}
+
+test_run_script_inputs_file() {
+    cp ${CTX_INPUTS_FILE} ${output_path}
+    echo "${large_input:-}" > ${output_path}.env
+}
+
 test_run_script_download_resource_plain() {
     local destination=$(mktemp)
     ctx download-resource ${destination} test_resource
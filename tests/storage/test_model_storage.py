@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import pytest
+from sqlalchemy import event, inspect
 
 from aria.storage import (
     ModelStorage,
@@ -22,6 +23,7 @@ from aria.storage import (
     sql_mapi,
 )
 from aria import application_model_storage
+from tests import mock
 from ..storage import get_sqlite_api_kwargs, release_sqlite_storage
 
 from . import MockModel
@@ -59,6 +61,203 @@ def test_model_storage(storage):
         storage.mock_model.get(mock_model.id)
 
 
+def test_model_storage_get_include(storage):
+    mock_model = MockModel(value=0, name='model_name')
+    storage.mock_model.put(mock_model)
+
+    assert storage.mock_model.get(mock_model.id, include=['name']) == ('model_name',)
+    with pytest.raises(exceptions.StorageError):
+        storage.mock_model.get(mock_model.id + 1, include=['name'])
+
+
+def test_model_storage_get_uses_identity_map(storage):
+    mock_model = MockModel(value=0, name='model_name')
+    storage.mock_model.put(mock_model)
+    assert storage.mock_model.get(mock_model.id).name == 'model_name'
+
+    with _counted_statements(storage) as statements:
+        assert storage.mock_model.get(mock_model.id) is mock_model
+    assert statements == []
+
+
+def test_model_storage_cache(storage):
+    mock_model = MockModel(value=0, name='model_name')
+    storage.mock_model.put(mock_model)
+    storage.enable_cache()
+
+    assert storage.mock_model.get(mock_model.id) is mock_model
+    with _counted_statements(storage) as statements:
+        assert storage.mock_model.get(mock_model.id) is mock_model
+    assert statements == []
+
+    # Deleting through the API evicts the entry
+    storage.mock_model.delete(mock_model)
+    with pytest.raises(exceptions.StorageError):
+        storage.mock_model.get(mock_model.id)
+
+    # Closing the session makes the cached entries unusable, so they are evicted
+    mock_model = MockModel(value=0, name='model_name')
+    storage.mock_model.put(mock_model)
+    storage.mock_model.get(mock_model.id)
+    storage.mock_model._session.close()
+    assert storage.mock_model.get(mock_model.id) is not mock_model
+
+    storage.invalidate_cache()
+    assert storage.mock_model._cache == {}
+    storage.disable_cache()
+    assert storage.mock_model._cache is None
+
+
+def test_model_storage_prepared_queries(storage):
+    for i in range(5):
+        storage.mock_model.put(MockModel(value=i, name='model_{0}'.format(i) if i else None))
+
+    def names(**kwargs):
+        return [mock_model.name for mock_model in storage.mock_model.list(**kwargs)]
+
+    assert names(filters={'value': 1}) == ['model_1']
+    assert names(filters={'value': 2}) == ['model_2']
+    assert names(filters={'value': [3, 4]}) == ['model_3', 'model_4']
+    assert names(filters={'value': [1, 2]}) == ['model_1', 'model_2']
+    assert names(filters={'value': [1]}) == ['model_1']
+    assert names(filters={'name': None}) == [None]
+    assert names(filters={'name': 'model_3', 'value': 3}) == ['model_3']
+    assert names(filters={'name': 'model_3', 'value': 4}) == []
+    assert names(filters={'value': [0, 1]}, sort={'value': 'desc'}) == ['model_1', None]
+    assert names(filters={'value': [0, 1]}, pagination={'size': 1, 'offset': 1}) == ['model_1']
+
+    # The same shape of params gets the same prepared query
+    query, _, params = storage.mock_model._prepare_query(None, {'value': [3, 4]}, None)
+    assert query is storage.mock_model._prepare_query(None, {'value': [1, 2]}, None)[0]
+    assert query is not storage.mock_model._prepare_query(None, {'value': [1]}, None)[0]
+    assert params == {'filter_0_0': 3, 'filter_0_1': 4}
+
+
+def test_model_storage_iter_batches(storage):
+    for i in range(10):
+        storage.mock_model.put(MockModel(value=i, name='model_{0}'.format(i)))
+    ids = [mock_model.id for mock_model in storage.mock_model.iter()]
+
+    with _counted_statements(storage) as statements:
+        assert [mm.id for mm in storage.mock_model.iter(batch_size=3)] == ids
+    assert len(statements) == 4
+
+    assert [mm.id for mm in storage.mock_model.iter(batch_size=5, sort={'id': 'desc'})] == \
+        list(reversed(ids))
+    assert [mm.id for mm in storage.mock_model.iter(batch_size=3, filters={'value': [1, 5, 7]})] \
+        == ids[1:2] + ids[5:6] + ids[7:8]
+    assert [row.name for row in storage.mock_model.iter(batch_size=4,
+                                                        include=['id', 'name'])][-1] == 'model_9'
+
+    with pytest.raises(exceptions.StorageError):
+        list(storage.mock_model.iter(batch_size=3, sort={'name': 'asc'}))
+    with pytest.raises(exceptions.StorageError):
+        list(storage.mock_model.iter(batch_size=3, include=['name']))
+
+
+def test_model_storage_eager_load(tmpdir):
+    storage = application_model_storage(sql_mapi.SQLAlchemyModelAPI,
+                                        api_kwargs=get_sqlite_api_kwargs(str(tmpdir)))
+    mock.topology.create_simple_topology_two_nodes(storage)
+    storage.node_instance._session.expunge_all()
+
+    try:
+        with _counted_statements(storage) as statements:
+            node_instances = storage.node_instance.list(eager_load='workflow')
+            for node_instance in node_instances:
+                assert node_instance.node.operations
+                for relationship_instance in node_instance.outbound_relationship_instances:
+                    assert relationship_instance.relationship.source_operations
+                    assert relationship_instance.relationship.target_node.name == \
+                        relationship_instance.target_node_instance.node.name
+        # The node instances, and their outbound relationship instances
+        assert len(statements) == 2
+        assert len(node_instances) == 2
+
+        assert [ni.id for ni in storage.node_instance.iter(eager_load=['node.deployment'])] == \
+            [ni.id for ni in node_instances]
+        with pytest.raises(exceptions.StorageError):
+            storage.node_instance.list(eager_load='non_existent_profile')
+    finally:
+        release_sqlite_storage(storage)
+
+
+def test_model_storage_deferred_columns(tmpdir):
+    storage = application_model_storage(sql_mapi.SQLAlchemyModelAPI,
+                                        api_kwargs=get_sqlite_api_kwargs(str(tmpdir)))
+    mock.topology.create_simple_topology_two_nodes(storage)
+    storage.node._session.expunge_all()
+
+    try:
+        with _counted_statements(storage) as statements:
+            node = storage.node.list()[0]
+            assert 'operations' not in node.__dict__
+            assert len(statements) == 1
+            # The whole group is loaded on first access
+            assert node.operations
+            assert 'properties' in node.__dict__
+            assert len(statements) == 2
+
+        # Changes to a deferred column are still tracked
+        node.operations['new_operation'] = {}
+        storage.node.update(node)
+        storage.node._session.expunge_all()
+
+        with _counted_statements(storage) as statements:
+            node = storage.node.list(eager_load=['operations', 'deployment.workflows'])[0]
+            assert 'new_operation' in node.operations
+            assert node.deployment.workflows is not None
+            assert len(statements) == 1
+    finally:
+        release_sqlite_storage(storage)
+
+
+@pytest.mark.parametrize('model_name, filters, index_name', [
+    ('task', {'execution_fk': 1, 'status': 'pending'}, 'ix_tasks_execution_fk_status'),
+    ('execution', {'deployment_fk': 1, 'status': 'started'}, 'ix_executions_deployment_fk_status'),
+    ('node', {'deployment_fk': 1, 'name': 'node'}, 'ix_nodes_deployment_fk_name'),
+    ('node_instance', {'node_fk': 1}, 'ix_node_instances_node_fk'),
+    ('node_instance', {'host_fk': 1}, 'ix_node_instances_host_fk'),
+    ('plugin', {'package_name': 'plugin', 'package_version': '1.0'},
+     'ix_plugins_package_name_package_version'),
+])
+def test_model_storage_indexes(tmpdir, model_name, filters, index_name):
+    storage = application_model_storage(sql_mapi.SQLAlchemyModelAPI,
+                                        api_kwargs=get_sqlite_api_kwargs(str(tmpdir)))
+    try:
+        mapi = getattr(storage, model_name)
+        with _counted_statements(storage, with_parameters=True) as statements:
+            mapi.list(filters=filters)
+        (statement, parameters), = statements
+        plan = mapi._engine.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+        assert any(index_name in row[-1] for row in plan)
+
+        # Indexes missing from existing tables are added on creation
+        mapi._engine.execute('DROP INDEX {0}'.format(index_name))
+        mapi.create()
+        assert index_name in [index['name'] for index in
+                              inspect(mapi._engine).get_indexes(mapi.model_cls.__tablename__)]
+    finally:
+        release_sqlite_storage(storage)
+
+
+class _counted_statements(object):
+    def __init__(self, storage, with_parameters=False):
+        self._engine = next(iter(storage.registered.values()))._engine
+        self._with_parameters = with_parameters
+        self._statements = []
+
+    def _count(self, conn, cursor, statement, parameters, *args, **kwargs):                         # pylint: disable=unused-argument
+        self._statements.append((statement, parameters) if self._with_parameters else statement)
+
+    def __enter__(self):
+        event.listen(self._engine, 'before_cursor_execute', self._count)
+        return self._statements
+
+    def __exit__(self, *args, **kwargs):
+        event.remove(self._engine, 'before_cursor_execute', self._count)
+
+
 def test_application_storage_factory():
     storage = application_model_storage(sql_mapi.SQLAlchemyModelAPI,
                                         api_kwargs=get_sqlite_api_kwargs())
@@ -13,12 +13,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
 import os
 import tempfile
 
 import pytest
 
-from aria.storage.filesystem_rapi import FileSystemResourceAPI
+from aria.storage.filesystem_rapi import FileSystemResourceAPI, _ObjectPaths
 from aria.storage import (
     exceptions,
     ResourceStorage
@@ -189,3 +190,103 @@ class TestResourceStorage(TestFileSystem):
 
         with pytest.raises(exceptions.StorageError):
             storage.blueprint.read(entry_id='blueprint_id')
+
+    def test_upload_deduplicates_content(self):
+        storage = self._create_storage()
+        storage.register('blueprint')
+        storage.register('deployment')
+        tmp_dir = tempfile.mkdtemp(suffix=self.__class__.__name__, dir=self.path)
+        self._upload_dir(storage, tmp_dir, 'script.sh', id='blueprint_id')
+        storage.deployment.upload(entry_id='deployment_id', source=tmp_dir)
+
+        blueprint_file = os.path.join(self.path, 'blueprint', 'blueprint_id', 'script.sh')
+        deployment_file = os.path.join(self.path, 'deployment', 'deployment_id', 'script.sh')
+        assert os.path.samefile(blueprint_file, deployment_file)
+        objects_path = storage.blueprint.objects_path
+        assert sum(len(files) for _, _, files in os.walk(objects_path)) == 1
+
+    def test_downloads_do_not_share_content(self):
+        storage = self._create_storage()
+        storage.register('blueprint')
+        storage.register('deployment')
+        tmp_dir = tempfile.mkdtemp(suffix=self.__class__.__name__, dir=self.path)
+        self._upload_dir(storage, tmp_dir, 'script.sh', id='blueprint_id')
+        storage.deployment.upload(entry_id='deployment_id', source=tmp_dir)
+
+        temp_destination_dir = tempfile.mkdtemp(dir=self.path)
+        storage.deployment.download(entry_id='deployment_id', destination=temp_destination_dir)
+        downloaded_file = os.path.join(temp_destination_dir, 'script.sh')
+        with open(downloaded_file, 'a') as f:
+            f.write(' changed in place')
+        os.chmod(downloaded_file, 0700)
+
+        assert storage.blueprint.read(entry_id='blueprint_id', path='script.sh') == 'fake context'
+        assert storage.deployment.read(entry_id='deployment_id',
+                                       path='script.sh') == 'fake context'
+        # Uploading the changed file stores its new content
+        storage.deployment.upload(entry_id='deployment_id', source=temp_destination_dir)
+        assert storage.deployment.read(entry_id='deployment_id',
+                                       path='script.sh') == 'fake context changed in place'
+        assert storage.blueprint.read(entry_id='blueprint_id', path='script.sh') == 'fake context'
+
+    def test_upload_of_entry_changed_in_place(self):
+        storage = self._create_storage()
+        storage.register('blueprint')
+        storage.register('deployment')
+        tmp_dir = tempfile.mkdtemp(suffix=self.__class__.__name__, dir=self.path)
+        self._upload_dir(storage, tmp_dir, 'script.sh', id='blueprint_id')
+        blueprint_dir = os.path.join(self.path, 'blueprint', 'blueprint_id')
+        storage.deployment.upload(entry_id='deployment_id', source=blueprint_dir)
+        with open(os.path.join(blueprint_dir, 'script.sh'), 'a') as f:
+            f.write(' changed in place')
+        storage.deployment.upload(entry_id='deployment_id', source=blueprint_dir)
+
+        # Stored by the hash of the new content, rather than reusing the changed object
+        deployment_file = os.path.join(self.path, 'deployment', 'deployment_id', 'script.sh')
+        object_path = os.path.join(storage.deployment.objects_path,
+                                   hashlib.sha256('fake context changed in place').hexdigest()[:2],
+                                   hashlib.sha256('fake context changed in place').hexdigest())
+        assert os.path.samefile(deployment_file, object_path)
+
+    def test_upload_replaces_shared_content(self):
+        storage = self._create_storage()
+        storage.register('blueprint')
+        storage.register('deployment')
+        tmp_dir = tempfile.mkdtemp(suffix=self.__class__.__name__, dir=self.path)
+        self._upload_dir(storage, tmp_dir, 'script.sh', id='blueprint_id')
+        storage.deployment.upload(entry_id='deployment_id', source=tmp_dir)
+
+        with open(os.path.join(tmp_dir, 'script.sh'), 'w') as f:
+            f.write('new fake context')
+        storage.deployment.upload(entry_id='deployment_id', source=tmp_dir)
+
+        assert storage.deployment.read(entry_id='deployment_id',
+                                       path='script.sh') == 'new fake context'
+        assert storage.blueprint.read(entry_id='blueprint_id', path='script.sh') == 'fake context'
+
+    def test_data_file_after_upload(self):
+        storage = self._create_storage()
+        self._create(storage)
+        tmp_dir = tempfile.mkdtemp(suffix=self.__class__.__name__, dir=self.path)
+        with pytest.raises(exceptions.StorageError):
+            storage.blueprint.read(entry_id='blueprint_id', path='script.sh')
+
+        self._upload_dir(storage, tmp_dir, 'script.sh', id='blueprint_id')
+        assert storage.blueprint.read(entry_id='blueprint_id', path='script.sh') == 'fake context'
+
+        with open(os.path.join(tmp_dir, 'script.sh'), 'w') as f:
+            f.write('new fake context')
+        storage.blueprint.upload(entry_id='blueprint_id', source=tmp_dir)
+        assert storage.blueprint.read(entry_id='blueprint_id',
+                                      path='script.sh') == 'new fake context'
+
+
+def test_object_paths_bounded():
+    object_paths = _ObjectPaths(max_size=2)
+    object_paths.set((1, 1), ('a', (1, 1.0)))
+    object_paths.set((1, 2), ('b', (1, 1.0)))
+    assert object_paths.get((1, 1)) == ('a', (1, 1.0))
+    object_paths.set((1, 3), ('c', (1, 1.0)))
+    assert object_paths.get((1, 2)) == (None, None)
+    assert object_paths.get((1, 1)) == ('a', (1, 1.0))
+    assert object_paths.get((1, 3)) == ('c', (1, 1.0))
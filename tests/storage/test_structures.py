@@ -13,6 +13,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+import zlib
+
 import pytest
 
 import sqlalchemy
@@ -273,3 +276,79 @@ def test_strict_list():
     assert_strict(strict_class)
     with pytest.raises(exceptions.StorageError):
         strict_class.strict_list[0] = 1
+
+
+class AlternativeJsonClass(model.DeclarativeBase, structure.ModelMixin):
+    __tablename__ = 'alternative_json_class'
+
+    compressed_dict = sqlalchemy.Column(type.CompressedDict)
+    compressed_list = sqlalchemy.Column(type.CompressedList)
+    native_dict = sqlalchemy.Column(type.NativeDict)
+    native_list = sqlalchemy.Column(type.NativeList)
+
+
+@pytest.fixture
+def alternative_json_storage():
+    base_storage = ModelStorage(sql_mapi.SQLAlchemyModelAPI, api_kwargs=get_sqlite_api_kwargs())
+    base_storage.register(AlternativeJsonClass)
+    yield base_storage
+    release_sqlite_storage(base_storage)
+    model.DeclarativeBase.metadata.remove(AlternativeJsonClass.__table__)  # pylint: disable=no-member
+
+
+def test_alternative_json_types(alternative_json_storage):
+    mapi = alternative_json_storage.alternative_json_class
+    entry = AlternativeJsonClass(compressed_dict={'key': {'inner': [1, 2]}},
+                                 compressed_list=['item', {'key': 'value'}],
+                                 native_dict={'key': 'value'},
+                                 native_list=[1, None])
+    mapi.put(entry)
+
+    # Changes inside the values are tracked as usual
+    entry.compressed_dict['key']['inner'] = [3]
+    entry.compressed_dict['new_key'] = 'new_value'
+    entry.compressed_list.append('another_item')
+    entry.native_dict['key'] = 'new_value'
+    mapi.update(entry)
+
+    entry_id = entry.id
+    mapi._session.expunge_all()
+    entry = mapi.get(entry_id)
+    assert entry.compressed_dict == {'key': {'inner': [3]}, 'new_key': 'new_value'}
+    assert entry.compressed_list == ['item', {'key': 'value'}, 'another_item']
+    assert entry.native_dict == {'key': 'new_value'}
+    assert entry.native_list == [1, None]
+
+    # The compressed values are actually stored compressed
+    raw = mapi._engine.execute('SELECT compressed_dict FROM alternative_json_class').scalar()
+    assert zlib.decompress(raw) == json.dumps(entry.compressed_dict)
+
+    entry.compressed_dict = None
+    mapi.update(entry)
+    mapi._session.expunge_all()
+    assert mapi.get(entry_id).compressed_dict is None
+
+
+def test_compressed_json_types_read_uncompressed_values(alternative_json_storage):
+    mapi = alternative_json_storage.alternative_json_class
+    entry = AlternativeJsonClass(compressed_dict={}, compressed_list=[])
+    mapi.put(entry)
+    entry_id = entry.id
+
+    # As stored by the plain JSON types the columns had before
+    mapi._engine.execute(
+        sqlalchemy.text('UPDATE alternative_json_class '
+                        'SET compressed_dict = :compressed_dict, '
+                        'compressed_list = :compressed_list'),
+        compressed_dict=json.dumps({'key': {'inner': [1, 2]}}),
+        compressed_list=json.dumps(['item']))
+    mapi._session.expunge_all()
+    entry = mapi.get(entry_id)
+    assert entry.compressed_dict == {'key': {'inner': [1, 2]}}
+    assert entry.compressed_list == ['item']
+
+    # Compressed once written again
+    entry.compressed_dict['key'] = 'value'
+    mapi.update(entry)
+    raw = mapi._engine.execute('SELECT compressed_dict FROM alternative_json_class').scalar()
+    assert json.loads(zlib.decompress(raw)) == {'key': 'value'}
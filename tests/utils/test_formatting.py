@@ -0,0 +1,89 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from StringIO import StringIO
+
+from aria.utils.collections import OrderedDict, prune
+from aria.utils.formatting import (as_raw_iter, json_dumps, json_dump, yaml_dumps, yaml_dump,
+                                   yaml_loads)
+
+
+class _Element(object):
+    def __init__(self, name, properties=None):
+        self.name = name
+        self.properties = properties
+
+    @property
+    def as_raw(self):
+        return OrderedDict((
+            ('name', self.name),
+            ('properties', self.properties if self.properties is not None else OrderedDict())))
+
+
+def _raw(elements):
+    return OrderedDict((
+        ('description', 'a service'),
+        ('metadata', None),
+        ('nodes', elements),
+        ('groups', [])))
+
+
+def _elements():
+    return [_Element('a', OrderedDict((('x', [1, 2]),))), _Element(u'\u05d1'),
+            _Element('c', OrderedDict((('y', None),)))]
+
+
+def _dump(dump_function, value, **kwargs):
+    out = StringIO()
+    dump_function(value, out, **kwargs)
+    return out.getvalue()
+
+
+class TestJsonDump(object):
+
+    def test_same_as_json_dumps(self):
+        expected = json_dumps(_raw([e.as_raw for e in _elements()]))
+        assert _dump(json_dump, _raw(as_raw_iter(_elements()))) == expected
+
+    def test_pruned(self):
+        expected = json_dumps(prune(_raw([e.as_raw for e in _elements()])))
+        assert _dump(json_dump, _raw(as_raw_iter(_elements())), pruned=True) == expected
+
+    def test_empty(self):
+        assert _dump(json_dump, _raw(as_raw_iter([]))) == json_dumps(_raw([]))
+        assert _dump(json_dump, OrderedDict()) == json_dumps(OrderedDict())
+        assert _dump(json_dump, as_raw_iter([])) == json_dumps([])
+
+    def test_iterator(self):
+        expected = json_dumps([e.as_raw for e in _elements()], indent=4)
+        assert _dump(json_dump, as_raw_iter(_elements()), indent=4) == expected
+
+
+class TestYamlDump(object):
+
+    def test_same_as_yaml_dumps(self):
+        expected = yaml_dumps(_raw([e.as_raw for e in _elements()]))
+        dumped = _dump(yaml_dump, _raw(as_raw_iter(_elements())))
+        assert yaml_loads(dumped) == yaml_loads(expected)
+
+    def test_pruned(self):
+        expected = yaml_dumps(prune(_raw([e.as_raw for e in _elements()])))
+        dumped = _dump(yaml_dump, _raw(as_raw_iter(_elements())), pruned=True)
+        assert yaml_loads(dumped) == yaml_loads(expected)
+
+    def test_empty(self):
+        expected = yaml_dumps(_raw([]))
+        assert yaml_loads(_dump(yaml_dump, _raw(as_raw_iter([])))) == yaml_loads(expected)
+        assert yaml_loads(_dump(yaml_dump, as_raw_iter([]))) == []
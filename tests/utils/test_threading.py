@@ -0,0 +1,56 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from aria.utils.threading import FixedThreadPoolExecutor
+
+
+def test_cancel():
+    started = threading.Event()
+    release = threading.Event()
+    executed = []
+
+    def task(value):
+        started.set()
+        release.wait()
+        executed.append(value)
+
+    with FixedThreadPoolExecutor(size=1) as executor:
+        executor.submit(task, 1)
+        started.wait()
+        executor.submit(task, 2)
+        executor.submit(task, 3)
+        executor.cancel()
+        executor.submit(task, 4)
+        release.set()
+        executor.drain()
+    # Only the task that started before cancelling was executed
+    assert executed == [1]
+
+
+def test_gathered_exceptions():
+    class MockControlFlow(BaseException):
+        pass
+
+    def task(exception):
+        raise exception
+
+    with FixedThreadPoolExecutor(size=1,
+                                 gathered_exceptions=(Exception, MockControlFlow)) as executor:
+        executor.submit(task, MockControlFlow())
+        executor.submit(task, ValueError())
+        executor.drain()
+        assert [type(e) for e in executor.exceptions] == [MockControlFlow, ValueError]